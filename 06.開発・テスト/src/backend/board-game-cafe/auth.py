@@ -10,7 +10,6 @@ from config import API_KEY, ADMIN_USERNAME, ADMIN_PASSWORD
 def check_api_key(event: Dict[str, Any]) -> bool:
     """Check if the API key is valid"""
     headers = event["headers"]
-    print(headers)
     if "x-api-key" not in headers:
         return False
     return headers["x-api-key"] == API_KEY
@@ -0,0 +1,150 @@
+"""One-off backfills of attributes and items the API now relies on
+
+Items written before a release may lack what its code expects. Each step
+here brings such items up to date and is idempotent, so the function can be
+invoked again at any time:
+
+    sls invoke -f backfill                                   # every step
+    sls invoke -f backfill -d '{"steps": ["session_markers"]}'
+
+Run it right after the deploy that adds a step.
+"""
+
+from typing import Any, Callable, Dict, List
+
+from botocore.exceptions import ClientError
+
+from db import ConditionFailed, conditional_update, orders_table, scan_items, sessions_table
+from orders import ORDER_STATUS, TERMINAL_STATUSES
+from sessions import ACTIVE_SESSION_MARKER
+
+
+def session_markers() -> Dict[str, Any]:
+    """
+    Write the ACTIVE marker of every table with an open session
+
+    Opening, closing and looking up the active session go through the
+    marker, so an open session without one could not be closed and its
+    table could be opened twice. Should a table have several open sessions,
+    the marker names the latest; the others are reported.
+    """
+    latest: Dict[Any, Dict[str, Any]] = {}
+    extra: List[Dict[str, Any]] = []
+    for session in scan_items(
+        sessions_table(),
+        FilterExpression="endTime = :active AND sessionId <> :marker",
+        ExpressionAttributeValues={":active": 0, ":marker": ACTIVE_SESSION_MARKER},
+    ):
+        current = latest.get(session["tableNumber"])
+        if current is not None and current["startTime"] >= session["startTime"]:
+            extra.append(session)
+            continue
+        if current is not None:
+            extra.append(current)
+        latest[session["tableNumber"]] = session
+
+    written = 0
+    for table_number, session in latest.items():
+        try:
+            sessions_table().put_item(
+                Item={
+                    "tableNumber": table_number,
+                    "sessionId": ACTIVE_SESSION_MARKER,
+                    "activeSessionId": session["sessionId"],
+                },
+                ConditionExpression="attribute_not_exists(sessionId)",
+            )
+            written += 1
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+    return {
+        "markersWritten": written,
+        "otherOpenSessions": [
+            {"tableNumber": int(s["tableNumber"]), "sessionId": s["sessionId"]} for s in extra
+        ],
+    }
+
+
+def session_status() -> Dict[str, Any]:
+    """
+    Give sessions written before StatusStartIndex their sessionStatus
+
+    GET /table-sessions reads that index only, so without it they would be
+    missing from the list.
+    """
+    written = 0
+    for session in scan_items(
+        sessions_table(),
+        FilterExpression="attribute_not_exists(sessionStatus) AND sessionId <> :marker",
+        ExpressionAttributeValues={":marker": ACTIVE_SESSION_MARKER},
+        ProjectionExpression="tableNumber, sessionId, endTime",
+    ):
+        key = {"tableNumber": session["tableNumber"], "sessionId": session["sessionId"]}
+        try:
+            # A session closed since the scan already has its sessionStatus
+            conditional_update(
+                sessions_table(),
+                key,
+                "SET sessionStatus = :status",
+                condition="attribute_not_exists(sessionStatus) AND endTime = :end",
+                values={
+                    ":status": "active" if session["endTime"] == 0 else "closed",
+                    ":end": session["endTime"],
+                },
+            )
+            written += 1
+        except ConditionFailed:
+            pass
+    return {"sessionsUpdated": written}
+
+
+def kitchen_status() -> Dict[str, Any]:
+    """
+    Give open orders written before KitchenStatusIndex their kitchenStatus
+
+    The kitchen queue reads that index only, so without it they would be
+    missing from the queue. Delivered and cancelled orders are left out:
+    the queue would prune them again anyway.
+    """
+    open_statuses = [s for s in ORDER_STATUS.values() if s not in TERMINAL_STATUSES]
+    values = {f":s{i}": status for i, status in enumerate(open_statuses)}
+    written = 0
+    for order in scan_items(
+        orders_table(),
+        FilterExpression=(
+            f"attribute_not_exists(kitchenStatus) AND #status IN ({', '.join(values)})"
+        ),
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues=values,
+        ProjectionExpression="orderId",
+    ):
+        try:
+            # An order changed since the scan already has its kitchenStatus
+            conditional_update(
+                orders_table(),
+                {"orderId": order["orderId"]},
+                "SET kitchenStatus = #status, updatedAt = if_not_exists(updatedAt, createdAt)",
+                condition="attribute_not_exists(kitchenStatus)",
+                names={"#status": "status"},
+            )
+            written += 1
+        except ConditionFailed:
+            pass
+    return {"ordersUpdated": written}
+
+
+STEPS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "session_markers": session_markers,
+    "kitchen_status": kitchen_status,
+    "session_status": session_status,
+}
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Run the steps named in event["steps"], or every step, in order"""
+    names = event.get("steps") or list(STEPS)
+    unknown = [name for name in names if name not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown backfill steps: {', '.join(unknown)}")
+    return {name: STEPS[name]() for name in names}
@@ -0,0 +1,99 @@
+"""Compare the bulk import endpoint with one POST /boardgames per game
+
+Usage: python bench/bulk_import.py [--rows 10000] [--post-sample 200] [--rtt-ms 5]
+
+Imports --rows games through POST /boardgames/bulk (NDJSON) and times
+--post-sample single-game POSTs, extrapolated to --rows. --rtt-ms adds a
+fixed delay to every DynamoDB call to approximate the network round trip
+that moto does not have, which dominates the one-request-per-game path.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from typing import Any, Dict
+
+import local_aws
+from helpers import make_event
+from moto import mock_aws
+
+
+def game(n: int) -> Dict[str, Any]:
+    return {
+        "name": f"ボードゲーム {n}",
+        "description": "説明文 " * 20,
+        "playerMin": 2,
+        "playerMax": 5,
+        "playTime": 45,
+        "imageUrl": "",
+        "difficulty": 2,
+        "gameType": "戦略",
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--post-sample", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_aws.create_tables()
+
+        import handler
+        from clients import dynamodb
+
+        calls = {"count": 0}
+
+        def on_call(**kwargs: Any) -> None:
+            calls["count"] += 1
+            time.sleep(args.rtt_ms / 1000)
+
+        dynamodb().meta.client.meta.events.register("before-call.dynamodb", on_call)
+
+        def call(path: str, body: str) -> Dict[str, Any]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                event = make_event("POST", path, body=body, admin=True)
+                response = handler.board_game_cafe(event, None)
+            assert response["statusCode"] == 201, response["body"]
+            return json.loads(response["body"])
+
+        calls["count"] = 0
+        started = time.perf_counter()
+        for n in range(args.post_sample):
+            call("/boardgames", json.dumps(game(n), ensure_ascii=False))
+        post_seconds = time.perf_counter() - started
+        post_calls = calls["count"]
+
+        ndjson = "\n".join(json.dumps(game(n), ensure_ascii=False) for n in range(args.rows))
+        calls["count"] = 0
+        started = time.perf_counter()
+        result = call("/boardgames/bulk", ndjson)
+        bulk_seconds = time.perf_counter() - started
+        assert result["imported"] == args.rows, result
+
+    per_row = args.rows / args.post_sample
+    report = {
+        "rows": args.rows,
+        "rtt_ms": args.rtt_ms,
+        "single_posts": {
+            "seconds": round(post_seconds * per_row, 1),
+            "dynamodb_calls": round(post_calls * per_row),
+            "extrapolated_from": args.post_sample,
+        },
+        "bulk": {
+            "seconds": round(bulk_seconds, 1),
+            "dynamodb_calls": calls["count"],
+            "body_kib": round(len(ndjson.encode()) / 1024),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
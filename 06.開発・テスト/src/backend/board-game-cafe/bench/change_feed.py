@@ -0,0 +1,215 @@
+"""Compare the order change feed with per-table polling, offline
+
+Usage: python bench/change_feed.py [--tablets 40] [--idle-seconds 10]
+                                   [--poll-interval 3] [--notifications 20]
+
+Runs against moto with bench/local_streams.py standing in for the DynamoDB
+Streams trigger of the change feed consumer. Two measurements:
+
+- idle load: every tablet watches its table for --idle-seconds, once by
+  polling GET /orders/table/{n} every --poll-interval seconds and once by
+  long-polling GET /changes; DynamoDB calls and the data they read are
+  counted (read capacity follows the data read, not the call count)
+- notification delay: time from an order status change to the waiting
+  long-poll returning it
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import local_aws
+from helpers import make_event
+from moto import mock_aws
+
+# Keep the EMF lines of the concurrent requests out of the report
+os.environ["METRICS_SAMPLE_RATE"] = "0"
+
+HISTORY_ORDERS_PER_TABLE = 30
+
+
+class CallCounter:
+    """Count DynamoDB calls and the items they return"""
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.items = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, parsed: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+        with self._lock:
+            self.calls[model.name] += 1
+            items = parsed.get("Items", []) + ([parsed["Item"]] if "Item" in parsed else [])
+            self.items += len(items)
+            self.bytes += len(json.dumps(items, default=str))
+
+    def reset(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {
+                "calls": dict(self.calls),
+                "items_read": self.items,
+                "kib_read": round(self.bytes / 1024, 1),
+            }
+            self.calls = Counter()
+            self.items = 0
+            self.bytes = 0
+        return snapshot
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tablets", type=int, default=40)
+    parser.add_argument("--idle-seconds", type=float, default=10.0)
+    parser.add_argument("--poll-interval", type=float, default=3.0)
+    parser.add_argument("--notifications", type=int, default=20)
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_aws.create_tables()
+
+        import changefeed
+        import handler
+        from clients import dynamodb
+        from db import menu_table, orders_table, sessions_table
+        from local_streams import StreamPump
+
+        menu_table().put_item(Item={"id": 1, "name": "coffee", "price": 500})
+        now = int(time.time())
+        with sessions_table().batch_writer() as sessions, orders_table().batch_writer() as orders:
+            for table_number in range(1, args.tablets + 1):
+                session_id = f"session-{table_number}"
+                sessions.put_item(
+                    Item={
+                        "tableNumber": table_number,
+                        "sessionId": session_id,
+                        "startTime": now - 3600,
+                        "endTime": 0,
+                    }
+                )
+                for n in range(HISTORY_ORDERS_PER_TABLE):
+                    orders.put_item(
+                        Item={
+                            "orderId": f"{session_id}-{n}",
+                            "tableNumber": table_number,
+                            "sessionId": session_id,
+                            "items": [{"id": 1, "name": "coffee", "price": 500, "quantity": 1}],
+                            "status": "delivered",
+                            "createdAt": now - 3600 + n,
+                            "updatedAt": now - 3600 + n,
+                        }
+                    )
+
+        pump = StreamPump(os.environ["DYNAMODB_ORDERS_TABLE_NAME"], changefeed.handler)
+        pump.start()
+        counter = CallCounter()
+        dynamodb().meta.client.meta.events.register("after-call.dynamodb", counter)
+
+        def call(event: Dict[str, Any]) -> Dict[str, Any]:
+            response = handler.board_game_cafe(event, None)
+            assert response["statusCode"] < 300, response
+            return json.loads(response["body"])
+
+        # Idle load, legacy polling
+        def poll_table(table_number: int) -> None:
+            deadline = time.monotonic() + args.idle_seconds
+            while time.monotonic() < deadline:
+                call(make_event("GET", f"/orders/table/{table_number}"))
+                time.sleep(args.poll_interval)
+
+        counter.reset()
+        with ThreadPoolExecutor(max_workers=args.tablets) as pool:
+            list(pool.map(poll_table, range(1, args.tablets + 1)))
+        polling = counter.reset()
+
+        # Idle load, long-polling the change feed
+        def watch_table(table_number: int) -> None:
+            path = "/changes"
+            query = {"table_number": str(table_number)}
+            seq = call(make_event("GET", path, query))["seq"]
+            deadline = time.monotonic() + args.idle_seconds
+            while (remaining := deadline - time.monotonic()) > 0:
+                query = {
+                    "table_number": str(table_number),
+                    "after": str(seq),
+                    "wait": str(remaining),
+                }
+                seq = call(make_event("GET", path, query))["seq"]
+
+        with ThreadPoolExecutor(max_workers=args.tablets) as pool:
+            list(pool.map(watch_table, range(1, args.tablets + 1)))
+        long_polling = counter.reset()
+
+        # Notification delay: a status change wakes the waiting long-poll
+        delays = []
+        table_number = 1
+        order = call(
+            make_event(
+                "POST",
+                "/orders",
+                body={
+                    "tableNumber": table_number,
+                    "sessionId": f"session-{table_number}",
+                    "items": [{"id": 1, "quantity": 1}],
+                },
+            )
+        )["order"]
+        statuses = ["preparing", "ready", "pending"]
+        pump.pump()
+        seq = call(make_event("GET", "/changes", {"table_number": str(table_number)}))["seq"]
+        for i in range(args.notifications):
+            query = {"table_number": str(table_number), "after": str(seq), "wait": "10"}
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                waiting = pool.submit(call, make_event("GET", "/changes", query))
+                time.sleep(0.3)
+                changed_at = time.perf_counter()
+                call(
+                    make_event(
+                        "PUT",
+                        f"/orders/{order['orderId']}/status",
+                        body={"status": statuses[i % len(statuses)]},
+                        admin=True,
+                    )
+                )
+                result = waiting.result()
+                delays.append((time.perf_counter() - changed_at) * 1000)
+            assert result["changes"], result
+            assert result["changes"][-1]["status"] == statuses[i % len(statuses)]
+            seq = result["seq"]
+
+        pump.stop()
+
+    def per_tablet_minute(load: Dict[str, Any]) -> Dict[str, Any]:
+        minutes = args.idle_seconds / 60
+        calls = sum(load["calls"].values())
+        return {
+            **load,
+            "calls_per_tablet_minute": round(calls / args.tablets / minutes, 1),
+            "items_per_tablet_minute": round(load["items_read"] / args.tablets / minutes, 1),
+            "kib_per_tablet_minute": round(load["kib_read"] / args.tablets / minutes, 1),
+        }
+
+    report = {
+        "tablets": args.tablets,
+        "idle_seconds": args.idle_seconds,
+        "polling": per_tablet_minute(polling),
+        "long_polling": per_tablet_minute(long_polling),
+        "notification_delay_ms": {
+            "p50": round(statistics.median(delays), 1),
+            "max": round(max(delays), 1),
+        },
+        "stream_records_delivered": pump.delivered,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
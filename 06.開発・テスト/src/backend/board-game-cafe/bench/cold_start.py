@@ -0,0 +1,88 @@
+"""Measure cold start cost: handler import and the first requests
+
+Usage: python bench/cold_start.py [--runs 10] [--backend-dir DIR]
+
+Every run is a fresh Python process, so module imports and AWS client
+creation are paid again each time, as on a Lambda cold start. moto is
+imported and started before the clock starts so only backend work is timed.
+Point --backend-dir at a checkout of an older revision (git worktree) to
+compare before and after.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+import local_aws
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {bench_dir!r})
+import local_aws
+sys.path.insert(0, {backend_dir!r})
+from moto import mock_aws
+
+with mock_aws():
+    local_aws.create_tables()
+    started = time.perf_counter()
+    import handler
+    imported = time.perf_counter()
+
+    def event(method, path):
+        return {{
+            "requestContext": {{"http": {{"method": method, "path": path}}}},
+            "headers": {{"x-api-key": local_aws.ENVIRONMENT["API_KEY"]}},
+        }}
+
+    handler.board_game_cafe(event("OPTIONS", "/boardgames"), None)
+    options_done = time.perf_counter()
+    response = handler.board_game_cafe(event("GET", "/boardgames"), None)
+    assert response["statusCode"] == 200, response
+    get_done = time.perf_counter()
+
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_options_ms": (options_done - imported) * 1000,
+    "first_get_ms": (get_done - options_done) * 1000,
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def run_probe(backend_dir: str) -> Dict[str, float]:
+    """Run one cold start in a fresh interpreter"""
+    code = PROBE.format(
+        bench_dir=os.path.dirname(os.path.abspath(__file__)),
+        backend_dir=os.path.abspath(backend_dir),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backend-dir", default=local_aws.BACKEND_DIR)
+    args = parser.parse_args()
+
+    samples: List[Dict[str, float]] = [run_probe(args.backend_dir) for _ in range(args.runs)]
+    report = {
+        "backend_dir": os.path.abspath(args.backend_dir),
+        "runs": args.runs,
+        **{
+            name: round(statistics.median(s[name] for s in samples), 2)
+            for name in ("import_ms", "first_options_ms", "first_get_ms", "modules")
+        },
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
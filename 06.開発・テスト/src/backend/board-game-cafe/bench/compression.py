@@ -0,0 +1,146 @@
+"""Measure response compression of the board game and menu lists
+
+Usage: python bench/compression.py [--games 1000] [--menu-items 300] [--mbps 2]
+
+Seeds moto with games whose descriptions are drawn from a pool of Japanese
+sentences (closer to a real catalog than repeated text, so the ratios are
+not flattered), then requests GET /boardgames (a page of the largest limit)
+and GET /menu with each Accept-Encoding. Reports the bytes on the wire, the CPU time of the first
+(compressing) and a repeated (cached) request, and the transfer time at
+--mbps, the throughput of a tablet on weak café Wi-Fi.
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from typing import Any, Dict
+
+import local_aws
+from helpers import make_event
+from moto import mock_aws
+
+SENTENCES = [
+    "手番では資源を集めて建物を建てる。",
+    "協力して島からの脱出を目指す。",
+    "相手の正体を推理しながら会話する。",
+    "カードを組み合わせて自分だけのデッキを作る。",
+    "タイルを並べて街道や都市を広げていく。",
+    "最も多くの勝利点を集めたプレイヤーの勝ち。",
+    "短時間で遊べるので最初の一本におすすめ。",
+    "運の要素が少なく、じっくり考えたい人向け。",
+    "{n}人で遊ぶと特に盛り上がる。",
+    "拡張を入れると{n}種類の新しいアクションが加わる。",
+    "宝石を集めて貴族の訪問を受ける。",
+    "列車の路線をつないで目的地を結ぶ。",
+]
+ENCODINGS = ["identity", "gzip", "br"]
+IMAGE_BASE_URL = "https://board-game-cafe-images.s3.amazonaws.com"
+
+
+def description(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(SENTENCES).format(n=rng.randint(2, 8)) for _ in range(rng.randint(3, 8))
+    )
+
+
+def seed(games: int, menu_items: int, rng: random.Random) -> None:
+    from db import board_games_table, menu_table
+
+    with board_games_table().batch_writer() as batch:
+        for game_id in range(1, games + 1):
+            player_min = rng.randint(1, 4)
+            batch.put_item(
+                Item={
+                    "id": game_id,
+                    "name": f"ボードゲーム {game_id}",
+                    "title_kana": f"ぼーどげーむ {game_id}",
+                    "description": description(rng),
+                    "playerMin": player_min,
+                    "playerMax": player_min + rng.randint(0, 6),
+                    "playTime": rng.choice([15, 30, 45, 60, 90, 120]),
+                    "imageUrl": f"{IMAGE_BASE_URL}/boardgames/{game_id}.jpg",
+                    "difficulty": rng.randint(1, 3),
+                    "gameType": rng.choice(["戦略", "パーティー", "協力", "その他"]),
+                }
+            )
+    with menu_table().batch_writer() as batch:
+        for menu_id in range(1, menu_items + 1):
+            batch.put_item(
+                Item={
+                    "id": menu_id,
+                    "name": f"メニュー {menu_id}",
+                    "price": rng.randint(3, 20) * 100,
+                    "category": rng.choice(["drink", "food", "dessert"]),
+                    "description": description(rng)[:60],
+                    "isAvailable": True,
+                    "imageUrl": "",
+                }
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1_000)
+    parser.add_argument("--menu-items", type=int, default=300)
+    parser.add_argument("--mbps", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"games": args.games, "menu_items": args.menu_items, "mbps": args.mbps}
+    with mock_aws():
+        local_aws.create_tables()
+        seed(args.games, args.menu_items, random.Random(args.seed))
+
+        import common
+        import handler
+
+        if common.brotli is None:
+            print("brotli is not installed; br falls back to gzip", file=sys.stderr)
+
+        def get(path: str, query: Dict[str, str], accept_encoding: str) -> Dict[str, Any]:
+            event = make_event("GET", path, query, headers={"accept-encoding": accept_encoding})
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = handler.board_game_cafe(event, None)
+            assert response["statusCode"] == 200, response["body"]
+            return response
+
+        from db import MAX_PAGE_LIMIT
+
+        for path, query in [("/boardgames", {"limit": str(MAX_PAGE_LIMIT)}), ("/menu", {})]:
+            get(path, query, "identity")  # fill the list cache; only compression is timed below
+            results = {}
+            for encoding in ENCODINGS:
+                common._compressed.clear()
+                timings = []
+                for _ in range(2):
+                    started_ns = time.process_time_ns()
+                    response = get(path, query, encoding)
+                    timings.append((time.process_time_ns() - started_ns) / 1e6)
+                body = response["body"]
+                if response.get("isBase64Encoded"):
+                    wire = len(base64.b64decode(body))
+                else:
+                    wire = len(body.encode())
+                results[encoding] = {
+                    "content_encoding": response["headers"].get("Content-Encoding", "identity"),
+                    "bytes": wire,
+                    "first_cpu_ms": round(timings[0], 2),
+                    "cached_cpu_ms": round(timings[1], 2),
+                    "transfer_ms": round(wire * 8 / (args.mbps * 1e6) * 1000),
+                }
+            identity = results["identity"]["bytes"]
+            for encoding in ENCODINGS[1:]:
+                results[encoding]["ratio"] = round(identity / results[encoding]["bytes"], 1)
+            report[path] = results
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
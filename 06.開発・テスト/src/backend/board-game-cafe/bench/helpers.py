@@ -0,0 +1,97 @@
+"""Request events, generated catalog items and timing summaries for the benchmark scripts
+
+Import local_aws first: make_event reads the API key and admin credentials
+from its environment.
+"""
+
+import base64
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import local_aws
+
+GAME_TYPES = ["戦略", "パーティー", "協力", "ワードゲーム", "正体隠匿", "その他"]
+PLAY_TIMES = [10, 15, 20, 25, 30, 40, 45, 60, 75, 90, 120, 180, 240]
+
+
+def make_event(
+    method: str,
+    path: str,
+    query: Optional[Dict[str, str]] = None,
+    body: Any = None,
+    admin: bool = False,
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    A Lambda Function URL (payload 2.0) event
+
+    A str body is sent as is, anything else as JSON. admin adds the Basic
+    credentials of ADMIN_USERNAME; headers are added to the defaults.
+    """
+    env = local_aws.ENVIRONMENT
+    event_headers = {"x-api-key": env["API_KEY"], "content-type": "application/json"}
+    if admin:
+        credentials = f"{env['ADMIN_USERNAME']}:{env['ADMIN_PASSWORD']}".encode()
+        event_headers["authorization"] = "Basic " + base64.b64encode(credentials).decode()
+    event_headers.update(headers or {})
+    event: Dict[str, Any] = {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in (query or {}).items()),
+        "headers": event_headers,
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": event_headers.get("user-agent", "bench"),
+            },
+            "timeEpoch": int(time.time() * 1000),
+        },
+        "isBase64Encoded": False,
+    }
+    if query:
+        event["queryStringParameters"] = query
+    if body is not None:
+        event["body"] = body if isinstance(body, str) else json.dumps(body)
+    return event
+
+
+def make_game(game_id: int, rng: random.Random) -> Dict[str, Any]:
+    """A board game item as stored in the table, numbers as Decimal"""
+    player_min = rng.randint(1, 4)
+    return {
+        "id": game_id,
+        "name": f"ボードゲーム {game_id}",
+        "title_kana": f"ぼーどげーむ {game_id}",
+        "description": "協力して島からの脱出を目指す。" * rng.randint(1, 4),
+        "playerMin": Decimal(player_min),
+        "playerMax": Decimal(player_min + rng.randint(0, 8)),
+        "playTime": Decimal(rng.choice(PLAY_TIMES)),
+        "imageUrl": f"images/original/{game_id}.jpg",
+        "difficulty": Decimal(rng.randint(1, 3)),
+        "gameType": rng.choice(GAME_TYPES),
+        "recommendation": Decimal(rng.randint(0, 5)),
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return round(ordered[int(rank) - 1], 2)
+
+
+def summary(values: List[float]) -> Dict[str, float]:
+    """Median, p95, p99 and max of values"""
+    return {
+        "p50": round(statistics.median(values), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values), 1),
+    }
@@ -0,0 +1,70 @@
+"""Hammer the ID allocator from many threads and containers against moto
+
+Usage: python bench/id_allocator_stress.py [--containers 4] [--threads 8] [--ids 200]
+
+Each simulated container owns its own IdAllocator (its own block cache),
+as separate warm Lambda containers would. The run fails if any ID is handed
+out twice.
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+import local_aws
+from moto import mock_aws
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ids", type=int, default=200, help="IDs per thread")
+    parser.add_argument("--block-size", type=int, default=10)
+    parser.add_argument("--existing", type=int, default=25, help="pre-seeded games")
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_aws.create_tables()
+
+        from boardgames import board_games_table
+        from ids import IdAllocator
+
+        for game_id in range(1, args.existing + 1):
+            board_games_table().put_item(Item={"id": game_id, "name": f"game {game_id}"})
+
+        allocators = [
+            IdAllocator(block_size=args.block_size) for _ in range(args.containers)
+        ]
+
+        def worker(allocator: IdAllocator) -> list:
+            return [
+                allocator.allocate("boardgames", board_games_table())
+                for _ in range(args.ids)
+            ]
+
+        jobs = [a for a in allocators for _ in range(args.threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(worker, jobs))
+        elapsed = time.perf_counter() - started
+
+    allocated = list(chain.from_iterable(results))
+    duplicates = len(allocated) - len(set(allocated))
+    reservations = sum(a.reservations for a in allocators)
+
+    print(f"allocated:     {len(allocated)} ids in {elapsed:.2f}s")
+    print(f"reservations:  {reservations} UpdateItem calls")
+    print(f"lowest id:     {min(allocated)} (existing max {args.existing})")
+    print(f"duplicates:    {duplicates}")
+    if duplicates or min(allocated) <= args.existing:
+        print("FAILED")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
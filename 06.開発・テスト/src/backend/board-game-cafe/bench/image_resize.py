@@ -0,0 +1,97 @@
+"""Benchmark image decoding and encoding time per megapixel
+
+Usage: python bench/image_resize.py [--width 4032 --height 3024] [--repeat 3]
+
+Generates a synthetic photo-like JPEG, then times decoding with and without
+JPEG draft mode and encoding each available output format.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from typing import Callable, Dict, List
+
+import local_aws  # noqa: F401  (sets up sys.path and environment)
+
+os.environ.setdefault("RESIZED_M_DIR", "resized_m")
+os.environ.setdefault("RESIZED_S_DIR", "resized_s")
+
+from PIL import Image, ImageFilter
+
+from image_resizer import (
+    OUTPUT_FORMATS,
+    available_formats,
+    decode_image,
+    encode_image,
+    output_sizes,
+    resize_image,
+)
+
+
+def _timed(run: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = Image.effect_noise((args.width, args.height), 64).convert("RGB")
+    source = source.filter(ImageFilter.GaussianBlur(2))
+    buffer = BytesIO()
+    source.save(buffer, "JPEG", quality=90)
+    data = buffer.getvalue()
+    source_mp = args.width * args.height / 1e6
+
+    sizes = output_sizes()
+    largest = sizes[0][1]
+
+    def full_decode() -> Image.Image:
+        return Image.open(BytesIO(data)).convert("RGB")
+
+    results: Dict[str, object] = {
+        "source_megapixels": round(source_mp, 2),
+        "decode_full_ms_per_mp": round(_timed(full_decode, args.repeat) / source_mp * 1000, 2),
+        "decode_draft_ms_per_mp": round(
+            _timed(lambda: decode_image(data, largest), args.repeat) / source_mp * 1000, 2
+        ),
+    }
+
+    decoded = decode_image(data, largest)
+    variants = [resize_image(decoded, (size, size)) for _, size in sizes]
+    encode_results: List[Dict[str, object]] = []
+    for output_format in available_formats(list(OUTPUT_FORMATS)):
+        for (directory, _), variant in zip(sizes, variants):
+            mp = variant.width * variant.height / 1e6
+            seconds = _timed(lambda: encode_image(variant, output_format), args.repeat)
+            encode_results.append(
+                {
+                    "format": output_format.extension,
+                    "size": directory,
+                    "ms_per_mp": round(seconds / mp * 1000, 2),
+                    "bytes": len(encode_image(variant, output_format)),
+                }
+            )
+    results["encode"] = encode_results
+
+    print(f"decode (full):  {results['decode_full_ms_per_mp']} ms/MP")
+    print(f"decode (draft): {results['decode_draft_ms_per_mp']} ms/MP of source")
+    for row in encode_results:
+        print(f"encode {row['format']:>4} {row['size']:>10}: {row['ms_per_mp']} ms/MP, {row['bytes']} bytes")
+    print(json.dumps(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
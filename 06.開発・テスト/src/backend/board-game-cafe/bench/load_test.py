@@ -0,0 +1,684 @@
+"""Load test every route of the API handler against a seeded moto backend
+
+Usage: python bench/load_test.py [--scale 1.0] [--requests 50] [--output FILE]
+                                 [--baseline FILE --threshold 0.2]
+
+Builds Function URL events for every entry in routes.ROUTES and runs them
+through handler.board_game_cafe. At --scale 1.0 the tables hold 10k board
+games, 500 menu items and 100k orders; use e.g. --scale 0.05 for a quick run.
+
+For each route the report gives p50/p95/p99 latency, DynamoDB calls per
+request (read from the EMF line metrics.py logs for each request) and the
+peak memory allocated per request (tracemalloc, in a separate pass so it does
+not skew the timings). With --baseline, routes whose p95 latency or call
+count grew by more than --threshold are listed and the exit status is 1.
+
+moto is far slower than DynamoDB for some operations: it copies each table
+a transaction touches, so POST /orders slows down as the data set grows.
+Compare runs with each other rather than reading them as production latency.
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import helpers
+import local_aws
+from helpers import percentile
+from moto import mock_aws
+
+# Every request must log its metrics line, it is where the call counts come from
+os.environ["METRICS_SAMPLE_RATE"] = "1"
+
+GAMES = 10_000
+MENU_ITEMS = 500
+ORDERS = 100_000
+DINING_TABLES = 40
+ORDERS_PER_SESSION = 25
+GAME_TYPES = ["戦略", "パーティー", "協力", "推理", "カード", "その他"]
+CATEGORIES = ["drink", "food", "dessert"]
+BULK_ROWS = 100
+
+Event = Dict[str, Any]
+RouteKey = Tuple[str, str]
+
+
+class Fixture:
+    """Seeded data and the pools of IDs that mutating routes consume"""
+
+    def __init__(self, scale: float, per_route: int, rng: random.Random):
+        self.rng = rng
+        self.per_route = per_route
+        # Deletes consume IDs from the top, so keep enough rows for them
+        self.games = max(int(GAMES * scale), per_route * 2)
+        self.menu_items = max(int(MENU_ITEMS * scale), per_route * 2)
+        self.orders = int(ORDERS * scale)
+        self.active_sessions: Dict[int, str] = {}
+        self.pending_orders: List[str] = []
+        self.closable_tables: List[int] = []
+        self.free_tables = list(range(1000 + per_route, 1000, -1))
+        self.doomed_games = list(range(self.games // 2 + 1, self.games // 2 + per_route + 1))
+        self.doomed_menu_items = list(range(self.menu_items, self.menu_items - per_route, -1))
+
+    def game_id(self) -> int:
+        return self.rng.randint(1, self.games // 2)
+
+    def menu_item_id(self) -> int:
+        return self.rng.randint(1, self.menu_items - self.per_route)
+
+    def dining_table(self) -> int:
+        return self.rng.randint(1, DINING_TABLES)
+
+
+def seed(fixture: Fixture) -> float:
+    """Fill the moto tables, returning the time it took"""
+    from db import board_games_table, menu_table, orders_table, sessions_table
+    from sessions import ACTIVE_SESSION_MARKER
+
+    def active_marker(table_number: int, session_id: str) -> Dict[str, Any]:
+        return {
+            "tableNumber": table_number,
+            "sessionId": ACTIVE_SESSION_MARKER,
+            "activeSessionId": session_id,
+        }
+
+    started = time.perf_counter()
+    rng = fixture.rng
+    now = int(time.time())
+
+    with board_games_table().batch_writer() as batch:
+        for game_id in range(1, fixture.games + 1):
+            player_min = rng.randint(1, 4)
+            batch.put_item(
+                Item={
+                    "id": game_id,
+                    "name": f"ボードゲーム {game_id}",
+                    "description": "説明文 " * rng.randint(5, 40),
+                    "playerMin": player_min,
+                    "playerMax": player_min + rng.randint(0, 6),
+                    "playTime": rng.choice([15, 30, 45, 60, 90, 120, 180]),
+                    "imageUrl": f"images/original/{game_id}.jpg",
+                    "difficulty": rng.randint(1, 5),
+                    "gameType": rng.choice(GAME_TYPES),
+                    "recommendation": rng.randint(0, 5),
+                }
+            )
+
+    prices: Dict[int, int] = {}
+    with menu_table().batch_writer() as batch:
+        for menu_id in range(1, fixture.menu_items + 1):
+            prices[menu_id] = rng.randint(3, 20) * 100
+            batch.put_item(
+                Item={
+                    "id": menu_id,
+                    "name": f"メニュー {menu_id}",
+                    "price": prices[menu_id],
+                    "category": rng.choice(CATEGORIES),
+                    "description": "",
+                    "isAvailable": True,
+                    "imageUrl": "",
+                }
+            )
+
+    def order(table_number: int, session_id: str, status: str, created_at: int) -> Dict[str, Any]:
+        items = []
+        for menu_id in rng.sample(range(1, fixture.menu_items + 1), rng.randint(1, 4)):
+            quantity = rng.randint(1, 3)
+            items.append(
+                {
+                    "id": menu_id,
+                    "name": f"メニュー {menu_id}",
+                    "price": prices[menu_id],
+                    "quantity": quantity,
+                    "itemTotal": prices[menu_id] * quantity,
+                }
+            )
+        item = {
+            "orderId": f"{session_id}-{created_at}-{rng.getrandbits(32):08x}",
+            "tableNumber": table_number,
+            "sessionId": session_id,
+            "items": items,
+            "totalAmount": sum(item["itemTotal"] for item in items),
+            "status": status,
+            "createdAt": created_at,
+            "updatedAt": created_at,
+            "notes": "",
+        }
+        # History is older than KITCHEN_RETENTION: terminal orders are pruned
+        if status not in ("delivered", "cancelled"):
+            item["kitchenStatus"] = status
+        return item
+
+    # Closed sessions carrying the order history, spread over 90 days
+    closed_sessions = fixture.orders // ORDERS_PER_SESSION
+    started_at = now - 90 * 86400
+    step = max(1, 90 * 86400 // max(1, closed_sessions))
+    with sessions_table().batch_writer() as sessions, orders_table().batch_writer() as orders:
+        for index in range(closed_sessions):
+            table_number = index % DINING_TABLES + 1
+            session_id = f"history-{index}"
+            start = started_at + index * step
+            history = [
+                order(table_number, session_id, "delivered", start + n * 60)
+                for n in range(ORDERS_PER_SESSION)
+            ]
+            sessions.put_item(
+                Item={
+                    "tableNumber": table_number,
+                    "sessionId": session_id,
+                    "customerCount": rng.randint(1, 6),
+                    "startTime": start,
+                    "endTime": start + 7200,
+                    "sessionStatus": "closed",
+                    "notes": "",
+                    "totalAmount": sum(item["totalAmount"] for item in history),
+                    "orderCount": len(history),
+                    "openOrderCount": 0,
+                }
+            )
+            for item in history:
+                orders.put_item(Item=item)
+            if index % 500 == 0:
+                print(f"  seeded {index * ORDERS_PER_SESSION} orders", file=sys.stderr)
+
+        # One open session per dining table; pending orders feed cancel / status
+        pending: Dict[int, List[Dict[str, Any]]] = {n: [] for n in range(1, DINING_TABLES + 1)}
+        for n in range(fixture.per_route * 2):
+            table_number = n % DINING_TABLES + 1
+            item = order(table_number, f"active-{table_number}", "pending", now - n)
+            orders.put_item(Item=item)
+            pending[table_number].append(item)
+            fixture.pending_orders.append(item["orderId"])
+        for table_number in range(1, DINING_TABLES + 1):
+            session_id = f"active-{table_number}"
+            fixture.active_sessions[table_number] = session_id
+            sessions.put_item(Item=active_marker(table_number, session_id))
+            sessions.put_item(
+                Item={
+                    "tableNumber": table_number,
+                    "sessionId": session_id,
+                    "customerCount": 2,
+                    "startTime": now - 1800,
+                    "endTime": 0,
+                    "sessionStatus": "active",
+                    "notes": "",
+                    "totalAmount": sum(item["totalAmount"] for item in pending[table_number]),
+                    "orderCount": len(pending[table_number]),
+                    "openOrderCount": len(pending[table_number]),
+                }
+            )
+
+        # Open sessions without orders that the close route can end
+        for table_number in range(501, 501 + fixture.per_route):
+            fixture.closable_tables.append(table_number)
+            sessions.put_item(Item=active_marker(table_number, f"closable-{table_number}"))
+            sessions.put_item(
+                Item={
+                    "tableNumber": table_number,
+                    "sessionId": f"closable-{table_number}",
+                    "customerCount": 1,
+                    "startTime": now - 600,
+                    "endTime": 0,
+                    "sessionStatus": "active",
+                    "notes": "",
+                    "totalAmount": 0,
+                    "orderCount": 0,
+                    "openOrderCount": 0,
+                }
+            )
+
+    return time.perf_counter() - started
+
+
+# What browsers send; large responses are compressed
+BROWSER_HEADERS = {"user-agent": "load-test", "accept-encoding": "gzip, deflate, br"}
+
+
+def make_event(
+    method: str,
+    path: str,
+    query: Optional[Dict[str, str]] = None,
+    body: Optional[Dict[str, Any]] = None,
+    admin: bool = False,
+) -> Event:
+    """A Function URL event with browser headers"""
+    return helpers.make_event(method, path, query, body, admin, BROWSER_HEADERS)
+
+
+# Event builders, one per (method, path template) in routes.ROUTES
+BUILDERS: Dict[RouteKey, Callable[[Fixture, int], Event]] = {}
+
+
+def builds(method: str, template: str) -> Callable:
+    def register(build: Callable[[Fixture, int], Event]) -> Callable[[Fixture, int], Event]:
+        BUILDERS[(method, template)] = build
+        return build
+
+    return register
+
+
+@builds("GET", "/boardgames")
+def _list_games(f: Fixture, i: int) -> Event:
+    variants: List[Optional[Dict[str, str]]] = [
+        None,
+        {"limit": "50"},
+        {"players": "4", "difficulty": "beginner"},
+        {"play_time": "30to60", "game_type": "協力"},
+    ]
+    return make_event("GET", "/boardgames", variants[i % len(variants)])
+
+
+@builds("GET", "/boardgames/search")
+def _search_games(f: Fixture, i: int) -> Event:
+    # Type-ahead: growing prefixes of a seeded name, in katakana and hiragana
+    name = f"ぼーどげーむ {f.game_id()}"
+    variants = [name[:1], name[:3], "ボードゲーム", name, "ｹﾞｰﾑ", "説明文"]
+    return make_event("GET", "/boardgames/search", {"q": variants[i % len(variants)]})
+
+
+@builds("GET", "/boardgames/recommend")
+def _recommend_games(f: Fixture, i: int) -> Event:
+    variants = [
+        {"players": "5", "max_time": "60"},
+        {"players": "2", "max_time": "40", "difficulty": "beginner"},
+        {"players": "4", "game_type": "協力", "limit": "20"},
+        {"max_time": "30"},
+    ]
+    return make_event("GET", "/boardgames/recommend", variants[i % len(variants)])
+
+
+@builds("GET", "/boardgames/{board_game_id:int}")
+def _get_game(f: Fixture, i: int) -> Event:
+    return make_event("GET", f"/boardgames/{f.game_id()}")
+
+
+@builds("POST", "/boardgames")
+def _post_game(f: Fixture, i: int) -> Event:
+    body = {
+        "name": f"新作 {i}",
+        "description": "負荷試験で追加",
+        "playerMin": 2,
+        "playerMax": 5,
+        "playTime": 45,
+        "imageUrl": "",
+        "difficulty": 2,
+        "gameType": "パーティー",
+    }
+    return make_event("POST", "/boardgames", body=body, admin=True)
+
+
+@builds("POST", "/boardgames/presigned-url")
+def _presigned_url(f: Fixture, i: int) -> Event:
+    body = {"fileType": "image/jpeg"}
+    return make_event("POST", "/boardgames/presigned-url", body=body, admin=True)
+
+
+@builds("POST", "/boardgames/bulk")
+def _import_games(f: Fixture, i: int) -> Event:
+    # Alternate NDJSON and a base64-encoded CSV upload
+    if i % 2:
+        rows = [f"輸入 {i}-{n},説明,2,4,30,,2,戦略" for n in range(BULK_ROWS)]
+        header = "name,description,playerMin,playerMax,playTime,imageUrl,difficulty,gameType"
+        text = "\n".join([header, *rows])
+        event = make_event("POST", "/boardgames/bulk", {"format": "csv"}, admin=True)
+        event["body"] = base64.b64encode(text.encode()).decode()
+        event["isBase64Encoded"] = True
+        return event
+    rows = [
+        json.dumps(
+            {
+                "name": f"輸入 {i}-{n}",
+                "description": "説明",
+                "playerMin": 2,
+                "playerMax": 4,
+                "playTime": 30,
+                "imageUrl": "",
+            },
+            ensure_ascii=False,
+        )
+        for n in range(BULK_ROWS)
+    ]
+    event = make_event("POST", "/boardgames/bulk", admin=True)
+    event["body"] = "\n".join(rows)
+    return event
+
+
+@builds("GET", "/boardgames/export")
+def _export_games(f: Fixture, i: int) -> Event:
+    return make_event("GET", "/boardgames/export", {"format": ["ndjson", "csv"][i % 2]}, admin=True)
+
+
+@builds("PUT", "/boardgames/{board_game_id:int}")
+def _put_game(f: Fixture, i: int) -> Event:
+    body = {"description": f"更新 {i}", "playTime": 60}
+    return make_event("PUT", f"/boardgames/{f.game_id()}", body=body, admin=True)
+
+
+@builds("DELETE", "/boardgames/{board_game_id:int}")
+def _delete_game(f: Fixture, i: int) -> Event:
+    return make_event("DELETE", f"/boardgames/{f.doomed_games.pop()}", admin=True)
+
+
+@builds("GET", "/menu")
+def _list_menu(f: Fixture, i: int) -> Event:
+    return make_event("GET", "/menu")
+
+
+@builds("GET", "/menu/{menu_item_id:int}")
+def _get_menu_item(f: Fixture, i: int) -> Event:
+    return make_event("GET", f"/menu/{f.menu_item_id()}")
+
+
+@builds("POST", "/menu")
+def _post_menu_item(f: Fixture, i: int) -> Event:
+    body = {"name": f"季節のメニュー {i}", "price": 600, "category": "food"}
+    return make_event("POST", "/menu", body=body, admin=True)
+
+
+@builds("POST", "/menu/bulk")
+def _import_menu(f: Fixture, i: int) -> Event:
+    rows = [f"輸入メニュー {i}-{n},{(n % 10 + 3) * 100},food,true" for n in range(BULK_ROWS)]
+    event = make_event("POST", "/menu/bulk", {"format": "csv"}, admin=True)
+    event["body"] = "\n".join(["name,price,category,isAvailable", *rows])
+    return event
+
+
+@builds("GET", "/menu/export")
+def _export_menu(f: Fixture, i: int) -> Event:
+    return make_event("GET", "/menu/export", {"format": ["ndjson", "csv"][i % 2]}, admin=True)
+
+
+@builds("PUT", "/menu/{menu_item_id:int}")
+def _put_menu_item(f: Fixture, i: int) -> Event:
+    return make_event("PUT", f"/menu/{f.menu_item_id()}", body={"price": 700}, admin=True)
+
+
+@builds("DELETE", "/menu/{menu_item_id:int}")
+def _delete_menu_item(f: Fixture, i: int) -> Event:
+    return make_event("DELETE", f"/menu/{f.doomed_menu_items.pop()}", admin=True)
+
+
+@builds("GET", "/table-sessions")
+def _list_sessions(f: Fixture, i: int) -> Event:
+    week_ago = str(int(time.time()) - 7 * 86400)
+    variants: List[Optional[Dict[str, str]]] = [
+        None,
+        {"status": "active"},
+        {"limit": "50"},
+        {"status": "closed", "from": week_ago, "limit": "50"},
+    ]
+    return make_event("GET", "/table-sessions", variants[i % len(variants)])
+
+
+@builds("GET", "/table-sessions/{table_number:int}/bill")
+def _session_bill(f: Fixture, i: int) -> Event:
+    table_number = f.dining_table()
+    query = {"session_id": f.active_sessions[table_number]} if i % 2 else None
+    return make_event("GET", f"/table-sessions/{table_number}/bill", query)
+
+
+@builds("POST", "/table-sessions")
+def _open_session(f: Fixture, i: int) -> Event:
+    body = {"tableNumber": f.free_tables.pop(), "customerCount": 3}
+    return make_event("POST", "/table-sessions", body=body)
+
+
+@builds("DELETE", "/table-sessions/{table_number:int}")
+def _close_session(f: Fixture, i: int) -> Event:
+    return make_event("DELETE", f"/table-sessions/{f.closable_tables.pop()}", admin=True)
+
+
+@builds("GET", "/orders")
+def _kitchen_queue(f: Fixture, i: int) -> Event:
+    variants: List[Dict[str, str]] = [
+        {},
+        {"status": "pending,preparing", "limit": "20"},
+        {"updated_since": str(int(time.time()) - 60)},
+    ]
+    return make_event("GET", "/orders", variants[i % len(variants)], admin=True)
+
+
+@builds("GET", "/orders/table/{table_number:int}")
+def _table_orders(f: Fixture, i: int) -> Event:
+    table_number = f.dining_table()
+    variants: List[Optional[Dict[str, str]]] = [
+        None,
+        {"session_id": f.active_sessions[table_number]},
+        {"limit": "20"},
+        {"limit": "20", "fields": "status,totalAmount,createdAt"},
+    ]
+    return make_event("GET", f"/orders/table/{table_number}", variants[i % len(variants)])
+
+
+@builds("POST", "/orders")
+def _create_order(f: Fixture, i: int) -> Event:
+    table_number = f.dining_table()
+    items = [
+        {"id": f.menu_item_id(), "quantity": f.rng.randint(1, 3)}
+        for _ in range(f.rng.randint(1, 5))
+    ]
+    body = {
+        "tableNumber": table_number,
+        "sessionId": f.active_sessions[table_number],
+        "items": items,
+    }
+    return make_event("POST", "/orders", body=body)
+
+
+@builds("PUT", "/orders/{order_id:str}/status")
+def _order_status(f: Fixture, i: int) -> Event:
+    body = {"status": "preparing"}
+    return make_event("PUT", f"/orders/{f.pending_orders.pop()}/status", body=body, admin=True)
+
+
+@builds("DELETE", "/orders/{order_id:str}")
+def _cancel_order(f: Fixture, i: int) -> Event:
+    return make_event("DELETE", f"/orders/{f.pending_orders.pop()}")
+
+
+@builds("GET", "/changes")
+def _changes(f: Fixture, i: int) -> Event:
+    query = {"table_number": str(f.dining_table())}
+    if i % 2:
+        query.update(after="0", wait="0")
+    return make_event("GET", "/changes", query)
+
+
+@builds("POST", "/login")
+def _login(f: Fixture, i: int) -> Event:
+    return make_event("POST", "/login", body={}, admin=True)
+
+
+def invoke(event: Event) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
+    """Run one request, returning latency, response and its EMF metrics record"""
+    import handler
+
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(captured):
+        started = time.perf_counter()
+        response = handler.board_game_cafe(event, None)
+        elapsed = (time.perf_counter() - started) * 1000
+    record: Dict[str, Any] = {}
+    for line in captured.getvalue().splitlines():
+        if line.startswith('{"_aws"'):
+            record = json.loads(line)
+    return elapsed, response, record
+
+
+def run_route(
+    fixture: Fixture, key: RouteKey, requests: int, warmup: int, alloc_requests: int
+) -> Dict[str, Any]:
+    """Measure one route: a timed pass, then an allocation pass"""
+    build = BUILDERS[key]
+    for i in range(warmup):
+        invoke(build(fixture, i))
+
+    latencies: List[float] = []
+    calls: List[int] = []
+    operations: Counter = Counter()
+    statuses: Counter = Counter()
+    cache_hits = 0
+    for i in range(requests):
+        elapsed, response, record = invoke(build(fixture, warmup + i))
+        latencies.append(elapsed)
+        statuses[str(response["statusCode"])] += 1
+        calls.append(record.get("AwsCalls", 0))
+        operations.update(call.rpartition(":")[0] for call in record.get("Calls", []))
+        cache_hits += record.get("Cache") == "HIT"
+
+    peaks: List[float] = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_requests):
+            event = build(fixture, warmup + requests + i)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            invoke(event)
+            peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "method": key[0],
+        "path": key[1],
+        "requests": requests,
+        "status": dict(statuses),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 2),
+        },
+        "aws_calls": {
+            "mean": round(sum(calls) / len(calls), 2),
+            "max": max(calls),
+            "by_operation": {
+                op: round(count / requests, 2) for op, count in sorted(operations.items())
+            },
+        },
+        "cache_hit_ratio": round(cache_hits / requests, 2),
+        "alloc_peak_kib": {
+            "p50": percentile(peaks, 50) if peaks else None,
+            "max": round(max(peaks), 1) if peaks else None,
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Routes whose p95 latency or AWS call count regressed beyond threshold"""
+    previous = {(r["method"], r["path"]): r for r in baseline["routes"]}
+    regressions = []
+    for route in report["routes"]:
+        before = previous.get((route["method"], route["path"]))
+        if before is None:
+            continue
+        name = f"{route['method']} {route['path']}"
+        p95, old_p95 = route["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95 > old_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {old_p95} -> {p95} ms")
+        calls, old_calls = route["aws_calls"]["mean"], before["aws_calls"]["mean"]
+        if calls > old_calls * (1 + threshold):
+            regressions.append(f"{name}: AWS calls {old_calls} -> {calls} per request")
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=local_aws.BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full data set")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--alloc-requests", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from routes import ROUTES
+
+    keys = [(method, template) for method, template, _, _ in ROUTES]
+    missing = [f"{m} {t}" for m, t in keys if (m, t) not in BUILDERS]
+    if missing:
+        print(f"No event builder for: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    fixture = Fixture(
+        args.scale, args.warmup + args.requests + args.alloc_requests, random.Random(args.seed)
+    )
+    with mock_aws():
+        local_aws.create_tables()
+        print(
+            f"seeding {fixture.games} games, {fixture.menu_items} menu items, "
+            f"{fixture.orders} orders",
+            file=sys.stderr,
+        )
+        seed_seconds = seed(fixture)
+        routes = []
+        for key in keys:
+            routes.append(
+                run_route(fixture, key, args.requests, args.warmup, args.alloc_requests)
+            )
+            r = routes[-1]
+            print(
+                f"{key[0]:6} {key[1]:40} p50 {r['latency_ms']['p50']:8.2f}  "
+                f"p95 {r['latency_ms']['p95']:8.2f}  p99 {r['latency_ms']['p99']:8.2f} ms  "
+                f"calls {r['aws_calls']['mean']:5.2f}  alloc {r['alloc_peak_kib']['p50']} KiB",
+                file=sys.stderr,
+            )
+
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": {
+            "scale": args.scale,
+            "games": fixture.games,
+            "menu_items": fixture.menu_items,
+            "orders": fixture.orders,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "alloc_requests": args.alloc_requests,
+            "seed": args.seed,
+        },
+        "seed_seconds": round(seed_seconds, 1),
+        "routes": routes,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
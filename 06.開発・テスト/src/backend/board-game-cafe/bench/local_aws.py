@@ -0,0 +1,135 @@
+"""Local AWS stand-in (moto) shared by the benchmark and harness scripts
+
+Import this module before any backend module: it puts the backend directory
+on sys.path and fills in the environment variables config.py expects.
+"""
+
+import os
+import sys
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+ENVIRONMENT = {
+    "AWS_DEFAULT_REGION": "ap-northeast-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "DYNAMODB_TABLE_NAME": "board-games-table",
+    "DYNAMODB_MENU_TABLE_NAME": "menu-items-table",
+    "DYNAMODB_ORDERS_TABLE_NAME": "orders-table",
+    "DYNAMODB_TABLE_SESSIONS_TABLE_NAME": "table-sessions-table",
+    "DYNAMODB_COUNTERS_TABLE_NAME": "counters-table",
+    "DYNAMODB_CHANGES_TABLE_NAME": "changes-table",
+    "S3_BUCKET_NAME": "board-game-cafe-images",
+    "S3_IMAGE_PATH": "images",
+    "ORIGINAL_DIR": "original",
+    "API_KEY": "local-api-key",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_PASSWORD": "admin",
+}
+for _name, _value in ENVIRONMENT.items():
+    os.environ.setdefault(_name, _value)
+
+
+def _attributes(**types: str) -> List[Dict[str, str]]:
+    return [{"AttributeName": n, "AttributeType": t} for n, t in types.items()]
+
+
+def _key(hash_key: str, range_key: str = "") -> List[Dict[str, str]]:
+    schema = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+    if range_key:
+        schema.append({"AttributeName": range_key, "KeyType": "RANGE"})
+    return schema
+
+
+def _index(name: str, hash_key: str, range_key: str = "") -> Dict[str, Any]:
+    return {
+        "IndexName": name,
+        "KeySchema": _key(hash_key, range_key),
+        "Projection": {"ProjectionType": "ALL"},
+    }
+
+
+TABLES: List[Dict[str, Any]] = [
+    {
+        "TableName": os.environ["DYNAMODB_TABLE_NAME"],
+        "KeySchema": _key("id"),
+        "AttributeDefinitions": _attributes(id="N"),
+        "StreamSpecification": {"StreamEnabled": True, "StreamViewType": "KEYS_ONLY"},
+    },
+    {
+        "TableName": os.environ["DYNAMODB_MENU_TABLE_NAME"],
+        "KeySchema": _key("id"),
+        "AttributeDefinitions": _attributes(id="N"),
+        "StreamSpecification": {"StreamEnabled": True, "StreamViewType": "KEYS_ONLY"},
+    },
+    {
+        "TableName": os.environ["DYNAMODB_ORDERS_TABLE_NAME"],
+        "KeySchema": _key("orderId"),
+        "AttributeDefinitions": _attributes(
+            orderId="S",
+            tableNumber="N",
+            sessionId="S",
+            createdAt="N",
+            kitchenStatus="S",
+            updatedAt="N",
+        ),
+        "GlobalSecondaryIndexes": [
+            _index("TableNumberIndex", "tableNumber", "createdAt"),
+            _index("TableSessionIndex", "tableNumber", "sessionId"),
+            _index("KitchenStatusIndex", "kitchenStatus", "updatedAt"),
+            _index("SessionOrdersIndex", "sessionId", "createdAt"),
+        ],
+        "StreamSpecification": {"StreamEnabled": True, "StreamViewType": "NEW_AND_OLD_IMAGES"},
+    },
+    {
+        "TableName": os.environ["DYNAMODB_TABLE_SESSIONS_TABLE_NAME"],
+        "KeySchema": _key("tableNumber", "sessionId"),
+        "AttributeDefinitions": _attributes(
+            tableNumber="N", sessionId="S", startTime="N", sessionStatus="S"
+        ),
+        "GlobalSecondaryIndexes": [
+            _index("TableNumberIndex", "tableNumber", "startTime"),
+            _index("StatusStartIndex", "sessionStatus", "startTime"),
+        ],
+    },
+    {
+        "TableName": os.environ["DYNAMODB_CHANGES_TABLE_NAME"],
+        "KeySchema": _key("channel", "seq"),
+        "AttributeDefinitions": _attributes(channel="S", seq="N"),
+    },
+    {
+        "TableName": os.environ["DYNAMODB_COUNTERS_TABLE_NAME"],
+        "KeySchema": _key("counterName"),
+        "AttributeDefinitions": _attributes(counterName="S"),
+    },
+]
+
+
+def create_tables() -> None:
+    """
+    Create every backend table in the active moto mock
+
+    With DYNAMODB_ENDPOINT_URL set (DynamoDB Local, moto server) the tables
+    are created there instead; give them fresh names through the
+    DYNAMODB_*_TABLE_NAME variables to keep runs isolated.
+    """
+    import boto3
+
+    endpoint_url = os.environ.get("DYNAMODB_ENDPOINT_URL") or None
+    client = boto3.client("dynamodb", endpoint_url=endpoint_url)
+    for definition in TABLES:
+        client.create_table(BillingMode="PAY_PER_REQUEST", **definition)
+
+
+def create_bucket() -> None:
+    """Create the S3 bucket (S3_BUCKET_NAME) in the active moto mock or at S3_ENDPOINT_URL"""
+    import boto3
+
+    endpoint_url = os.environ.get("S3_ENDPOINT_URL") or None
+    boto3.client("s3", endpoint_url=endpoint_url).create_bucket(
+        Bucket=os.environ["S3_BUCKET_NAME"],
+        CreateBucketConfiguration={"LocationConstraint": os.environ["AWS_DEFAULT_REGION"]},
+    )
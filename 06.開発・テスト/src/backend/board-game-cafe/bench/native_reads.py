@@ -0,0 +1,181 @@
+"""Compare the resource (Decimal) and NativeTable read paths of the list endpoints
+
+Usage: python bench/native_reads.py [--games 10000] [--orders 2000] [--rounds 5]
+
+Times what a list endpoint does on a cache miss: read every page, then
+serialize the body with encode_body. The resource path gets Decimal numbers
+that DecimalEncoder.default converts one by one; NativeTable gets int and
+float values directly. DynamoDB is replaced by replaying prerecorded
+scan/query pages (about 1 MB each, as DynamoDB pages them) from a
+before-send hook, so the timings are the Lambda's own CPU (request
+signing, response parsing, deserialization, JSON), without moto's
+overhead or the network.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+import local_aws  # noqa: F401  (environment variables)
+from boto3.dynamodb.types import TypeSerializer
+from botocore.awsrequest import AWSResponse
+from helpers import make_game
+
+PAGE_BYTES = 1024 * 1024
+_serializer = TypeSerializer()
+
+
+class _Raw:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    def stream(self, **kwargs: Any) -> Any:
+        yield self._body
+
+
+class ReplayedTable:
+    """Wire-format pages of one table's items, served by ExclusiveStartKey"""
+
+    def __init__(self, items: List[Dict[str, Any]], key: List[str]):
+        self.pages: Dict[str, bytes] = {}
+        page: List[Dict[str, Any]] = []
+        size, start = 0, "null"
+        for index, item in enumerate(items):
+            raw = {k: _serializer.serialize(v) for k, v in item.items()}
+            page.append(raw)
+            size += len(json.dumps(raw))
+            if size >= PAGE_BYTES or index == len(items) - 1:
+                body: Dict[str, Any] = {
+                    "Items": page,
+                    "Count": len(page),
+                    "ScannedCount": len(page),
+                }
+                if index < len(items) - 1:
+                    body["LastEvaluatedKey"] = {k: raw[k] for k in key}
+                self.pages[start] = json.dumps(body).encode()
+                start = json.dumps(body.get("LastEvaluatedKey"), sort_keys=True)
+                page, size = [], 0
+
+    def respond(self, request: Any, **kwargs: Any) -> AWSResponse:
+        start = json.loads(request.body).get("ExclusiveStartKey")
+        body = self.pages[json.dumps(start, sort_keys=True)]
+        headers = {"content-type": "application/x-amz-json-1.0"}
+        return AWSResponse(request.url, 200, headers, _Raw(body))
+
+
+def make_order(n: int, rng: random.Random) -> Dict[str, Any]:
+    items = [
+        {
+            "menuItemId": Decimal(rng.randint(1, 300)),
+            "name": f"メニュー {n}",
+            "price": Decimal(rng.randint(3, 20) * 100),
+            "quantity": Decimal(rng.randint(1, 3)),
+        }
+        for _ in range(rng.randint(1, 4))
+    ]
+    return {
+        "orderId": f"order-{n:06d}",
+        "tableNumber": Decimal(1),
+        "sessionId": "session-1",
+        "items": items,
+        "totalAmount": sum(i["price"] * i["quantity"] for i in items),
+        "status": "delivered",
+        "kitchenStatus": "delivered",
+        "createdAt": Decimal(1_700_000_000 + n),
+        "updatedAt": Decimal(1_700_000_000 + n),
+    }
+
+
+def measure(read: Callable[[], Dict[str, Any]], rounds: int) -> Dict[str, float]:
+    from common import encode_body
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode_body(read())
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"ms": round(statistics.median(timings), 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=2_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    import botocore
+
+    from clients import dynamodb
+    from db import (
+        NativeTable,
+        _native_client,
+        board_games_table,
+        orders_table,
+        query_pages,
+        scan_pages,
+    )
+
+    games = ReplayedTable([make_game(i, rng) for i in range(1, args.games + 1)], ["id"])
+    orders = ReplayedTable(
+        [make_order(n, rng) for n in range(args.orders)],
+        ["orderId", "tableNumber", "createdAt"],
+    )
+    current = {"table": games}
+    for client in (dynamodb().meta.client, _native_client()):
+        client.meta.events.register(
+            "before-send.dynamodb", lambda request, **kw: current["table"].respond(request)
+        )
+
+    def scan_all(table: Any) -> Dict[str, Any]:
+        return {"boardGames": [i for p in scan_pages(table) for i in p.get("Items", [])]}
+
+    def query_all(table: Any) -> Dict[str, Any]:
+        pages = query_pages(
+            table,
+            IndexName="TableNumberIndex",
+            KeyConditionExpression="tableNumber = :tn",
+            ExpressionAttributeValues={":tn": 1},
+        )
+        return {"orders": [i for p in pages for i in p.get("Items", [])]}
+
+    # NativeTable must take the before-parse path, not quietly fall back to
+    # converting botocore's parsed items (the speedup below would shrink)
+    response = _native_client().scan(TableName=board_games_table().name)
+    assert response.get("NativeItems"), f"botocore {botocore.__version__}: before-parse not used"
+
+    report: Dict[str, Any] = {
+        "botocore": botocore.__version__,
+        "games": args.games,
+        "orders": args.orders,
+    }
+    cases = [
+        ("GET /boardgames", games, scan_all, board_games_table(), args.games),
+        ("GET /table-orders", orders, query_all, orders_table(), args.orders),
+    ]
+    for name, replayed, read, table, count in cases:
+        current["table"] = replayed
+        before = measure(lambda: read(table), args.rounds)
+        after = measure(lambda: read(NativeTable(table)), args.rounds)
+        for result in (before, after):
+            result["items_per_second"] = round(count / result["ms"] * 1000)
+        report[name] = {
+            "pages": len(replayed.pages),
+            "resource_decimal": before,
+            "native": after,
+            "speedup": round(before["ms"] / after["ms"], 2),
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
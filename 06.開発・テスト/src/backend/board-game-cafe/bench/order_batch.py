@@ -0,0 +1,136 @@
+"""Compare order creation latency for 1, 10 and 50-item orders against moto
+
+Usage: python bench/order_batch.py [--rtt-ms 5] [--repeat 20]
+
+The serial baseline looks up each line item with its own GetItem, as
+create_order used to. --rtt-ms adds a fixed delay to every DynamoDB call to
+approximate the network round trip that moto does not have. The script
+also asserts that each order makes one BatchGetItem over its distinct menu
+items and still rejects missing and unavailable ones.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+import local_aws
+from moto import mock_aws
+
+ORDER_SIZES = [1, 10, 50]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with mock_aws():
+        local_aws.create_tables()
+
+        import orders
+        from clients import dynamodb
+        from menu import menu_table
+        from sessions import sessions_table
+
+        for menu_id in range(1, 101):
+            menu_table().put_item(
+                Item={"id": menu_id, "name": f"item {menu_id}", "price": 500}
+            )
+        sessions_table().put_item(
+            Item={"tableNumber": 1, "sessionId": "bench", "startTime": 0, "endTime": 0}
+        )
+
+        calls = {"count": 0}
+        operations: Counter = Counter()
+        batch_keys: List[int] = []
+
+        def on_call(model: Any, **kwargs: Any) -> None:
+            calls["count"] += 1
+            operations[model.name] += 1
+            time.sleep(args.rtt_ms / 1000)
+
+        def on_batch_get(params: Dict[str, Any], **kwargs: Any) -> None:
+            batch_keys.extend(len(r["Keys"]) for r in params["RequestItems"].values())
+
+        events = dynamodb().meta.client.meta.events
+        events.register("before-call.dynamodb", on_call)
+        events.register("before-parameter-build.dynamodb.BatchGetItem", on_batch_get)
+
+        def serial_lookup(items: List[Dict[str, Any]]) -> None:
+            for item in items:
+                orders.menu_table().get_item(Key={"id": item["id"]})
+
+        def post_order(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+            body = {"tableNumber": 1, "sessionId": "bench", "items": items}
+            return orders.create_order({"body": json.dumps(body)})
+
+        def batched_order(items: List[Dict[str, Any]]) -> None:
+            response = post_order(items)
+            assert response["statusCode"] == 201, response["body"]
+
+        def measure(run: Callable[[List[Dict[str, Any]]], None], size: int) -> Dict[str, float]:
+            items = [{"id": i % 100 + 1, "quantity": 1} for i in range(size)]
+            timings = []
+            calls["count"] = 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                run(items)
+                timings.append((time.perf_counter() - started) * 1000)
+            return {
+                "median_ms": round(statistics.median(timings), 2),
+                "calls": calls["count"] / args.repeat,
+            }
+
+        results = []
+        for size in ORDER_SIZES:
+            results.append(
+                {
+                    "items": size,
+                    "serial_lookup": measure(serial_lookup, size),
+                    "create_order": measure(batched_order, size),
+                }
+            )
+
+        # Each order looks its menu items up with one BatchGetItem and no
+        # GetItem, sending every distinct id once
+        for size in ORDER_SIZES:
+            operations.clear()
+            batched_order([{"id": i % 100 + 1, "quantity": 1} for i in range(size)])
+            assert operations["BatchGetItem"] == 1 and not operations["GetItem"], operations
+        batch_keys.clear()
+        response = post_order(
+            [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 1}, {"id": 1, "quantity": 1}]
+        )
+        assert response["statusCode"] == 201, response["body"]
+        order = json.loads(response["body"])["order"]
+        assert batch_keys == [2], batch_keys
+        assert [item["id"] for item in order["items"]] == [1, 2, 1], order
+        assert order["totalAmount"] == 2000, order
+
+        # Missing and unavailable items are still rejected
+        menu_table().put_item(
+            Item={"id": 101, "name": "sold out", "price": 500, "isAvailable": False}
+        )
+        for menu_id, status in [(999, 404), (101, 400)]:
+            response = post_order([{"id": 1, "quantity": 1}, {"id": menu_id, "quantity": 1}])
+            assert response["statusCode"] == status, response["body"]
+            assert str(menu_id) in json.loads(response["body"])["error"], response["body"]
+
+    print(f"{'items':>5}  {'serial lookup only':>22}  {'create_order (batched)':>24}")
+    for row in results:
+        serial, batched = row["serial_lookup"], row["create_order"]
+        print(
+            f"{row['items']:>5}  {serial['median_ms']:>10.2f} ms {serial['calls']:>4.0f} calls"
+            f"  {batched['median_ms']:>12.2f} ms {batched['calls']:>4.0f} calls"
+        )
+    print(json.dumps(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Measure the board game recommendation index: build time, memory and per-query CPU
+
+Usage: python bench/recommend_index.py [--games 30000] [--queries 2000]
+
+Builds the bitmap index from --games generated games (no DynamoDB: the
+index is fed directly, as after the scan) and replays the counter's
+questions: N players, within T minutes, sometimes with difficulty or
+gameType filters. CPU time per query is measured with
+time.process_time_ns around RecommendationIndex.recommend with the version
+check already satisfied, and compared with filtering and sorting the item
+list in Python, the cost of answering the same question without the index.
+The linear scan also checks the index: both must find the same games.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import local_aws
+from helpers import GAME_TYPES, make_game, summary
+from moto import mock_aws
+
+
+def make_catalog_game(game_id: int, rng: random.Random) -> Dict[str, Any]:
+    # A few party games only work for groups larger than MAX_PLAYERS
+    game = make_game(game_id, rng)
+    if rng.random() < 0.02:
+        game["playerMin"] = Decimal(rng.randint(10, 16))
+        game["playerMax"] = game["playerMin"] + rng.randint(0, 8)
+    return game
+
+
+def make_query(rng: random.Random) -> Dict[str, Any]:
+    query: Dict[str, Any] = {
+        "players": rng.randint(2, 8) if rng.random() < 0.9 else rng.randint(9, 20),
+        "max_time": rng.choice([30, 45, 60, 60, 90, 50, 100]),
+    }
+    if rng.random() < 0.3:
+        query["difficulties"] = [rng.randint(1, 3)]
+    if rng.random() < 0.3:
+        query["game_types"] = [rng.choice(GAME_TYPES)]
+    return query
+
+
+def linear_scan(games: List[Dict[str, Any]], query: Dict[str, Any], limit: int) -> List[Any]:
+    """The ids of every game matching query; the best limit of them are sorted first"""
+    players, max_time = query["players"], query["max_time"]
+    difficulties: Optional[List[int]] = query.get("difficulties")
+    game_types: Optional[List[str]] = query.get("game_types")
+    matches = [
+        g
+        for g in games
+        if g["playerMin"] <= players <= g["playerMax"]
+        and g["playTime"] <= max_time
+        and (difficulties is None or g["difficulty"] in difficulties)
+        and (game_types is None or g["gameType"] in game_types)
+    ]
+    matches.sort(key=lambda g: (g["recommendation"], g["playTime"]), reverse=True)
+    return [g["id"] for g in matches]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        # The index reads the cache version stamp from the counters table
+        local_aws.create_tables()
+
+        from cache import catalog_cache
+        from recommend import RecommendationIndex
+
+        games = [make_catalog_game(game_id, rng) for game_id in range(1, args.games + 1)]
+        index = RecommendationIndex(catalog_cache, lambda: games)
+        tracemalloc.start()
+        started = time.perf_counter()
+        index.ensure_current()
+        build_seconds = time.perf_counter() - started
+        index_mib = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        queries = [make_query(rng) for _ in range(args.queries)]
+        index_us: List[float] = []
+        scan_us: List[float] = []
+        totals: List[int] = []
+        for query in queries:
+            started_ns = time.process_time_ns()
+            _, total = index.recommend(limit=args.limit, **query)
+            index_us.append((time.process_time_ns() - started_ns) / 1000)
+            totals.append(total)
+        for query in queries[: max(1, args.queries // 10)]:
+            started_ns = time.process_time_ns()
+            expected = linear_scan(games, query, args.limit)
+            scan_us.append((time.process_time_ns() - started_ns) / 1000)
+            # The index finds exactly the games a linear scan does
+            items, total = index.recommend(limit=args.limit, **query)
+            assert total == len(expected), (query, total, len(expected))
+            assert {item["id"] for item in items} <= set(expected), query
+            assert len(items) == min(args.limit, total), query
+
+        # Groups above MAX_PLAYERS still respect playerMin
+        large = {"id": 0, "playerMin": Decimal(15), "playerMax": Decimal(20), "playTime": 30}
+        only = RecommendationIndex(catalog_cache, lambda: [large])
+        assert only.recommend(players=13)[1] == 0
+        assert only.recommend(players=16)[1] == 1
+        assert only.recommend(players=21)[1] == 0
+
+    report = {
+        "games": args.games,
+        "build_seconds": round(build_seconds, 2),
+        "index_mib": round(index_mib, 1),
+        "queries": len(index_us),
+        "median_matches": statistics.median(totals),
+        "index_cpu_us": summary(index_us),
+        "linear_scan_cpu_us": summary(scan_us),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
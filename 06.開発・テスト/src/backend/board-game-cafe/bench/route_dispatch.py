@@ -0,0 +1,122 @@
+"""Micro-benchmark of route dispatch cost as the number of routes grows
+
+Usage: python bench/route_dispatch.py [--iterations 20000]
+
+Compares routes.Router with the previous approach of trying every route's
+regex in turn, for the real ROUTES table padded with synthetic routes.
+Every route is dispatched once before timing, so the trie's lazy handler
+imports are not measured.
+"""
+
+import argparse
+import json
+import re
+import sys
+import timeit
+from typing import Any, Dict, List, Tuple
+
+import local_aws  # noqa: F401  (sets up sys.path and environment)
+from routes import ROUTES, Router
+
+ROUTE_COUNTS = [len(ROUTES), 100, 500, 2000]
+
+
+def _handler() -> None:
+    pass
+
+
+def _to_regex(template: str) -> Tuple[Any, List[str]]:
+    names = []
+    pattern = ""
+    for segment in template[1:].split("/"):
+        if segment.startswith("{"):
+            name, _, param_type = segment[1:-1].partition(":")
+            names.append(name)
+            pattern += r"/(\d+)" if param_type == "int" else r"/([^/]+)"
+        else:
+            pattern += "/" + re.escape(segment)
+    return re.compile(f"^{pattern}$"), names
+
+
+def _sample_path(template: str) -> str:
+    """A path matching a route template, with placeholder parameter values"""
+    return re.sub(
+        r"\{[^}:]+:?([^}]*)\}",
+        lambda m: "1" if m.group(1) == "int" else "x",
+        template,
+    )
+
+
+def _linear_find(table: List[Tuple[str, Any, Any, bool, List[str]]], method: str, path: str):
+    for route_method, path_pattern, handler, requires_admin, param_names in table:
+        if method != route_method:
+            continue
+        if not (match := path_pattern.match(path)):
+            continue
+        params = {}
+        for i, name in enumerate(param_names):
+            try:
+                params[name] = int(match.group(i + 1))
+            except ValueError:
+                params[name] = match.group(i + 1)
+        return handler, params, requires_admin
+    return None, {}, False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Requests for real routes; synthetic routes are appended after them, so
+    # the linear scan is measured against its typical (not worst) case
+    requests = [
+        ("GET", "/boardgames/123"),
+        ("PUT", "/orders/0f8fad5b-d9cb-469f-a165-70867728950e/status"),
+        ("POST", "/login"),
+        ("GET", "/not/a/route"),
+    ]
+
+    results: List[Dict[str, Any]] = []
+    for count in ROUTE_COUNTS:
+        routes = list(ROUTES)
+        for i in range(count - len(ROUTES)):
+            routes.append(("GET", f"/synthetic{i}/{{item_id:int}}/detail", _handler, False))
+
+        router = Router(routes)
+        linear = []
+        for method, template, handler, requires_admin in routes:
+            regex, names = _to_regex(template)
+            linear.append((method, regex, handler, requires_admin, names))
+
+        # Warm up: the first find of a route imports its handler module
+        for method, template, _, _ in routes:
+            path = _sample_path(template)
+            router.find(method, path)
+            _linear_find(linear, method, path)
+
+        trie_time = timeit.timeit(
+            lambda: [router.find(m, p) for m, p in requests], number=args.iterations
+        )
+        linear_time = timeit.timeit(
+            lambda: [_linear_find(linear, m, p) for m, p in requests],
+            number=args.iterations,
+        )
+        per_call = args.iterations * len(requests)
+        results.append(
+            {
+                "routes": count,
+                "trie_us": round(trie_time / per_call * 1e6, 3),
+                "linear_regex_us": round(linear_time / per_call * 1e6, 3),
+            }
+        )
+
+    print(f"{'routes':>6}  {'trie (us/call)':>15}  {'linear regex (us/call)':>23}")
+    for row in results:
+        print(f"{row['routes']:>6}  {row['trie_us']:>15.3f}  {row['linear_regex_us']:>23.3f}")
+    print(json.dumps(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Measure the board game search index: build time, memory and per-keystroke CPU
+
+Usage: python bench/search_index.py [--games 10000] [--queries 500]
+
+Seeds --games games into moto with katakana/kanji/latin names, kana
+readings and descriptions, builds the index from a scan, then replays
+type-ahead sessions: every prefix of a random game's reading or name,
+typed as hiragana, katakana or half-width katakana. CPU time per query
+is measured with time.process_time_ns around SearchIndex.search, with
+the version check already satisfied (no DynamoDB call per keystroke).
+The index build is timed separately from the scan that feeds it.
+Sampled prefixes and infixes are checked against a linear scan, in each
+kana form.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+import unicodedata
+from typing import Any, Dict, List
+
+import local_aws
+from helpers import make_game, summary
+from moto import mock_aws
+
+SYLLABLES = list("かきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろ")
+KANJI = list("宝石王国騎士竜城森海星月花雪風火水山島塔都市港街道")
+LATIN = ["Dominion", "Splendor", "Azul", "Ticket", "Pandemic", "Carcassonne", "Agricola"]
+
+
+def to_katakana(text: str) -> str:
+    return "".join(chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in text)
+
+
+def to_half_width(text: str) -> str:
+    # Half-width katakana through the compatibility mapping in reverse
+    table = {unicodedata.normalize("NFKC", chr(c)): chr(c) for c in range(0xFF66, 0xFF9E)}
+    return "".join(table.get(c, c) for c in text)
+
+
+def make_search_game(game_id: int, rng: random.Random) -> Dict[str, Any]:
+    """A game with a katakana, kanji or latin name and its kana reading"""
+    game = make_game(game_id, rng)
+    reading = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 8)))
+    style = rng.random()
+    if style < 0.5:
+        name = to_katakana(reading)
+    elif style < 0.8:
+        prefix = "".join(rng.choice(KANJI) for _ in range(rng.randint(2, 4)))
+        name = f"{prefix}の{to_katakana(reading)}"
+    else:
+        name = f"{rng.choice(LATIN)} {to_katakana(reading)}"
+    description = "".join(rng.choice(SYLLABLES + KANJI) for _ in range(rng.randint(60, 160)))
+    game.update(name=name, title_kana=reading, description=description)
+    return game
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        local_aws.create_tables()
+
+        from cache import catalog_cache
+        from db import board_games_table, scan_items
+        from search import SearchIndex, _document, _term_score
+
+        games = [make_search_game(game_id, rng) for game_id in range(1, args.games + 1)]
+        with board_games_table().batch_writer() as batch:
+            for game in games:
+                batch.put_item(Item=game)
+
+        started = time.perf_counter()
+        scanned = list(scan_items(board_games_table()))
+        scan_seconds = time.perf_counter() - started
+
+        index = SearchIndex(catalog_cache, lambda: scanned)
+        tracemalloc.start()
+        started = time.perf_counter()
+        index.search("", 1)
+        build_seconds = time.perf_counter() - started
+        index_mib = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        cpu_us: List[float] = []
+        typed = 0
+        while typed < args.queries:
+            game = rng.choice(games)
+            text = rng.choice([game["title_kana"], game["name"]])
+            text = rng.choice([lambda t: t, to_katakana, to_half_width])(text)
+            for end in range(1, len(text) + 1):
+                started_ns = time.process_time_ns()
+                results = index.search(text[:end], 20)
+                cpu_us.append((time.process_time_ns() - started_ns) / 1000)
+                typed += 1
+            assert game["id"] in {r["id"] for r in results}, (text, game)
+
+        # Hiragana, katakana and half-width forms of a reading prefix or
+        # infix find the same games, and exactly the best of those a linear
+        # scan matches: every game scoring above the page's worst is on it
+        documents = [_document(game) for game in games]
+        for _ in range(max(1, args.queries // 10)):
+            reading = rng.choice(games)["title_kana"]
+            start = rng.randrange(len(reading)) if rng.random() < 0.5 else 0
+            term = reading[start : start + rng.randint(1, 4)]
+            ids = [r["id"] for r in index.search(term, 20)]
+            for form in (to_katakana, to_half_width):
+                assert [r["id"] for r in index.search(form(term), 20)] == ids, term
+            scores = {d.item["id"]: _term_score(d, term) for d in documents}
+            matches = {item_id for item_id, score in scores.items() if score}
+            assert set(ids) <= matches and len(ids) == min(20, len(matches)), term
+            worst = min(scores[item_id] for item_id in ids)
+            assert {i for i in matches if scores[i] > worst} <= set(ids), term
+
+    report = {
+        "games": args.games,
+        "scan_seconds_moto": round(scan_seconds, 2),
+        "build_seconds": round(build_seconds, 2),
+        "index_mib": round(index_mib, 1),
+        "queries": len(cpu_us),
+        "cpu_us": summary(cpu_us),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
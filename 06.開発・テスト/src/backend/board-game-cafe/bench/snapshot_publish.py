@@ -0,0 +1,220 @@
+"""Check and time the catalog and menu snapshots published to S3, offline
+
+Usage: python bench/snapshot_publish.py [--games 2000] [--menu-items 500] [--rounds 5]
+                                        [--publishers 8]
+
+Runs against moto (DynamoDB and S3) with bench/local_streams.py standing in
+for the stream triggers of snapshots.handler. Checks that:
+
+- the published snapshots hold exactly what GET /boardgames and GET /menu
+  return, and the manifest points at them
+- a write through the API publishes a new snapshot under a new name, while
+  the previous one stays readable for clients still holding the old manifest
+- concurrent or out-of-order publishers leave the manifest at the newest
+  version of each snapshot
+
+and reports the bytes a client downloads from the CDN compared with the
+gzip-compressed pages of the API's list, followed to the last page. Both
+timings (a publish, listing every page on a cache miss) are mostly moto's
+scan; what matters is that the publish runs once per write batch, off the
+request path, while every client that loads the list from the CDN is one
+API invocation fewer.
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import local_aws
+from helpers import make_event, make_game
+from moto import mock_aws
+
+# Keep the EMF lines of the requests out of the report
+os.environ["METRICS_SAMPLE_RATE"] = "0"
+
+
+def call(
+    method: str, path: str, body: Any = None, query: Optional[Dict[str, str]] = None
+) -> Tuple[Dict[str, Any], int, float]:
+    """The parsed body, the bytes sent and the time in ms of one API request"""
+    import handler
+
+    started = time.perf_counter()
+    event = make_event(method, path, query, body, admin=True, headers={"accept-encoding": "gzip"})
+    response = handler.board_game_cafe(event, None)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response["statusCode"] < 300, response
+    raw = response["body"].encode()
+    if response.get("isBase64Encoded"):
+        raw = base64.b64decode(raw)
+    sent = len(raw)
+    if response["headers"].get("Content-Encoding") == "gzip":
+        raw = gzip.decompress(raw)
+    return json.loads(raw), sent, elapsed
+
+
+def list_board_games() -> Tuple[Dict[str, Any], int, float]:
+    """Every game through GET /boardgames, following nextCursor, with the bytes and ms"""
+    from db import MAX_PAGE_LIMIT
+
+    games: Dict[str, Any] = {"boardGames": []}
+    query = {"limit": str(MAX_PAGE_LIMIT)}
+    sent, elapsed = 0, 0.0
+    while True:
+        page, page_sent, page_ms = call("GET", "/boardgames", query=query)
+        games["boardGames"].extend(page["boardGames"])
+        sent, elapsed = sent + page_sent, elapsed + page_ms
+        if not page["nextCursor"]:
+            return games, sent, elapsed
+        query = {**query, "cursor": page["nextCursor"]}
+
+
+def read_manifest() -> Dict[str, Any]:
+    from clients import s3
+    from snapshots import MANIFEST_KEY
+
+    response = s3().get_object(Bucket=os.environ["S3_BUCKET_NAME"], Key=MANIFEST_KEY)
+    return json.loads(response["Body"].read())
+
+
+def read_snapshot(entry: Dict[str, Any]) -> Dict[str, Any]:
+    from clients import s3
+
+    response = s3().get_object(Bucket=os.environ["S3_BUCKET_NAME"], Key=entry["path"][1:])
+    assert response["ContentEncoding"] == "gzip", response
+    assert "immutable" in response["CacheControl"], response
+    return json.loads(gzip.decompress(response["Body"].read()))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2_000)
+    parser.add_argument("--menu-items", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--publishers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        local_aws.create_tables()
+        local_aws.create_bucket()
+
+        import snapshots
+        from db import board_games_table, counters_table, menu_table
+        from local_streams import StreamPump
+
+        with board_games_table().batch_writer() as writer:
+            for game_id in range(1, args.games + 1):
+                writer.put_item(Item=make_game(game_id, rng))
+        with menu_table().batch_writer() as writer:
+            for item_id in range(1, args.menu_items + 1):
+                writer.put_item(
+                    Item={
+                        "id": item_id,
+                        "name": f"メニュー {item_id}",
+                        "price": rng.randint(3, 20) * 100,
+                        "type": rng.choice(["food", "drink"]),
+                    }
+                )
+
+        pumps = [
+            StreamPump(os.environ[name], snapshots.handler, batch_size=1000)
+            for name in ("DYNAMODB_TABLE_NAME", "DYNAMODB_MENU_TABLE_NAME")
+        ]
+        # Bootstrap, as after a deploy
+        snapshots.handler({}, None)
+        manifest = read_manifest()
+
+        # The snapshots are the list responses
+        games, games_sent, _ = list_board_games()
+        menu, menu_sent, _ = call("GET", "/menu")
+        games["boardGames"].sort(key=lambda item: item["id"])
+        menu["menuItems"].sort(key=lambda item: item["id"])
+        assert read_snapshot(manifest["boardGames"]) == games
+        assert read_snapshot(manifest["menuItems"]) == menu
+        assert manifest["boardGames"]["count"] == args.games
+
+        # A write publishes a new snapshot; the previous one stays
+        previous = manifest["boardGames"]
+        created, _, _ = call(
+            "POST",
+            "/boardgames",
+            {
+                "name": "新作",
+                "description": "",
+                "playerMin": 2,
+                "playerMax": 4,
+                "playTime": 30,
+                "imageUrl": "",
+            },
+        )
+        for pump in pumps:
+            pump.pump()
+        manifest = read_manifest()
+        current = manifest["boardGames"]
+        assert current["version"] > previous["version"], manifest
+        assert current["path"] != previous["path"], manifest
+        ids = {item["id"] for item in read_snapshot(current)["boardGames"]}
+        assert created["boardGame"]["id"] in ids
+        assert len(read_snapshot(previous)["boardGames"]) == args.games
+
+        # Concurrent publishers: the manifest ends at the newest version of each
+        names = ["boardGames", "menuItems"] * (args.publishers // 2)
+        with ThreadPoolExecutor(max_workers=args.publishers) as pool:
+            list(pool.map(snapshots.publish, names))
+        manifest = read_manifest()
+        for name in ("boardGames", "menuItems"):
+            counter = counters_table().get_item(Key={"counterName": f"snapshot:{name}"})["Item"]
+            assert manifest[name]["version"] == counter["version"], (manifest, counter)
+
+        publish_ms = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            snapshots.publish("boardGames")
+            publish_ms.append((time.perf_counter() - started) * 1000)
+        list_ms = []
+        for _ in range(args.rounds):
+            from cache import catalog_cache
+
+            catalog_cache.invalidate()
+            list_ms.append(list_board_games()[2])
+        published = read_manifest()
+
+        # A publisher holding an older version does not move the manifest back
+        assert snapshots._record("boardGames", dict(manifest["boardGames"], version=1)) is None
+        # Two publishers uploading in the opposite order to their row updates
+        first = snapshots._record("menuItems", dict(manifest["menuItems"], version=10**6))
+        second = snapshots._record("boardGames", dict(manifest["boardGames"], version=10**6))
+        snapshots._put_manifest(second)
+        snapshots._sync_manifest(first)
+        manifest = read_manifest()
+        assert manifest["boardGames"]["version"] == manifest["menuItems"]["version"] == 10**6
+
+        report = {
+            "games": args.games,
+            "menu_items": args.menu_items,
+            "checks": "ok",
+            "publish_board_games_ms_p50": round(statistics.median(publish_ms), 1),
+            "api_list_board_games_cache_miss_ms_p50": round(statistics.median(list_ms), 1),
+            "board_games_bytes": {
+                "api_gzip": games_sent,
+                "snapshot": previous["bytes"],
+            },
+            "menu_bytes": {"api_gzip": menu_sent, "snapshot": published["menuItems"]["bytes"]},
+            "manifest": published,
+        }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
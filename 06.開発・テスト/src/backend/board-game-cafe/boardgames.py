@@ -2,41 +2,232 @@
 
 import json
 import uuid
-from typing import Any, Dict
+from functools import reduce
+from typing import Any, Dict, List, Optional
 from decimal import Decimal
 
-import boto3
-
-from common import make_response
-
-# AWS resources configuration
-dynamodb = boto3.resource("dynamodb")
-board_games_table = dynamodb.Table("board-games-table")
-s3_client = boto3.client("s3")
-BUCKET_NAME = "board-game-cafe-images"
+from boto3.dynamodb.conditions import Attr, ConditionBase
+
+from bulk import export_items, import_items
+from cache import catalog_cache
+from clients import s3
+from common import EncodedBody, encode_body, make_response
+from config import bucket_name
+from db import (
+    ConditionFailed,
+    NativeTable,
+    board_games_table,
+    conditional_delete,
+    conditional_update,
+    decode_cursor,
+    encode_cursor,
+    parse_limit,
+)
+from ids import id_allocator
+from recommend import recommendation_index
+from search import board_game_index
+
+# AWS resources configuration (clients are created on first use)
 IMAGE_PREFIX = "boardgames/"
 
 
-def get_all_board_game() -> Dict[str, Any]:
-    """Get all board games"""
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+DEFAULT_RECOMMEND_LIMIT = 10
+# Scan pages read past per list request when a filter matches nothing
+MAX_SCAN_PAGES = 10
+
+# Difficulty filter values used by the frontend FilterMenu
+DIFFICULTY_LEVELS = {"beginner": 1, "intermediate": 2, "advanced": 3}
+
+REQUIRED_FIELDS = ["name", "description", "playerMin", "playerMax", "playTime", "imageUrl"]
+# Columns of the bulk export, in order
+EXPORT_FIELDS = [
+    "id",
+    *REQUIRED_FIELDS,
+    "title_kana",
+    "difficulty",
+    "gameType",
+    "recommendation",
+]
+NUMERIC_FIELDS = ["playerMin", "playerMax", "playTime", "difficulty", "recommendation"]
+
+
+def _split(value: str) -> List[str]:
+    """Split a comma-separated query parameter"""
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _difficulty_levels(value: str) -> List[int]:
+    """Parse difficulty filter values, by FilterMenu name or level number"""
+    return [DIFFICULTY_LEVELS[v] if v in DIFFICULTY_LEVELS else int(v) for v in _split(value)]
+
+
+def _build_filter(
+    players: Optional[str],
+    play_time: Optional[str],
+    difficulty: Optional[str],
+    game_type: Optional[str],
+) -> Optional[ConditionBase]:
+    """Build a scan FilterExpression from the list query parameters"""
+    conditions = []
+
+    if players:
+        count = int(players)
+        conditions.append(Attr("playerMin").lte(count) & Attr("playerMax").gte(count))
+
+    if play_time:
+        # Ranges use the FilterMenu format, e.g. "30to60", OR-ed together
+        ranges = []
+        for value in _split(play_time):
+            low, _, high = value.partition("to")
+            ranges.append(Attr("playTime").between(int(low), int(high)))
+        conditions.append(reduce(lambda a, b: a | b, ranges))
+
+    if difficulty:
+        conditions.append(Attr("difficulty").is_in(_difficulty_levels(difficulty)))
+
+    if game_type:
+        conditions.append(Attr("gameType").is_in(_split(game_type)))
+
+    if not conditions:
+        return None
+    return reduce(lambda a, b: a & b, conditions)
+
+
+def get_all_board_game(
+    limit: Optional[str] = None,
+    cursor: Optional[str] = None,
+    players: Optional[str] = None,
+    play_time: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    game_type: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Get a page of board games, optionally filtered
+
+    A page is one DynamoDB scan page of limit games, however large the
+    catalog; clients wanting every game load the snapshot published to the
+    CDN (snapshots.py). A filtered page can hold fewer than limit games:
+    scan pages that match nothing are read past, up to MAX_SCAN_PAGES of
+    them, so a page can be empty with a nextCursor to continue from.
+    """
     try:
-        response = board_games_table.scan()
+        try:
+            page_limit = parse_limit(limit)
+            start_key = decode_cursor(cursor)
+            filter_expression = _build_filter(players, play_time, difficulty, game_type)
+        except (KeyError, ValueError) as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        cache_key = ("list", page_limit, cursor, players, play_time, difficulty, game_type)
+        body, hit = catalog_cache.get(
+            cache_key,
+            lambda: encode_body(_load_board_games(filter_expression, page_limit, start_key)),
+        )
+
+        return make_response(200, body, catalog_cache.headers(hit))
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
+
+
+def _load_board_games(
+    filter_expression: Optional[ConditionBase],
+    page_limit: int,
+    start_key: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Read one page of the board game list response body from DynamoDB"""
+    scan_kwargs: Dict[str, Any] = {"Limit": page_limit}
+    if filter_expression is not None:
+        scan_kwargs["FilterExpression"] = filter_expression
+
+    table = NativeTable(board_games_table())
+    for _ in range(MAX_SCAN_PAGES):
+        if start_key:
+            scan_kwargs["ExclusiveStartKey"] = start_key
+        response = table.scan(**scan_kwargs)
+        start_key = response.get("LastEvaluatedKey")
         board_games = response.get("Items", [])
+        if board_games or start_key is None:
+            break
+
+    return {"boardGames": board_games, "nextCursor": encode_cursor(start_key)}
+
+
+def search_board_games(q: str = "", limit: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Search board games by name, kana reading and description, best match first
+
+    Answered from the container's search index (search.py) without reading
+    DynamoDB, except to rebuild the index after another container's write.
+    """
+    try:
+        try:
+            page_limit = parse_limit(limit, MAX_SEARCH_LIMIT, DEFAULT_SEARCH_LIMIT)
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        board_games = board_game_index.search(q, page_limit)
 
         return make_response(200, {"boardGames": board_games})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
+def recommend_board_games(
+    players: Optional[str] = None,
+    max_time: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    game_type: Optional[str] = None,
+    limit: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Recommend board games for a group of players and a time limit in minutes
+
+    Answered from the container's bitmap index (recommend.py); total is the
+    number of games matching the filters, of which the best limit are listed.
+    """
+    try:
+        try:
+            player_count = int(players) if players else None
+            time_limit = int(max_time) if max_time else None
+            if (player_count is not None and player_count < 1) or (
+                time_limit is not None and time_limit < 1
+            ):
+                raise ValueError("players and max_time must be positive")
+            levels = _difficulty_levels(difficulty) if difficulty else None
+            page_limit = parse_limit(limit, MAX_SEARCH_LIMIT, DEFAULT_RECOMMEND_LIMIT)
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        board_games, total = recommendation_index.recommend(
+            player_count,
+            time_limit,
+            levels,
+            _split(game_type) if game_type else None,
+            page_limit,
+        )
+
+        return make_response(200, {"boardGames": board_games, "total": total})
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
+
+
 def get_board_game(board_game_id: int) -> Dict[str, Any]:
     """Get a specific board game by ID"""
     try:
-        response = board_games_table.get_item(Key={"id": board_game_id})
+        def load() -> Optional[EncodedBody]:
+            response = NativeTable(board_games_table()).get_item(Key={"id": board_game_id})
+            if "Item" not in response:
+                return None
+            return encode_body({"boardGame": response["Item"]})
+
+        body, hit = catalog_cache.get(("item", board_game_id), load)
 
-        if "Item" not in response:
+        if body is None:
             return make_response(404, {"error": "Board game not found"})
 
-        return make_response(200, {"boardGame": response["Item"]})
+        return make_response(200, body, catalog_cache.headers(hit))
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
@@ -47,58 +238,77 @@ def post_board_game(event: Dict[str, Any]) -> Dict[str, Any]:
         body = json.loads(event["body"])
 
         # Validate required fields
-        required_fields = [
-            "name",
-            "description",
-            "playerMin",
-            "playerMax",
-            "playTime",
-            "imageUrl",
-        ]
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in body:
                 return make_response(400, {"error": f"Missing required field: {field}"})
 
         # Generate new ID
-        all_games = board_games_table.scan().get("Items", [])
-        new_id = 1
-        if all_games:
-            existing_ids = [game.get("id", 0) for game in all_games]
-            new_id = max(existing_ids) + 1
-
-        # Convert numeric fields to Decimal for DynamoDB
-        board_game_item = {
-            "id": new_id,
-            "name": body["name"],
-            "description": body["description"],
-            "playerMin": Decimal(str(body["playerMin"])),
-            "playerMax": Decimal(str(body["playerMax"])),
-            "playTime": Decimal(str(body["playTime"])),
-            "imageUrl": body["imageUrl"],
-            "difficulty": Decimal(str(body.get("difficulty", 1))),
-            "gameType": body.get("gameType", "その他"),
-        }
-
-        board_games_table.put_item(Item=board_game_item)
+        new_id = id_allocator.allocate("boardgames", board_games_table())
+        board_game_item = {"id": new_id, **_board_game_fields(body)}
+
+        board_games_table().put_item(
+            Item=board_game_item, ConditionExpression="attribute_not_exists(id)"
+        )
+        version = catalog_cache.invalidate()
+        board_game_index.upsert(board_game_item, version)
+        recommendation_index.upsert(board_game_item, version)
 
         return make_response(201, {"boardGame": board_game_item})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
+def _board_game_fields(body: Dict[str, Any]) -> Dict[str, Any]:
+    """The attributes of a new board game item, without its id"""
+    # Convert numeric fields to Decimal for DynamoDB
+    fields = {
+        "name": body["name"],
+        "description": body["description"],
+        "playerMin": Decimal(str(body["playerMin"])),
+        "playerMax": Decimal(str(body["playerMax"])),
+        "playTime": Decimal(str(body["playTime"])),
+        "imageUrl": body["imageUrl"],
+        "difficulty": Decimal(str(body.get("difficulty", 1))),
+        "gameType": body.get("gameType", "その他"),
+    }
+    if body.get("title_kana"):
+        # Reading of the name in kana, used by search
+        fields["title_kana"] = body["title_kana"]
+    if "recommendation" in body:
+        # Staff recommendation, ranks recommend_board_games results
+        fields["recommendation"] = Decimal(str(body["recommendation"]))
+    return fields
+
+
+def import_board_games(event: Dict[str, Any], format: Optional[str] = None) -> Dict[str, Any]:
+    """Create board games from an NDJSON or CSV body (format=ndjson|csv)"""
+    return import_items(
+        event,
+        format,
+        board_games_table(),
+        "boardgames",
+        REQUIRED_FIELDS,
+        _board_game_fields,
+        catalog_cache,
+    )
+
+
+def export_board_games(
+    format: Optional[str] = None, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """Export every board game as NDJSON or CSV (format=ndjson|csv)"""
+    return export_items(board_games_table(), EXPORT_FIELDS, format, cursor)
+
+
 def put_board_game(board_game_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
     """Update an existing board game"""
     try:
-        # Check if board game exists
-        response = board_games_table.get_item(Key={"id": board_game_id})
-        if "Item" not in response:
-            return make_response(404, {"error": "Board game not found"})
-
         # Get update data
         body = json.loads(event["body"])
 
         # Update board game
         update_expression = "SET "
+        expression_attribute_names = {}
         expression_attribute_values = {}
 
         update_fields = [
@@ -110,31 +320,41 @@ def put_board_game(board_game_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
             "imageUrl",
             "difficulty",
             "gameType",
+            "title_kana",
+            "recommendation",
         ]
 
         for field in update_fields:
             if field in body:
-                update_expression += f"{field} = :{field}, "
+                update_expression += f"#{field} = :{field}, "
+                expression_attribute_names[f"#{field}"] = field
                 # Convert numeric values to Decimal
-                if field in ["playerMin", "playerMax", "playTime", "difficulty"]:
+                if field in NUMERIC_FIELDS:
                     expression_attribute_values[f":{field}"] = Decimal(str(body[field]))
                 else:
                     expression_attribute_values[f":{field}"] = body[field]
 
+        if not expression_attribute_values:
+            return make_response(400, {"error": "No fields to update"})
+
         # Remove trailing comma and space
         update_expression = update_expression.rstrip(", ")
 
-        board_games_table.update_item(
-            Key={"id": board_game_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="ALL_NEW",
-        )
-
-        # Get updated item
-        updated_response = board_games_table.get_item(Key={"id": board_game_id})
+        try:
+            board_game = conditional_update(
+                board_games_table(),
+                {"id": board_game_id},
+                update_expression,
+                names=expression_attribute_names,
+                values=expression_attribute_values,
+            )
+        except ConditionFailed:
+            return make_response(404, {"error": "Board game not found"})
+        version = catalog_cache.invalidate()
+        board_game_index.upsert(board_game, version)
+        recommendation_index.upsert(board_game, version)
 
-        return make_response(200, {"boardGame": updated_response["Item"]})
+        return make_response(200, {"boardGame": board_game})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
@@ -142,13 +362,12 @@ def put_board_game(board_game_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
 def delete_board_game(board_game_id: int) -> Dict[str, Any]:
     """Delete a board game"""
     try:
-        # Check if board game exists
-        response = board_games_table.get_item(Key={"id": board_game_id})
-        if "Item" not in response:
+        # Delete the board game if it exists
+        if not conditional_delete(board_games_table(), {"id": board_game_id}):
             return make_response(404, {"error": "Board game not found"})
-
-        # Delete the board game
-        board_games_table.delete_item(Key={"id": board_game_id})
+        version = catalog_cache.invalidate()
+        board_game_index.remove(board_game_id, version)
+        recommendation_index.remove(board_game_id, version)
 
         return make_response(200, {"message": "Board game deleted successfully"})
     except Exception as e:
@@ -170,14 +389,14 @@ def get_presigned_url(event: Dict[str, Any]) -> Dict[str, Any]:
         key = f"{IMAGE_PREFIX}{file_name}"
 
         # Generate presigned URL
-        presigned_url = s3_client.generate_presigned_url(
+        presigned_url = s3().generate_presigned_url(
             "put_object",
-            Params={"Bucket": BUCKET_NAME, "Key": key, "ContentType": file_type},
+            Params={"Bucket": bucket_name, "Key": key, "ContentType": file_type},
             ExpiresIn=300,  # URL expires in 5 minutes
         )
 
         # Generate the URL that will be used to access the image
-        image_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{key}"
+        image_url = f"https://{bucket_name}.s3.amazonaws.com/{key}"
 
         return make_response(200, {"uploadUrl": presigned_url, "imageUrl": image_url})
     except Exception as e:
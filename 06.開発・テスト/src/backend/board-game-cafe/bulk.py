@@ -0,0 +1,201 @@
+"""Bulk import and export of catalog tables for the board game cafe API"""
+
+import base64
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cache import VersionedCache
+from common import DecimalEncoder, encode_text, make_response
+from db import NativeTable, decode_cursor, encode_cursor, scan_pages
+from ids import id_allocator
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Stop reporting after this many invalid rows
+MAX_ERRORS = 100
+# Lambda responses are capped at 6 MB; larger exports continue with a cursor
+MAX_EXPORT_BYTES = 5 * 1024 * 1024
+
+ItemBuilder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def parse_bool(value: Any) -> bool:
+    """Parse a boolean from JSON or from a CSV cell (true/false, 1/0, yes/no)"""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes"):
+        return True
+    if text in ("false", "0", "no"):
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+
+def _request_format(event: Dict[str, Any], format: Optional[str]) -> str:
+    """The import format from the format parameter, else the Content-Type"""
+    if format is None:
+        content_type = (event.get("headers") or {}).get("content-type", "")
+        format = "csv" if content_type.startswith("text/csv") else "ndjson"
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return format
+
+
+def _request_text(event: Dict[str, Any]) -> str:
+    """The request body as text; function URLs base64-encode non-text bodies"""
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body).decode("utf-8-sig")
+    return body.removeprefix("\ufeff")
+
+
+def _rows(text: str, format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line number, row) pairs
+
+    CSV rows are dicts; NDJSON rows are the raw lines, parsed by _parse_row
+    so a bad line is reported like any bad row.
+    """
+    if format == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if k and v is not None}
+        return
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def _parse_row(row: Any, required_fields: List[str]) -> Dict[str, Any]:
+    """A row as a dict; empty optional CSV cells are left out to get their defaults"""
+    if isinstance(row, str):
+        row = json.loads(row)
+        if not isinstance(row, dict):
+            raise ValueError("Expected a JSON object")
+        return row
+    return {k: v for k, v in row.items() if v != "" or k in required_fields}
+
+
+def import_items(
+    event: Dict[str, Any],
+    format: Optional[str],
+    table: Any,
+    counter_name: str,
+    required_fields: List[str],
+    build_item: ItemBuilder,
+    cache: VersionedCache,
+) -> Dict[str, Any]:
+    """
+    Validate every row, then write them all with freshly allocated IDs
+
+    Nothing is written unless every row is valid. An id column (as in an
+    export) is ignored: the IDs come from one block reserved with the ID
+    allocator, and batch_writer sends the items 25 at a time, resending any
+    unprocessed ones.
+    """
+    try:
+        try:
+            rows = _rows(_request_text(event), _request_format(event, format))
+            items = []
+            errors: List[Dict[str, Any]] = []
+            for line_number, row in rows:
+                try:
+                    row = _parse_row(row, required_fields)
+                    missing = [f for f in required_fields if f not in row]
+                    if missing:
+                        raise ValueError(f"Missing required field: {', '.join(missing)}")
+                    item = build_item(row)
+                    if any(isinstance(v, Decimal) and not v.is_finite() for v in item.values()):
+                        raise ValueError("Numbers must be finite")
+                    items.append(item)
+                except InvalidOperation:
+                    errors.append({"line": line_number, "error": "Invalid number"})
+                except (ValueError, TypeError) as e:
+                    errors.append({"line": line_number, "error": str(e) or type(e).__name__})
+                if len(errors) == MAX_ERRORS:
+                    break
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return make_response(400, {"error": f"Invalid import body: {e}"})
+
+        if errors:
+            return make_response(
+                400, {"error": "Invalid rows, nothing imported", "errors": errors}
+            )
+        if not items:
+            return make_response(400, {"error": "No rows to import"})
+
+        ids = id_allocator.allocate_many(counter_name, len(items), table)
+        with table.batch_writer() as batch:
+            for item_id, item in zip(ids, items):
+                batch.put_item(Item={"id": item_id, **item})
+        cache.invalidate()
+
+        return make_response(
+            201, {"imported": len(items), "firstId": ids[0], "lastId": ids[-1]}
+        )
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
+
+
+def export_items(
+    table: Any,
+    fields: List[str],
+    format: Optional[str],
+    cursor: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Export a catalog table as NDJSON or CSV (with a header row)
+
+    Items are serialized one by one as the scan pages arrive, without
+    holding the item list. When the body would grow past MAX_EXPORT_BYTES it
+    ends early and the X-Next-Cursor header holds the cursor to continue from.
+    """
+    try:
+        try:
+            format = format or "ndjson"
+            if format not in FORMATS:
+                raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+            start_key = decode_cursor(cursor)
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        line = io.StringIO()
+        writer = csv.DictWriter(line, fieldnames=fields, extrasaction="ignore")
+
+        def serialize(item: Dict[str, Any]) -> str:
+            if format == "ndjson":
+                return json.dumps(item, cls=DecimalEncoder, ensure_ascii=False) + "\n"
+            line.seek(0)
+            line.truncate()
+            writer.writerow(item)
+            return line.getvalue()
+
+        chunks: List[str] = []
+        if format == "csv":
+            chunks.append(",".join(fields) + "\r\n")
+        size = 0
+        last_key: Optional[Dict[str, Any]] = None
+        truncated = False
+        scan_kwargs: Dict[str, Any] = {}
+        if start_key:
+            scan_kwargs["ExclusiveStartKey"] = start_key
+        for page in scan_pages(NativeTable(table), **scan_kwargs):
+            for item in page.get("Items", []):
+                text = serialize(item)
+                size += len(text.encode())
+                if size > MAX_EXPORT_BYTES:
+                    truncated = True
+                    break
+                chunks.append(text)
+                last_key = {"id": item["id"]}
+            if truncated:
+                break
+
+        headers = {"Content-Type": f"{FORMATS[format]}; charset=utf-8"}
+        if truncated and last_key:
+            headers["X-Next-Cursor"] = encode_cursor(last_key)
+        return make_response(200, encode_text("".join(chunks)), headers)
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
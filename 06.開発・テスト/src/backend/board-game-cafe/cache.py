@@ -0,0 +1,169 @@
+"""In-process read-through cache shared across warm Lambda invocations"""
+
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from db import counters_table
+
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "10"))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "256"))
+
+
+class VersionedCache:
+    """
+    Module-level cache for one namespace (e.g. the board game catalog)
+
+    Entries are trusted for ttl seconds. After that the namespace version
+    stamp is read from the counters table (a single GetItem) and the entries
+    are dropped only if another container has bumped it in the meantime.
+    Write paths call invalidate() to bump the stamp.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Hashable, Any] = {}
+        self._version: Optional[int] = None
+        self._checked_at = float("-inf")
+
+    @property
+    def _key(self) -> Dict[str, str]:
+        return {"counterName": f"version:{self.namespace}"}
+
+    def _load_version(self) -> int:
+        response = counters_table().get_item(
+            Key=self._key, ProjectionExpression="version", ConsistentRead=True
+        )
+        return int(response.get("Item", {}).get("version", 0))
+
+    def _revalidate(self) -> None:
+        """Drop all entries if the version stamp changed since the last check"""
+        now = time.monotonic()
+        if now - self._checked_at < self.ttl:
+            return
+        version = self._load_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        self._checked_at = now
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return (value, hit) for key, calling loader on a miss
+
+        A loader result of None (e.g. item not found) is not cached.
+        """
+        self._revalidate()
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key], True
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            if len(self._entries) >= self.max_entries:
+                # Evict the oldest entry (dicts keep insertion order)
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = value
+        return value, False
+
+    def current_version(self) -> int:
+        """The version stamp, read again once ttl seconds have passed"""
+        self._revalidate()
+        return self._version
+
+    def invalidate(self) -> int:
+        """Clear local entries and bump the shared version stamp, returning it"""
+        self._entries.clear()
+        response = counters_table().update_item(
+            Key=self._key,
+            UpdateExpression="ADD version :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        self._version = int(response["Attributes"]["version"])
+        self._checked_at = time.monotonic()
+        return self._version
+
+    def headers(self, hit: bool) -> Dict[str, str]:
+        """Response headers reporting the cache result and container counters"""
+        return {
+            "X-Cache": "HIT" if hit else "MISS",
+            "X-Cache-Stats": f"hits={self.hits}, misses={self.misses}",
+        }
+
+
+class VersionedIndex(ABC):
+    """
+    Base for in-memory indexes over a table, kept in the warm container
+
+    The index is built from load() on first use and follows the version
+    stamp of a VersionedCache: writes made through this container apply
+    their item in place (upsert / remove, with the version invalidate()
+    returned), and a version bumped by another container makes the next
+    ensure_current() rebuild it.
+    """
+
+    def __init__(self, cache: VersionedCache, load: Callable[[], Iterable[Dict[str, Any]]]):
+        self._cache = cache
+        self._load = load
+        self._built = False
+        self._version: Optional[int] = None
+        self.builds = 0
+
+    @abstractmethod
+    def _build(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Replace the index with one over items"""
+
+    @abstractmethod
+    def _add(self, item: Dict[str, Any]) -> None:
+        """Index an item that is not in the index"""
+
+    @abstractmethod
+    def _discard(self, item_id: Any) -> None:
+        """Remove an item from the index, if it is there"""
+
+    def ensure_current(self) -> None:
+        """Rebuild the index if it is missing or another container wrote"""
+        version = self._cache.current_version()
+        if not self._built or version != self._version:
+            self._build(self._load())
+            self._built = True
+            self._version = version
+            self.builds += 1
+
+    def _follows(self, version: int) -> bool:
+        """Whether a write that produced version can be applied in place"""
+        if not self._built:
+            return False
+        if self._version is None or version != self._version + 1:
+            # Another container wrote in between; rebuild on the next use
+            self._built = False
+            return False
+        self._version = version
+        return True
+
+    def upsert(self, item: Dict[str, Any], version: int) -> None:
+        """Apply a created or updated item written as the given version"""
+        if self._follows(version):
+            self._discard(item["id"])
+            self._add(item)
+
+    def remove(self, item_id: Any, version: int) -> None:
+        """Apply a deleted item written as the given version"""
+        if self._follows(version):
+            self._discard(item_id)
+
+
+catalog_cache = VersionedCache("boardgames")
+menu_cache = VersionedCache("menu")
@@ -0,0 +1,229 @@
+"""Order change feed for the board game cafe API
+
+A DynamoDB Streams consumer (handler) turns every order insert, status
+change and delete into a numbered change row on two channels, one for the
+table and one for the session. Clients long-poll get_changes with the last
+sequence number they saw. While nothing changes, waiting costs one GetItem
+of a tiny head row per poll interval, instead of a query that reads every
+order of the table.
+"""
+
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from common import make_response
+from db import changes_table
+
+CHANGE_RETENTION_SECONDS = int(os.environ.get("CHANGE_RETENTION_SECONDS", "86400"))
+# The wait between checks doubles from the first to the max poll interval
+FIRST_POLL_SECONDS = 0.25
+CHANGE_POLL_SECONDS = float(os.environ.get("CHANGE_POLL_SECONDS", "2.0"))
+MAX_WAIT_SECONDS = 20
+MAX_CHANGES = 100
+# A missing sequence number younger than this is a write still in flight
+GAP_GRACE_SECONDS = 5
+
+_deserializer = TypeDeserializer()
+
+
+def _image(record: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    raw = record["dynamodb"].get(name)
+    if not raw:
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in raw.items()}
+
+
+def order_change(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The change published for one orders stream record, or None to skip it"""
+    new = _image(record, "NewImage")
+    old = _image(record, "OldImage")
+    order = new or old
+    if order is None:
+        return None
+    if new and old and new.get("status") == old.get("status"):
+        return None
+
+    change = {
+        "event": record["eventName"].lower(),
+        "orderId": order["orderId"],
+        "tableNumber": order["tableNumber"],
+        "sessionId": order["sessionId"],
+        "status": order.get("status"),
+        "updatedAt": order.get("updatedAt"),
+    }
+    if old:
+        change["previousStatus"] = old.get("status")
+    return change
+
+
+def table_channel(table_number: Any) -> str:
+    return f"table#{int(table_number)}"
+
+
+def session_channel(session_id: str) -> str:
+    return f"session#{session_id}"
+
+
+def _next_seq(channel: str) -> int:
+    """Allocate the next sequence number of a channel"""
+    # The head row (seq 0) holds the last sequence number of the channel
+    return int(
+        changes_table().update_item(
+            Key={"channel": channel, "seq": 0},
+            UpdateExpression="ADD lastSeq :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )["Attributes"]["lastSeq"]
+    )
+
+
+def publish(channel: str, change: Dict[str, Any], seq: Optional[int] = None) -> int:
+    """Write a change to a channel as seq, or as the next number, returning it"""
+    if seq is None:
+        seq = _next_seq(channel)
+    now = int(time.time())
+    changes_table().put_item(
+        Item={
+            **change,
+            "channel": channel,
+            "seq": seq,
+            "publishedAt": now,
+            "expiresAt": now + CHANGE_RETENTION_SECONDS,
+        }
+    )
+    return seq
+
+
+def handler(event: Dict[str, Any], context: Any) -> None:
+    """
+    DynamoDB Streams consumer for the orders table
+
+    Lambda retries a failed batch from its first record, so each record
+    is published idempotently: the sequence number a change gets on a
+    channel is stored on a row keyed by the record's eventID, and a retry
+    rewrites the change under that number instead of appending it again.
+    """
+    for record in event["Records"]:
+        change = order_change(record)
+        if change is None:
+            continue
+        key = {"channel": f"event#{record['eventID']}", "seq": 0}
+        published = changes_table().get_item(Key=key, ConsistentRead=True).get("Item", {})
+        for channel in (table_channel(change["tableNumber"]), session_channel(change["sessionId"])):
+            seq = published.get(channel)
+            if seq is None:
+                seq = _next_seq(channel)
+                changes_table().update_item(
+                    Key=key,
+                    UpdateExpression="SET #channel = :seq, expiresAt = :expires",
+                    ExpressionAttributeNames={"#channel": channel},
+                    ExpressionAttributeValues={
+                        ":seq": seq,
+                        ":expires": int(time.time()) + CHANGE_RETENTION_SECONDS,
+                    },
+                )
+            publish(channel, change, int(seq))
+
+
+def _head(channel: str) -> int:
+    response = changes_table().get_item(
+        Key={"channel": channel, "seq": 0}, ProjectionExpression="lastSeq"
+    )
+    return int(response.get("Item", {}).get("lastSeq", 0))
+
+
+def _read_after(channel: str, after: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Changes with seq > after, stopping at the first missing number
+
+    Returns the contiguous changes and whether the client has to reload
+    because the change it needs next has expired.
+    """
+    items = changes_table().query(
+        KeyConditionExpression="channel = :channel AND seq > :after",
+        ExpressionAttributeValues={":channel": channel, ":after": after},
+        Limit=MAX_CHANGES,
+    ).get("Items", [])
+
+    changes = []
+    expected = after + 1
+    for item in items:
+        if item["seq"] != expected:
+            break
+        changes.append(item)
+        expected += 1
+
+    reset = (
+        not changes
+        and bool(items)
+        and items[0]["publishedAt"] < time.time() - GAP_GRACE_SECONDS
+    )
+    for change in changes:
+        del change["channel"], change["expiresAt"]
+    return changes, reset
+
+
+def get_changes(
+    table_number: Optional[str] = None,
+    session_id: Optional[str] = None,
+    after: Optional[str] = None,
+    wait: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Long-poll the order changes of a table or a session
+
+    Without after, the current sequence number is returned at once so the
+    client can load the orders and then wait for changes after it. With
+    after, the request returns as soon as there is a change after it, or
+    with no changes when wait seconds pass. reset means changes were lost
+    (expired) and the client should reload the orders.
+    """
+    try:
+        try:
+            if (table_number is None) == (session_id is None):
+                raise ValueError("give exactly one of table_number and session_id")
+            channel = (
+                table_channel(table_number)
+                if table_number is not None
+                else session_channel(session_id)
+            )
+            after_seq = int(after) if after is not None else None
+            if after_seq is not None and after_seq < 0:
+                raise ValueError("after must not be negative")
+            wait_seconds = float(wait) if wait else MAX_WAIT_SECONDS
+            if not math.isfinite(wait_seconds) or wait_seconds < 0:
+                raise ValueError("wait must be a non-negative number of seconds")
+            wait_seconds = min(wait_seconds, MAX_WAIT_SECONDS)
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        if after_seq is None:
+            return make_response(200, {"changes": [], "seq": _head(channel)})
+
+        deadline = time.monotonic() + wait_seconds
+        interval = FIRST_POLL_SECONDS
+        while True:
+            head = _head(channel)
+            if head < after_seq:
+                # The client is ahead of the channel, its seq is stale or made up
+                return make_response(200, {"changes": [], "seq": head, "reset": True})
+            if head > after_seq:
+                changes, reset = _read_after(channel, after_seq)
+                if reset:
+                    return make_response(200, {"changes": [], "seq": head, "reset": True})
+                if changes:
+                    return make_response(
+                        200, {"changes": changes, "seq": int(changes[-1]["seq"])}
+                    )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return make_response(200, {"changes": [], "seq": after_seq})
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, CHANGE_POLL_SECONDS)
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
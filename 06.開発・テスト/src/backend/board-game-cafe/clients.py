@@ -0,0 +1,72 @@
+"""Shared, lazily created AWS clients for the board game cafe API
+
+Nothing is created at import time: each client is built on first use and
+then reused by every module for the lifetime of the warm container, so a
+cold start only pays for the clients the first request actually needs.
+"""
+
+import os
+from functools import lru_cache
+from typing import Any
+
+import boto3
+from botocore.config import Config
+
+from metrics import instrument
+
+AWS_REGION = os.environ.get("AWS_REGION", "ap-northeast-1")
+
+# Point the clients at DynamoDB Local, moto server, etc. for offline runs
+DYNAMODB_ENDPOINT_URL = os.environ.get("DYNAMODB_ENDPOINT_URL") or None
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+
+# Connection reuse and tight timeouts suit short Lambda requests
+client_config = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10")),
+    tcp_keepalive=True,
+    connect_timeout=float(os.environ.get("AWS_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.environ.get("AWS_READ_TIMEOUT", "5")),
+    retries={"max_attempts": 3, "mode": "standard"},
+)
+
+
+@lru_cache(maxsize=None)
+def dynamodb() -> Any:
+    """The shared DynamoDB resource"""
+    resource = boto3.resource(
+        "dynamodb", endpoint_url=DYNAMODB_ENDPOINT_URL, config=client_config
+    )
+    instrument(resource.meta.client)
+    return resource
+
+
+def new_dynamodb_client() -> Any:
+    """A low-level DynamoDB client of its own, for callers that register event hooks on it"""
+    return instrument(
+        boto3.client("dynamodb", endpoint_url=DYNAMODB_ENDPOINT_URL, config=client_config)
+    )
+
+
+@lru_cache(maxsize=None)
+def dynamodb_client() -> Any:
+    """The shared low-level DynamoDB client, without the resource's Decimal conversion"""
+    return new_dynamodb_client()
+
+
+@lru_cache(maxsize=None)
+def dynamodb_table(name: str) -> Any:
+    """A DynamoDB Table object on the shared resource"""
+    return dynamodb().Table(name)
+
+
+@lru_cache(maxsize=None)
+def s3() -> Any:
+    """The shared S3 client (SigV4, as presigned URLs require)"""
+    return instrument(
+        boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            config=client_config.merge(Config(signature_version="s3v4")),
+        )
+    )
@@ -1,10 +1,23 @@
 """Common utilities for the board game cafe API"""
 
+import base64
+import gzip
+import hashlib
 import json
+from collections import OrderedDict
 from decimal import Decimal
-from typing import Any, Dict
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
 
-from config import ALLOW_ORIGIN
+from config import ALLOW_ORIGIN, COMPRESS_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Compressed bodies of cacheable (ETag) responses, by ETag and encoding
+MAX_COMPRESSED_ENTRIES = 64
+_compressed: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -16,15 +29,149 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(o)
 
 
-def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+class EncodedBody(NamedTuple):
+    """A response body serialized once, with a strong ETag of its content"""
+
+    text: str
+    etag: str
+
+
+def encode_body(body: Dict[str, Any]) -> EncodedBody:
+    """Serialize a response body so it can be cached and served repeatedly"""
+    return encode_text(json.dumps(body, cls=DecimalEncoder, ensure_ascii=False))
+
+
+def encode_text(text: str) -> EncodedBody:
+    """Wrap an already serialized body (JSON or not) with its ETag"""
+    etag = '"' + hashlib.sha256(text.encode()).hexdigest()[:32] + '"'
+    return EncodedBody(text, etag)
+
+
+def make_response(
+    status_code: int,
+    body: Union[Dict[str, Any], EncodedBody],
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
     """Helper function to make API response"""
+    response_headers = {
+        "Content-Type": "application/json",
+        "Access-Control-Allow-Origin": ALLOW_ORIGIN,
+        "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+        "Access-Control-Allow-Headers": "Origin, Accept, Content-Type, x-api-key, Authorization, If-None-Match",
+        "Access-Control-Expose-Headers": "ETag, X-Cache, X-Cache-Stats, X-Next-Cursor",
+    }
+    if isinstance(body, EncodedBody):
+        response_headers["ETag"] = body.etag
+        # Let clients keep the body but revalidate it on every request
+        response_headers["Cache-Control"] = "no-cache"
+        text = body.text
+    else:
+        text = json.dumps(body, cls=DecimalEncoder, ensure_ascii=False)
+    if headers:
+        response_headers.update(headers)
     return {
         "statusCode": status_code,
-        "body": json.dumps(body, cls=DecimalEncoder, ensure_ascii=False),
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": ALLOW_ORIGIN,
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Origin, Accept, Content-Type, x-api-key, Authorization",
-        },
+        "body": text,
+        "headers": response_headers,
     }
+
+
+def not_modified(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a 200 response into a bodyless 304 if If-None-Match matches its ETag"""
+    etag = response["headers"].get("ETag")
+    if response["statusCode"] != 200 or not etag:
+        return response
+
+    if_none_match = (event.get("headers") or {}).get("if-none-match")
+    if not if_none_match:
+        return response
+
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if "*" not in candidates and etag not in candidates:
+        return response
+
+    headers = dict(response["headers"])
+    headers.pop("Content-Type", None)
+    return {"statusCode": 304, "body": "", "headers": headers}
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The best coding we can produce for Accept-Encoding, brotli first"""
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in ["br", "gzip"] if brotli is not None else ["gzip"]:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compress(data: bytes, coding: str) -> bytes:
+    if coding == "br":
+        # Quality 5 compresses close to the maximum at a fraction of its CPU
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compress a response body for the request's Accept-Encoding
+
+    Bodies under COMPRESS_MIN_BYTES are sent as they are. Compressed bodies
+    are base64-encoded, as Lambda function URLs require for binary bodies,
+    and those with an ETag (cacheable responses) are kept by ETag so a
+    repeated list response is compressed only once per container. The ETag
+    becomes weak: it names the content, not the compressed bytes.
+    """
+    body = response.get("body")
+    headers = response.get("headers") or {}
+    if (
+        not isinstance(body, str)
+        or response.get("isBase64Encoded")
+        or "Content-Encoding" in headers
+    ):
+        return response
+    data = body.encode()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    coding = _choose_encoding((event.get("headers") or {}).get("accept-encoding", ""))
+    if coding is None:
+        return {**response, "headers": headers}
+
+    etag = headers.get("ETag")
+    encoded = _compressed.get((etag, coding)) if etag else None
+    if encoded is None:
+        encoded = base64.b64encode(_compress(data, coding)).decode()
+        if etag:
+            _compressed[(etag, coding)] = encoded
+            if len(_compressed) > MAX_COMPRESSED_ENTRIES:
+                _compressed.popitem(last=False)
+    elif etag:
+        _compressed.move_to_end((etag, coding))
+
+    headers["Content-Encoding"] = coding
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+    return {**response, "body": encoded, "headers": headers, "isBase64Encoded": True}
@@ -0,0 +1,408 @@
+"""DynamoDB helpers for the board game cafe API"""
+
+import base64
+import binascii
+import json
+import time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from clients import dynamodb_table, new_dynamodb_client
+from common import DecimalEncoder
+from config import (
+    changes_table_name,
+    counters_table_name,
+    menu_table_name,
+    orders_table_name,
+    table_name,
+    table_sessions_table_name,
+)
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+# Tables, resolved from config and created on first use
+def board_games_table() -> Any:
+    """The board games table"""
+    return dynamodb_table(table_name)
+
+
+def menu_table() -> Any:
+    """The menu items table"""
+    return dynamodb_table(menu_table_name)
+
+
+def orders_table() -> Any:
+    """The orders table"""
+    return dynamodb_table(orders_table_name)
+
+
+def sessions_table() -> Any:
+    """The table sessions table"""
+    return dynamodb_table(table_sessions_table_name)
+
+
+def counters_table() -> Any:
+    """The counters table (ID blocks and cache version stamps)"""
+    return dynamodb_table(counters_table_name)
+
+
+def changes_table() -> Any:
+    """The order change feed table"""
+    return dynamodb_table(changes_table_name)
+
+
+class ConditionFailed(Exception):
+    """A conditional write was rejected; item is the current item, if any"""
+
+    def __init__(self, item: Optional[Dict[str, Any]]):
+        super().__init__("The conditional request failed")
+        self.item = item
+
+
+def _deserialized(raw_item: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not raw_item:
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in raw_item.items()}
+
+
+def _existing_item(error: ClientError) -> Optional[Dict[str, Any]]:
+    """Deserialize the ALL_OLD item returned with ConditionalCheckFailedException"""
+    return _deserialized(error.response.get("Item"))
+
+
+def conditional_update(
+    table: Any,
+    key: Dict[str, Any],
+    update_expression: str,
+    condition: Optional[str] = None,
+    names: Optional[Dict[str, str]] = None,
+    values: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Update an existing item in one round trip and return its ALL_NEW attributes
+
+    The update only applies if the item exists and the optional extra
+    condition holds. Otherwise ConditionFailed is raised, carrying the current
+    item (None when it does not exist) so callers can tell 404 from 400.
+    """
+    names = {"#pk": next(iter(key)), **(names or {})}
+    condition_expression = "attribute_exists(#pk)"
+    if condition:
+        condition_expression += f" AND ({condition})"
+
+    kwargs: Dict[str, Any] = {"ExpressionAttributeNames": names}
+    if values:
+        kwargs["ExpressionAttributeValues"] = values
+    try:
+        response = table.update_item(
+            Key=key,
+            UpdateExpression=update_expression,
+            ConditionExpression=condition_expression,
+            ReturnValues="ALL_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            **kwargs,
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        raise ConditionFailed(_existing_item(e)) from e
+    return response["Attributes"]
+
+
+def conditional_delete(table: Any, key: Dict[str, Any]) -> bool:
+    """Delete an item in one round trip, returning False if it did not exist"""
+    try:
+        table.delete_item(
+            Key=key,
+            ConditionExpression="attribute_exists(#pk)",
+            ExpressionAttributeNames={"#pk": next(iter(key))},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def failed_conditions(error: ClientError) -> List[bool]:
+    """
+    Which items of a cancelled TransactWriteItems failed their condition
+
+    Errors other than TransactionCanceledException are re-raised.
+    """
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        raise error
+    return [
+        reason.get("Code") == "ConditionalCheckFailed"
+        for reason in error.response.get("CancellationReasons", [])
+    ]
+
+
+def transaction_conflicted(error: ClientError) -> bool:
+    """
+    Whether a cancelled TransactWriteItems collided with another transaction
+
+    Such a transaction may succeed when simply sent again.
+    """
+    return any(
+        reason.get("Code") == "TransactionConflict"
+        for reason in error.response.get("CancellationReasons", [])
+    )
+
+
+def cancelled_items(error: ClientError) -> List[Optional[Dict[str, Any]]]:
+    """
+    The current items a cancelled TransactWriteItems returned, by position
+
+    Only items written with ReturnValuesOnConditionCheckFailure=ALL_OLD that
+    failed their condition come back; the others are None.
+    """
+    return [
+        _deserialized(reason.get("Item"))
+        for reason in error.response.get("CancellationReasons", [])
+    ]
+
+
+def _native_number(text: str) -> Any:
+    """A DynamoDB number as int, or float when it has a fraction (like DecimalEncoder)"""
+    try:
+        return int(text)
+    except ValueError:
+        number = float(text)
+        return int(Decimal(text)) if number.is_integer() else number
+
+
+def native_value(value: Dict[str, Any]) -> Any:
+    """Deserialize a DynamoDB AttributeValue straight to JSON-ready Python types"""
+    ((kind, data),) = value.items()
+    if kind == "S" or kind == "BOOL":
+        return data
+    if kind == "N":
+        return _native_number(data)
+    if kind == "M":
+        return {k: native_value(v) for k, v in data.items()}
+    if kind == "L":
+        return [native_value(v) for v in data]
+    if kind == "NULL":
+        return None
+    if kind == "NS":
+        return [_native_number(n) for n in data]
+    # SS stays a list so it can be encoded; B / BS keep the resource's types
+    return list(data) if kind == "SS" else _deserializer.deserialize(value)
+
+
+def native_item(raw_item: Dict[str, Any]) -> Dict[str, Any]:
+    """Deserialize a DynamoDB item to JSON-ready Python types"""
+    return {k: native_value(v) for k, v in raw_item.items()}
+
+
+def _serialize(value: Any) -> Dict[str, Any]:
+    # Cursors decode to int / float; the serializer only takes Decimal
+    return _serializer.serialize(Decimal(str(value)) if isinstance(value, float) else value)
+
+
+# Attributes holding items in Scan / Query / GetItem responses
+_ITEM_PARAMS = ("Item", "LastEvaluatedKey")
+
+
+def _parse_native(
+    response_dict: Dict[str, Any], customized_response_dict: Dict[str, Any], **kwargs: Any
+) -> None:
+    """
+    before-parse hook: deserialize the items of a response ourselves
+
+    botocore's parser walks every AttributeValue against the service model
+    before any deserializer sees it, which costs far more than the
+    conversion itself. The items are taken out of the body here, converted
+    straight from the JSON, and merged back after botocore parses the rest
+    (what is left is a few counters, so encoding it again is cheap).
+
+    before-parse and its customized_response_dict are botocore internals,
+    not a documented extension point: bench/native_reads.py asserts this
+    path is taken with the installed botocore, and NativeTable falls back
+    to converting parsed items if it is not.
+    """
+    if response_dict["status_code"] >= 300:
+        return
+    body = json.loads(response_dict["body"])
+    if "Items" in body:
+        customized_response_dict["Items"] = [native_item(item) for item in body.pop("Items")]
+    for param in _ITEM_PARAMS:
+        if param in body:
+            customized_response_dict[param] = native_item(body.pop(param))
+    customized_response_dict["NativeItems"] = True
+    response_dict["body"] = json.dumps(body).encode()
+
+
+@lru_cache(maxsize=None)
+def _native_client() -> Any:
+    """A low-level client of NativeTable's own, with read responses parsed by _parse_native"""
+    # Not the shared dynamodb_client(): the hook changes the responses it returns
+    client = new_dynamodb_client()
+    for operation in ("Scan", "Query", "GetItem"):
+        client.meta.events.register(f"before-parse.dynamodb.{operation}", _parse_native)
+    return client
+
+
+class NativeTable:
+    """
+    Read-only view of a table on the low-level client, for the list endpoints
+
+    scan, query and get_item take the same arguments as the resource's
+    Table (including boto3 conditions) but return items with int and float
+    numbers instead of Decimal, deserialized straight from the response
+    JSON. json.dumps then encodes them without calling
+    DecimalEncoder.default once per number.
+    """
+
+    def __init__(self, table: Any):
+        self.name = table.name
+
+    def _request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """The low-level request for resource-style arguments"""
+        request = {**kwargs, "TableName": self.name}
+        names = dict(request.pop("ExpressionAttributeNames", {}))
+        values = dict(request.pop("ExpressionAttributeValues", {}))
+        builder = ConditionExpressionBuilder()
+        for param, is_key in (("KeyConditionExpression", True), ("FilterExpression", False)):
+            condition = request.get(param)
+            if isinstance(condition, ConditionBase):
+                built = builder.build_expression(condition, is_key_condition=is_key)
+                request[param] = built.condition_expression
+                names.update(built.attribute_name_placeholders)
+                values.update(built.attribute_value_placeholders)
+        if names:
+            request["ExpressionAttributeNames"] = names
+        if values:
+            request["ExpressionAttributeValues"] = {k: _serialize(v) for k, v in values.items()}
+        for param in ("ExclusiveStartKey", "Key"):
+            if param in request:
+                request[param] = {k: _serialize(v) for k, v in request[param].items()}
+        return request
+
+    @staticmethod
+    def _response(response: Dict[str, Any]) -> Dict[str, Any]:
+        if response.pop("NativeItems", False):
+            return response
+        # botocore without the before-parse event: convert the parsed items
+        if "Items" in response:
+            response["Items"] = [native_item(item) for item in response["Items"]]
+        for param in _ITEM_PARAMS:
+            if param in response:
+                response[param] = native_item(response[param])
+        return response
+
+    def scan(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._response(_native_client().scan(**self._request(kwargs)))
+
+    def query(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._response(_native_client().query(**self._request(kwargs)))
+
+    def get_item(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._response(_native_client().get_item(**self._request(kwargs)))
+
+
+def scan_pages(table: Any, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    """Yield scan responses page by page, following LastEvaluatedKey"""
+    while True:
+        response = table.scan(**kwargs)
+        yield response
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_items(table: Any, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    """Yield every item of a scan across its pages"""
+    for page in scan_pages(table, **kwargs):
+        yield from page.get("Items", [])
+
+
+def query_pages(table: Any, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    """Yield query responses page by page, following LastEvaluatedKey"""
+    while True:
+        response = table.query(**kwargs)
+        yield response
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def batch_get(
+    dynamodb: Any, table: Any, keys: List[Dict[str, Any]], max_attempts: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Fetch items by key with BatchGetItem
+
+    Keys are sent in chunks of 100 (the BatchGetItem limit) and UnprocessedKeys
+    are retried with exponential backoff. Missing items are simply absent
+    from the result, which is in no particular order.
+    """
+    items: List[Dict[str, Any]] = []
+    for start in range(0, len(keys), 100):
+        request = {table.name: {"Keys": keys[start : start + 100]}}
+        for attempt in range(max_attempts):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response.get("Responses", {}).get(table.name, []))
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError(f"Unprocessed keys remain for {table.name}")
+    return items
+
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Encode a LastEvaluatedKey as an opaque, URL-safe cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Decode a cursor created by encode_cursor back into an ExclusiveStartKey"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+# Page size of the paginated list endpoints, and the largest a client may ask for
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+def parse_limit(
+    limit: Optional[str], max_limit: int = MAX_PAGE_LIMIT, default: int = DEFAULT_PAGE_LIMIT
+) -> int:
+    """
+    Parse the limit query parameter, allowing 1 to max_limit
+
+    Paginated endpoints take limit and cursor and read a single page of up
+    to limit items; nextCursor in the response points at the next page and
+    is null on the last one. default is used when limit is not given.
+    """
+    if limit is None:
+        return default
+    try:
+        value = int(limit)
+    except ValueError as e:
+        raise ValueError("Invalid limit") from e
+    if not 1 <= value <= max_limit:
+        raise ValueError(f"limit must be between 1 and {max_limit}")
+    return value
@@ -1,24 +1,48 @@
 """Lambda function to handle board game cafe API"""
 
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from auth import check_api_key, check_authorization
-from common import make_response
+from common import compress_response, make_response, not_modified
+from metrics import finish_request, start_request
 from routes import find_route
 
 
 def board_game_cafe(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda handler function"""
-    print(event)
+    start_request()
+    route = "unknown"
+    response: Optional[Dict[str, Any]] = None
+    try:
+        # The route is known before its handler runs, so requests whose
+        # handler raises are still recorded under their route
+        route, response, handler, params = _route(event)
+        if handler is not None:
+            response = _call(event, handler, params)
+        # Compress large bodies for clients that accept gzip or brotli
+        response = compress_response(event, response)
+        return response
+    finally:
+        finish_request(route, response)
 
+
+def _route(
+    event: Dict[str, Any]
+) -> Tuple[str, Optional[Dict[str, Any]], Optional[Callable], Dict[str, Any]]:
+    """
+    Route the request
+
+    Returns the route label for metrics, then either the response (OPTIONS,
+    rejected or unknown requests) or the handler and its arguments.
+    """
     # OPTIONS request for CORS
     method = event["requestContext"]["http"]["method"]
     if method == "OPTIONS":
-        return make_response(200, {})
+        return "options", make_response(200, {}), None, {}
 
     # API Key validation
     if not check_api_key(event):
-        return make_response(403, {"error": "Forbidden"})
+        return "forbidden", make_response(403, {"error": "Forbidden"}), None, {}
 
     path = event["requestContext"]["http"]["path"]
 
@@ -26,23 +50,36 @@ def board_game_cafe(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     handler, path_params, requires_admin = find_route(method, path)
 
     if not handler:
-        return make_response(404, {"error": "Not found"})
+        return "not_found", make_response(404, {"error": "Not found"}), None, {}
+    route = handler.__name__
 
     # Admin authorization check for protected endpoints
     if requires_admin and not check_authorization(event):
-        return make_response(401, {"error": "Unauthorized"})
+        return route, make_response(401, {"error": "Unauthorized"}), None, {}
 
     # Add query parameters if they exist
     if "queryStringParameters" in event and event["queryStringParameters"]:
         path_params.update(event["queryStringParameters"])
+    return route, None, handler, path_params
+
 
-    # Call the handler function
+def _call(event: Dict[str, Any], handler: Callable, path_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Call the route's handler"""
+    method = event["requestContext"]["http"]["method"]
     if method in ["POST", "PUT"]:
-        # For POST and PUT requests, pass both event and path params
-        return handler(event, **path_params)
+        # For POST and PUT requests, pass both event and path params. event
+        # goes by keyword: path params fill the leading arguments, e.g.
+        # put_board_game(board_game_id, event), so passing it first raised
+        # TypeError (multiple values for board_game_id)
+        return handler(event=event, **path_params)
     elif path_params:
         # For GET and DELETE with path params
-        return handler(**path_params)
+        response = handler(**path_params)
     else:
         # For simple GET and DELETE without params
-        return handler()
+        response = handler()
+
+    # Conditional GET: answer 304 when the client already has this body
+    if method == "GET":
+        response = not_modified(event, response)
+    return response
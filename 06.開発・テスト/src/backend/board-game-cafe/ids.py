@@ -0,0 +1,95 @@
+"""Atomic ID allocation for the board game cafe API"""
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from db import counters_table, scan_pages
+
+ID_BLOCK_SIZE = int(os.environ.get("ID_BLOCK_SIZE", "10"))
+
+
+def max_existing_id(table: Any) -> int:
+    """Find the largest numeric id in a table (used once to seed a counter)"""
+    max_id = 0
+    for page in scan_pages(table, ProjectionExpression="id"):
+        for item in page.get("Items", []):
+            max_id = max(max_id, int(item["id"]))
+    return max_id
+
+
+class IdAllocator:
+    """
+    Hand out unique integer IDs from an atomic counter item
+
+    Each reservation bumps the counter with UpdateItem ADD by block_size and
+    the reserved block is then served from memory, so a warm container needs
+    one round trip per block_size inserts. IDs are unique across containers
+    but not contiguous: unused IDs of a block are lost when the container ends.
+    """
+
+    def __init__(self, table: Optional[Any] = None, block_size: int = ID_BLOCK_SIZE):
+        self._table = table
+        self.block_size = block_size
+        self.reservations = 0
+        self._blocks: Dict[str, range] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def table(self) -> Any:
+        """The counters table, resolved on first use"""
+        return self._table or counters_table()
+
+    def allocate(self, counter_name: str, seed_table: Any) -> int:
+        """Allocate a single ID for the given counter"""
+        with self._lock:
+            block = self._blocks.get(counter_name)
+            if not block:
+                block = self._reserve(counter_name, self.block_size, seed_table)
+            self._blocks[counter_name] = block[1:]
+            return block[0]
+
+    def allocate_many(self, counter_name: str, count: int, seed_table: Any) -> range:
+        """Allocate count consecutive IDs with a single reservation"""
+        with self._lock:
+            return self._reserve(counter_name, count, seed_table)
+
+    def _reserve(self, counter_name: str, count: int, seed_table: Any) -> range:
+        """Reserve count IDs from the counter item, seeding it on first use"""
+        try:
+            response = self.table.update_item(
+                Key={"counterName": counter_name},
+                UpdateExpression="ADD lastId :count",
+                ConditionExpression="attribute_exists(lastId)",
+                ExpressionAttributeValues={":count": count},
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            self._seed(counter_name, seed_table)
+            return self._reserve(counter_name, count, seed_table)
+
+        self.reservations += 1
+        last_id = int(response["Attributes"]["lastId"])
+        return range(last_id - count + 1, last_id + 1)
+
+    def _seed(self, counter_name: str, seed_table: Any) -> None:
+        """Create the counter item from the current max id, unless it exists"""
+        try:
+            self.table.put_item(
+                Item={
+                    "counterName": counter_name,
+                    "lastId": max_existing_id(seed_table),
+                },
+                ConditionExpression="attribute_not_exists(counterName)",
+            )
+        except ClientError as e:
+            # Another container seeded the counter first
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+id_allocator = IdAllocator()
@@ -1,14 +1,67 @@
 """Lambda function to resize images uploaded to S3."""
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Any, Dict
+from typing import Any, Dict, List, NamedTuple, Tuple
 
 import boto3
+from botocore.config import Config
 
 from PIL import Image, ExifTags
 
-s3_client = boto3.client("s3")
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "8"))
+
+s3_client = boto3.client("s3", config=Config(max_pool_connections=IMAGE_WORKERS * 2))
+
+# Encoders run in this pool, records in their own pool so that a record
+# waiting for its encodes never blocks the encodes themselves
+_encode_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+_record_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+
+VALID_CONTENT_TYPES = ["image/jpeg", "image/png"]
+
+
+class OutputFormat(NamedTuple):
+    """Pillow format name, file extension, content type and save options"""
+
+    pillow_format: str
+    extension: str
+    content_type: str
+    options: Dict[str, Any]
+
+
+OUTPUT_FORMATS: Dict[str, OutputFormat] = {
+    "jpeg": OutputFormat("JPEG", "jpg", "image/jpeg", {"quality": 85, "optimize": True}),
+    "webp": OutputFormat("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "avif": OutputFormat("AVIF", "avif", "image/avif", {"quality": 60}),
+}
+
+
+def available_formats(names: List[str]) -> List[OutputFormat]:
+    """Keep the requested formats this Pillow build can encode (AVIF is optional)"""
+    Image.init()
+    return [
+        OUTPUT_FORMATS[name]
+        for name in names
+        if name in OUTPUT_FORMATS and OUTPUT_FORMATS[name].pillow_format in Image.SAVE
+    ]
+
+
+def output_sizes() -> List[Tuple[str, int]]:
+    """
+    Output directories and bounding box sizes, largest first
+
+    IMAGE_SIZES overrides the default as "dir:px,dir:px".
+    """
+    if "IMAGE_SIZES" in os.environ:
+        sizes = []
+        for entry in os.environ["IMAGE_SIZES"].split(","):
+            directory, _, size = entry.strip().partition(":")
+            sizes.append((directory, int(size)))
+    else:
+        sizes = [(os.environ["RESIZED_M_DIR"], 500), (os.environ["RESIZED_S_DIR"], 100)]
+    return sorted(sizes, key=lambda s: s[1], reverse=True)
 
 
 def correct_image_orientation(image: Image.Image) -> Image.Image:
@@ -32,43 +85,92 @@ def correct_image_orientation(image: Image.Image) -> Image.Image:
     return image
 
 
-def resize_image(image: Image.Image, size: tuple[int, int]) -> BytesIO:
-    """Resize the given image to the specified size while maintaining the aspect ratio."""
-    image.thumbnail(size, Image.Resampling.BICUBIC)
-    image = image.convert("RGB")
-    buffer = BytesIO()
-    image.save(buffer, "JPEG")
-    buffer.seek(0)
-    return buffer
-
+def decode_image(data: bytes, max_size: int) -> Image.Image:
+    """
+    Decode an upload once, as small as the largest output allows
 
-def handler(event: Dict[str, Any], context: Any) -> None:
-    """Lambda function handler to resize images uploaded to S3."""
-    bucket_name = os.environ["S3_BUCKET_NAME"]
-    s3_image_path = os.environ["S3_IMAGE_PATH"]
-    resized_s_dir = os.environ["RESIZED_S_DIR"]
-    resized_m_dir = os.environ["RESIZED_M_DIR"]
-    valid_content_types = ["image/jpeg", "image/png"]
+    For JPEG, draft() lets the decoder scale down by 1/2, 1/4 or 1/8 while
+    decoding, which is much cheaper than decoding at full size and resizing.
+    """
+    image = Image.open(BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (max_size, max_size))
+    image = correct_image_orientation(image)
+    return image.convert("RGB")
 
-    for record in event["Records"]:
-        key = record["s3"]["object"]["key"]
-        response = s3_client.head_object(Bucket=bucket_name, Key=key)
-        content_type = response["ContentType"]
 
-        if content_type not in valid_content_types:
-            print(f"Invalid content type: {content_type}. Resiezing skipped, file: {key}.")
-            continue
+def resize_image(image: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """Resize a copy of the image to fit in size while maintaining the aspect ratio."""
+    resized = image.copy()
+    resized.thumbnail(size, Image.Resampling.BICUBIC)
+    return resized
 
-        response = s3_client.get_object(Bucket=bucket_name, Key=key)
-        image = Image.open(response["Body"])
-        image = correct_image_orientation(image)
 
-        basename, _ = os.path.splitext(os.path.basename(key))
+def encode_image(image: Image.Image, output_format: OutputFormat) -> bytes:
+    """Encode the image in the given output format."""
+    buffer = BytesIO()
+    image.save(buffer, output_format.pillow_format, **output_format.options)
+    return buffer.getvalue()
+
+
+def _encode_and_upload(
+    image: Image.Image, output_format: OutputFormat, bucket_name: str, key: str
+) -> None:
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=encode_image(image, output_format),
+        ContentType=output_format.content_type,
+    )
+
+
+def process_record(
+    record: Dict[str, Any],
+    bucket_name: str,
+    s3_image_path: str,
+    sizes: List[Tuple[str, int]],
+    formats: List[OutputFormat],
+) -> None:
+    """Decode one upload and write every size and format variant in parallel."""
+    key = record["s3"]["object"]["key"]
+    response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    content_type = response["ContentType"]
+
+    if content_type not in VALID_CONTENT_TYPES:
+        print(f"Invalid content type: {content_type}. Resiezing skipped, file: {key}.")
+        return
+
+    image = decode_image(response["Body"].read(), sizes[0][1])
+    basename, _ = os.path.splitext(os.path.basename(key))
+
+    # Every size is resized from the decoded source, not from a smaller output
+    resized = _encode_pool.map(lambda s: resize_image(image, (s[1], s[1])), sizes)
+
+    futures = [
+        _encode_pool.submit(
+            _encode_and_upload,
+            resized_image,
+            output_format,
+            bucket_name,
+            f"{s3_image_path}/{directory}/{basename}.{output_format.extension}",
+        )
+        for (directory, _), resized_image in zip(sizes, resized)
+        for output_format in formats
+    ]
+    for future in futures:
+        future.result()
 
-        # Resize to medium
-        medium_image = resize_image(image, (500, 500))
-        s3_client.upload_fileobj(medium_image, bucket_name, f"{s3_image_path}/{resized_m_dir}/{basename}.jpg")
 
-        # Resize to small
-        small_image = resize_image(image, (100, 100))
-        s3_client.upload_fileobj(small_image, bucket_name, f"{s3_image_path}/{resized_s_dir}/{basename}.jpg")
+def handler(event: Dict[str, Any], context: Any) -> None:
+    """Lambda function handler to resize images uploaded to S3."""
+    bucket_name = os.environ["S3_BUCKET_NAME"]
+    s3_image_path = os.environ["S3_IMAGE_PATH"]
+    sizes = output_sizes()
+    formats = available_formats(os.environ.get("IMAGE_FORMATS", "jpeg,webp,avif").split(","))
+
+    futures = [
+        _record_pool.submit(process_record, record, bucket_name, s3_image_path, sizes, formats)
+        for record in event["Records"]
+    ]
+    for future in futures:
+        future.result()
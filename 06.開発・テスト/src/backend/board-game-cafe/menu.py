@@ -1,36 +1,57 @@
 """Menu management module for the board game cafe API"""
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from decimal import Decimal
 
-import boto3
+from bulk import export_items, import_items, parse_bool
+from cache import menu_cache
+from common import EncodedBody, encode_body, make_response
+from db import (
+    ConditionFailed,
+    NativeTable,
+    conditional_delete,
+    conditional_update,
+    menu_table,
+    scan_pages,
+)
+from ids import id_allocator
 
-from common import make_response
-
-# AWS resources configuration
-dynamodb = boto3.resource("dynamodb")
-menu_table = dynamodb.Table("menu-items-table")
+REQUIRED_FIELDS = ["name", "price", "category"]
+# Columns of the bulk export, in order
+EXPORT_FIELDS = ["id", *REQUIRED_FIELDS, "description", "isAvailable", "imageUrl"]
 
 def get_all_menu_items() -> Dict[str, Any]:
     """Get all menu items"""
     try:
-        response = menu_table.scan()
-        menu_items = response.get("Items", [])
-        
-        return make_response(200, {"menuItems": menu_items})
+        body, hit = menu_cache.get("list", lambda: encode_body(_load_menu_items()))
+
+        return make_response(200, body, menu_cache.headers(hit))
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
+def _load_menu_items() -> Dict[str, Any]:
+    """Read the menu list response body from DynamoDB"""
+    menu_items = []
+    for page in scan_pages(NativeTable(menu_table())):
+        menu_items.extend(page.get("Items", []))
+    return {"menuItems": menu_items}
+
 def get_menu_item(menu_item_id: int) -> Dict[str, Any]:
     """Get a specific menu item by ID"""
     try:
-        response = menu_table.get_item(Key={"id": menu_item_id})
+        def load() -> Optional[EncodedBody]:
+            response = NativeTable(menu_table()).get_item(Key={"id": menu_item_id})
+            if "Item" not in response:
+                return None
+            return encode_body({"menuItem": response["Item"]})
+
+        body, hit = menu_cache.get(("item", menu_item_id), load)
         
-        if "Item" not in response:
+        if body is None:
             return make_response(404, {"error": "Menu item not found"})
         
-        return make_response(200, {"menuItem": response["Item"]})
+        return make_response(200, body, menu_cache.headers(hit))
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
@@ -40,48 +61,62 @@ def post_menu_item(event: Dict[str, Any]) -> Dict[str, Any]:
         body = json.loads(event["body"])
         
         # Validate required fields
-        required_fields = ["name", "price", "category"]
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in body:
                 return make_response(400, {"error": f"Missing required field: {field}"})
         
         # Generate new ID
-        all_items = menu_table.scan().get("Items", [])
-        new_id = 1
-        if all_items:
-            existing_ids = [item.get("id", 0) for item in all_items]
-            new_id = max(existing_ids) + 1
+        new_id = id_allocator.allocate("menu", menu_table())
+        menu_item = {"id": new_id, **_menu_item_fields(body)}
         
-        # Convert numeric fields to Decimal for DynamoDB
-        menu_item = {
-            "id": new_id,
-            "name": body["name"],
-            "price": Decimal(str(body["price"])),
-            "category": body["category"],
-            "description": body.get("description", ""),
-            "isAvailable": body.get("isAvailable", True),
-            "imageUrl": body.get("imageUrl", "")
-        }
-        
-        menu_table.put_item(Item=menu_item)
+        menu_table().put_item(
+            Item=menu_item, ConditionExpression="attribute_not_exists(id)"
+        )
+        menu_cache.invalidate()
         
         return make_response(201, {"menuItem": menu_item})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
+def _menu_item_fields(body: Dict[str, Any]) -> Dict[str, Any]:
+    """The attributes of a new menu item, without its id"""
+    # Convert numeric fields to Decimal for DynamoDB
+    return {
+        "name": body["name"],
+        "price": Decimal(str(body["price"])),
+        "category": body["category"],
+        "description": body.get("description", ""),
+        "isAvailable": parse_bool(body.get("isAvailable", True)),
+        "imageUrl": body.get("imageUrl", "")
+    }
+
+def import_menu_items(event: Dict[str, Any], format: Optional[str] = None) -> Dict[str, Any]:
+    """Create menu items from an NDJSON or CSV body (format=ndjson|csv)"""
+    return import_items(
+        event,
+        format,
+        menu_table(),
+        "menu",
+        REQUIRED_FIELDS,
+        _menu_item_fields,
+        menu_cache,
+    )
+
+def export_menu_items(
+    format: Optional[str] = None, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """Export every menu item as NDJSON or CSV (format=ndjson|csv)"""
+    return export_items(menu_table(), EXPORT_FIELDS, format, cursor)
+
 def put_menu_item(menu_item_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
     """Update an existing menu item"""
     try:
-        # Check if menu item exists
-        response = menu_table.get_item(Key={"id": menu_item_id})
-        if "Item" not in response:
-            return make_response(404, {"error": "Menu item not found"})
-        
         # Get update data
         body = json.loads(event["body"])
         
         # Update menu item
         update_expression = "SET "
+        expression_attribute_names = {}
         expression_attribute_values = {}
         
         update_fields = [
@@ -90,40 +125,43 @@ def put_menu_item(menu_item_id: int, event: Dict[str, Any]) -> Dict[str, Any]:
         
         for field in update_fields:
             if field in body:
-                update_expression += f"{field} = :{field}, "
+                update_expression += f"#{field} = :{field}, "
+                expression_attribute_names[f"#{field}"] = field
                 # Convert price to Decimal
                 if field == "price":
                     expression_attribute_values[f":{field}"] = Decimal(str(body[field]))
                 else:
                     expression_attribute_values[f":{field}"] = body[field]
         
+        if not expression_attribute_values:
+            return make_response(400, {"error": "No fields to update"})
+        
         # Remove trailing comma and space
         update_expression = update_expression.rstrip(", ")
         
-        menu_table.update_item(
-            Key={"id": menu_item_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="ALL_NEW"
-        )
-        
-        # Get updated item
-        updated_response = menu_table.get_item(Key={"id": menu_item_id})
+        try:
+            menu_item = conditional_update(
+                menu_table(),
+                {"id": menu_item_id},
+                update_expression,
+                names=expression_attribute_names,
+                values=expression_attribute_values,
+            )
+        except ConditionFailed:
+            return make_response(404, {"error": "Menu item not found"})
+        menu_cache.invalidate()
         
-        return make_response(200, {"menuItem": updated_response["Item"]})
+        return make_response(200, {"menuItem": menu_item})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 def delete_menu_item(menu_item_id: int) -> Dict[str, Any]:
     """Delete a menu item"""
     try:
-        # Check if menu item exists
-        response = menu_table.get_item(Key={"id": menu_item_id})
-        if "Item" not in response:
+        # Delete the menu item if it exists
+        if not conditional_delete(menu_table(), {"id": menu_item_id}):
             return make_response(404, {"error": "Menu item not found"})
-        
-        # Delete the menu item
-        menu_table.delete_item(Key={"id": menu_item_id})
+        menu_cache.invalidate()
         
         return make_response(200, {"message": "Menu item deleted successfully"})
     except Exception as e:
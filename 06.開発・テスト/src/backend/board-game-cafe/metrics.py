@@ -0,0 +1,102 @@
+"""Per-request latency instrumentation for the board game cafe API
+
+Each request produces at most one log line in CloudWatch Embedded Metric
+Format (EMF), so CloudWatch extracts the metrics from the log without any
+extra API calls.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "BoardGameCafe")
+# Fraction of requests logged; server errors are always logged
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "1.0"))
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Timing collected while one request is handled"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.aws_calls: List[Tuple[str, float]] = []
+
+    def record_call(self, operation: str, elapsed_ms: float) -> None:
+        self.aws_calls.append((operation, elapsed_ms))
+
+
+def current() -> Optional[RequestMetrics]:
+    """The metrics of the request being handled on this thread, if any"""
+    return getattr(_local, "request", None)
+
+
+def _before_call(context: Dict[str, Any], **kwargs: Any) -> None:
+    context["metrics_started"] = time.perf_counter()
+
+
+def _after_call(context: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+    request = current()
+    started = context.get("metrics_started")
+    if request is None or started is None:
+        return
+    operation = f"{model.service_model.service_id}.{model.name}"
+    request.record_call(operation, (time.perf_counter() - started) * 1000)
+
+
+def instrument(client: Any) -> Any:
+    """Time every API call made by a boto3 client using botocore event hooks"""
+    client.meta.events.register("before-call.*.*", _before_call)
+    client.meta.events.register("after-call.*.*", _after_call)
+    return client
+
+
+def start_request() -> RequestMetrics:
+    """Start collecting metrics for a request on this thread"""
+    _local.request = RequestMetrics()
+    return _local.request
+
+
+def finish_request(route: str, response: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Stop collecting and log one EMF line for the request (subject to sampling)"""
+    request = current()
+    _local.request = None
+    if request is None:
+        return None
+
+    status = response["statusCode"] if response else 500
+    if status < 500 and random.random() >= METRICS_SAMPLE_RATE:
+        return None
+
+    latency = (time.perf_counter() - request.started) * 1000
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Route"]],
+                    "Metrics": [
+                        {"Name": "Latency", "Unit": "Milliseconds"},
+                        {"Name": "AwsLatency", "Unit": "Milliseconds"},
+                        {"Name": "AwsCalls", "Unit": "Count"},
+                    ],
+                }
+            ],
+        },
+        "Route": route,
+        "Status": status,
+        "Latency": round(latency, 2),
+        "AwsLatency": round(sum(ms for _, ms in request.aws_calls), 2),
+        "AwsCalls": len(request.aws_calls),
+        "Calls": [f"{operation}:{ms:.1f}" for operation, ms in request.aws_calls],
+    }
+    if response and "X-Cache" in response.get("headers", {}):
+        record["Cache"] = response["headers"]["X-Cache"]
+
+    print(json.dumps(record, separators=(",", ":")))
+    return record
@@ -3,18 +3,30 @@
 import json
 import uuid
 import time
-from typing import Any, Dict, Optional
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
 from decimal import Decimal
 
-import boto3
+from botocore.exceptions import ClientError
 
+from clients import dynamodb
 from common import make_response
-
-# AWS resources configuration
-dynamodb = boto3.resource("dynamodb")
-orders_table = dynamodb.Table("orders-table")
-sessions_table = dynamodb.Table("table-sessions-table")
-menu_table = dynamodb.Table("menu-items-table")
+from db import (
+    ConditionFailed,
+    NativeTable,
+    batch_get,
+    cancelled_items,
+    conditional_update,
+    decode_cursor,
+    encode_cursor,
+    failed_conditions,
+    menu_table,
+    orders_table,
+    parse_limit,
+    query_pages,
+    sessions_table,
+    transaction_conflicted,
+)
 
 # Order status constants
 ORDER_STATUS = {
@@ -25,6 +37,38 @@ ORDER_STATUS = {
     "CANCELLED": "cancelled",
 }
 
+# Orders carry kitchenStatus (a copy of status) for KitchenStatusIndex.
+# Delivered and cancelled orders keep it for KITCHEN_RETENTION seconds, so
+# watermark polls see them leave the queue, then prune_kitchen_queue drops it
+KITCHEN_STATUSES = ["pending", "preparing", "ready", "delivered", "cancelled"]
+TERMINAL_STATUSES = ["delivered", "cancelled"]
+KITCHEN_RETENTION = 24 * 60 * 60
+DEFAULT_KITCHEN_STATUSES = "pending,preparing"
+DEFAULT_QUEUE_LIMIT = 100
+MAX_QUEUE_LIMIT = 500
+
+# Orders in these statuses keep their session open (openOrderCount);
+# cancelled orders are left out of the session's totalAmount and orderCount
+OPEN_STATUSES = ["pending", "preparing"]
+# Conditional writes a status change makes before giving up with 409
+STATUS_UPDATE_ATTEMPTS = 4
+# Transactions an order placement sends, backing off between them, while
+# they collide with other writes to the session before giving up with 409
+ORDER_CREATE_ATTEMPTS = 4
+
+# Attributes a client may select with fields; orderId is always returned
+ORDER_FIELDS = [
+    "orderId",
+    "tableNumber",
+    "sessionId",
+    "items",
+    "totalAmount",
+    "status",
+    "createdAt",
+    "updatedAt",
+    "notes",
+]
+
 
 def create_order(event: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new order"""
@@ -41,31 +85,32 @@ def create_order(event: Dict[str, Any]) -> Dict[str, Any]:
         session_id = body["sessionId"]
         items = body["items"]
 
-        # Validate session exists
-        session_response = sessions_table.get_item(
-            Key={"tableNumber": table_number, "sessionId": session_id}
-        )
+        # Validate items and look up every distinct menu item in one batch
+        for item in items:
+            if "id" not in item or "quantity" not in item:
+                return make_response(
+                    400, {"error": "Each item must have id and quantity"}
+                )
 
-        if "Item" not in session_response:
-            return make_response(404, {"error": "Table session not found"})
+        menu_ids = list(dict.fromkeys(item["id"] for item in items))
+        menu_items = {
+            menu_item["id"]: menu_item
+            for menu_item in batch_get(
+                dynamodb(), menu_table(), [{"id": menu_id} for menu_id in menu_ids]
+            )
+        }
 
         # Validate items exist and calculate total
         total_amount = Decimal("0")
         order_items = []
 
         for item in items:
-            if "id" not in item or "quantity" not in item:
-                return make_response(
-                    400, {"error": "Each item must have id and quantity"}
-                )
-
-            menu_item_response = menu_table.get_item(Key={"id": item["id"]})
-            if "Item" not in menu_item_response:
+            menu_item = menu_items.get(item["id"])
+            if menu_item is None:
                 return make_response(
                     404, {"error": f"Menu item {item['id']} not found"}
                 )
 
-            menu_item = menu_item_response["Item"]
             if not menu_item.get("isAvailable", True):
                 return make_response(
                     400, {"error": f"Menu item {item['id']} is not available"}
@@ -96,47 +141,328 @@ def create_order(event: Dict[str, Any]) -> Dict[str, Any]:
             "items": order_items,
             "totalAmount": total_amount,
             "status": ORDER_STATUS["PENDING"],
+            "kitchenStatus": ORDER_STATUS["PENDING"],
             "createdAt": timestamp,
             "updatedAt": timestamp,
             "notes": body.get("notes", ""),
         }
 
-        orders_table.put_item(Item=order)
-
-        return make_response(201, {"order": order})
+        # Put the order and add it to the session totals only while the
+        # session exists and is still open, in one atomic request so
+        # close_table_session cannot slip in between. Orders placed at the
+        # same moment on one session can collide on its totals; the
+        # transaction is then sent again
+        for attempt in range(ORDER_CREATE_ATTEMPTS):
+            if attempt:
+                time.sleep(0.05 * 2 ** (attempt - 1))
+            try:
+                dynamodb().meta.client.transact_write_items(
+                    TransactItems=[
+                        _session_totals_item(
+                            order,
+                            (total_amount, 1, 1),
+                            "attribute_exists(sessionId) AND endTime = :active",
+                            {":active": 0},
+                        ),
+                        {
+                            "Put": {
+                                "TableName": orders_table().name,
+                                "Item": order,
+                                "ConditionExpression": "attribute_not_exists(orderId)",
+                            }
+                        },
+                    ]
+                )
+            except ClientError as e:
+                if failed_conditions(e)[:1] == [True]:
+                    return make_response(404, {"error": "Active table session not found"})
+                if not transaction_conflicted(e):
+                    raise
+                continue
+            return make_response(201, {"order": order})
+
+        return make_response(409, {"error": "Session was updated concurrently, try again"})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
 def get_table_orders(
-    table_number: int, session_id: Optional[str] = None
+    table_number: int,
+    session_id: Optional[str] = None,
+    limit: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """Get all orders for a specific table, optionally filtered by session ID"""
+    """
+    Get the orders of a table, newest first, optionally for one session
+
+    The result is paginated (see db.parse_limit), so a table with a long
+    history is not read in full. fields is a comma separated list of
+    attributes to return.
+    """
     try:
+        try:
+            page_limit = parse_limit(limit)
+            start_key = decode_cursor(cursor)
+            projection = _projection(fields)
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
         if session_id:
             # Get orders for specific session
-            response = orders_table.query(
-                IndexName="TableSessionIndex",
-                KeyConditionExpression="tableNumber = :tn AND sessionId = :sid",
-                ExpressionAttributeValues={":tn": table_number, ":sid": session_id},
-            )
+            query_kwargs: Dict[str, Any] = {
+                "IndexName": "SessionOrdersIndex",
+                "KeyConditionExpression": "sessionId = :sid",
+                "FilterExpression": "tableNumber = :tn",
+                "ExpressionAttributeValues": {":tn": table_number, ":sid": session_id},
+            }
         else:
             # Get all orders for table
-            response = orders_table.query(
-                IndexName="TableNumberIndex",
-                KeyConditionExpression="tableNumber = :tn",
-                ExpressionAttributeValues={":tn": table_number},
-            )
+            query_kwargs = {
+                "IndexName": "TableNumberIndex",
+                "KeyConditionExpression": "tableNumber = :tn",
+                "ExpressionAttributeValues": {":tn": table_number},
+            }
+        query_kwargs["ScanIndexForward"] = False
+        query_kwargs.update(projection)
+
+        query_kwargs["Limit"] = page_limit
+        if start_key:
+            query_kwargs["ExclusiveStartKey"] = start_key
+        response = NativeTable(orders_table()).query(**query_kwargs)
+
+        return make_response(
+            200,
+            {
+                "orders": response.get("Items", []),
+                "nextCursor": encode_cursor(response.get("LastEvaluatedKey")),
+            },
+        )
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
 
-        orders = response.get("Items", [])
 
-        return make_response(200, {"orders": orders})
+def _projection(fields: Optional[str]) -> Dict[str, Any]:
+    """Query arguments for the fields parameter (empty when it is not given)"""
+    if fields is None:
+        return {}
+    selected = list(dict.fromkeys(["orderId", *(f for f in fields.split(",") if f)]))
+    unknown = [f for f in selected if f not in ORDER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    names = {f"#f{i}": field for i, field in enumerate(selected)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def get_orders(
+    status: str = DEFAULT_KITCHEN_STATUSES,
+    updated_since: Optional[str] = None,
+    limit: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Get the kitchen queue: orders in the given statuses, oldest update first
+
+    Each status is one Query on KitchenStatusIndex and the pages are merged,
+    so the cost does not depend on the number of tables. updated_since is
+    inclusive; pass back the returned watermark to fetch only orders that
+    changed since the last poll, after following nextCursor to the end. An
+    order updated in the same second as the watermark is returned again.
+    With updated_since, orders that changed to any other status come back
+    as exits, so the client can drop them from its queue.
+    """
+    try:
+        try:
+            statuses = list(dict.fromkeys(s for s in status.split(",") if s))
+            invalid = [s for s in statuses if s not in KITCHEN_STATUSES]
+            if not statuses or invalid:
+                raise ValueError(
+                    f"status must be one or more of: {', '.join(KITCHEN_STATUSES)}"
+                )
+            since = int(updated_since) if updated_since is not None else None
+            page_limit = parse_limit(limit, MAX_QUEUE_LIMIT, DEFAULT_QUEUE_LIMIT)
+            positions = decode_cursor(cursor) or {}
+            if any(p is not False and not isinstance(p, dict) for p in positions.values()):
+                raise ValueError("Invalid cursor")
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
+
+        # Fetch one page per status that still has orders left; a watermark
+        # poll also reads the other statuses, for the orders that left
+        queried = list(statuses)
+        if since is not None:
+            queried += [s for s in KITCHEN_STATUSES if s not in statuses]
+        pages: Dict[str, List[Dict[str, Any]]] = {}
+        more: Dict[str, bool] = {}
+        for s in queried:
+            if positions.get(s) is False:
+                continue
+            pages[s], more[s] = _query_kitchen_status(s, since, page_limit, positions.get(s))
+
+        # Merge by (updatedAt, orderId) and keep the first page_limit orders;
+        # each page holds page_limit orders, so none can be skipped over
+        merged = heapq.merge(
+            *([(o["updatedAt"], o["orderId"], s, o) for o in page] for s, page in pages.items())
+        )
+        orders = []
+        next_positions = dict(positions)
+        for _, _, s, order in merged:
+            if len(orders) == page_limit:
+                break
+            orders.append(order)
+            next_positions[s] = _kitchen_key(order)
+        for s, page in pages.items():
+            taken_all = not page or next_positions.get(s) == _kitchen_key(page[-1])
+            if taken_all and not more[s]:
+                next_positions[s] = False
+
+        next_cursor = None
+        if any(next_positions.get(s) is not False for s in queried):
+            next_cursor = encode_cursor(next_positions)
+        watermark = max((o["updatedAt"] for o in orders), default=since)
+
+        body: Dict[str, Any] = {
+            "orders": [o for o in orders if o["kitchenStatus"] in statuses],
+            "watermark": watermark,
+        }
+        if since is not None:
+            body["exits"] = [o for o in orders if o["kitchenStatus"] not in statuses]
+        if next_cursor:
+            body["nextCursor"] = next_cursor
+        return make_response(200, body)
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
+def _kitchen_key(order: Dict[str, Any]) -> Dict[str, Any]:
+    """The KitchenStatusIndex key of an order, usable as ExclusiveStartKey"""
+    return {
+        "kitchenStatus": order["kitchenStatus"],
+        "updatedAt": order["updatedAt"],
+        "orderId": order["orderId"],
+    }
+
+
+def _query_kitchen_status(
+    status: str,
+    since: Optional[int],
+    page_limit: int,
+    start_key: Optional[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Read up to page_limit orders in one status and whether more remain"""
+    query_kwargs: Dict[str, Any] = {
+        "IndexName": "KitchenStatusIndex",
+        "KeyConditionExpression": "kitchenStatus = :status",
+        "ExpressionAttributeValues": {":status": status},
+        "Limit": page_limit,
+    }
+    if since is not None:
+        query_kwargs["KeyConditionExpression"] += " AND updatedAt >= :since"
+        query_kwargs["ExpressionAttributeValues"][":since"] = since
+    if start_key:
+        query_kwargs["ExclusiveStartKey"] = start_key
+
+    response = NativeTable(orders_table()).query(**query_kwargs)
+    return response.get("Items", []), "LastEvaluatedKey" in response
+
+
+def _count_delta(old_status: str, new_status: str) -> Tuple[int, int]:
+    """The change of (orderCount, openOrderCount) for a status change"""
+    billed = int(new_status != ORDER_STATUS["CANCELLED"]) - int(
+        old_status != ORDER_STATUS["CANCELLED"]
+    )
+    opened = int(new_status in OPEN_STATUSES) - int(old_status in OPEN_STATUSES)
+    return billed, opened
+
+
+def _totals_delta(
+    order: Dict[str, Any], old_status: str, new_status: str
+) -> Tuple[Decimal, int, int]:
+    """The change of (totalAmount, orderCount, openOrderCount) for a status change"""
+    billed, opened = _count_delta(old_status, new_status)
+    return order["totalAmount"] * billed, billed, opened
+
+
+def _session_totals_item(
+    order: Dict[str, Any],
+    delta: Tuple[Decimal, int, int],
+    condition: str = "attribute_exists(sessionId)",
+    values: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """A TransactWriteItems Update adding delta to the order's session totals"""
+    amount, orders, open_orders = delta
+    return {
+        "Update": {
+            "TableName": sessions_table().name,
+            "Key": {"tableNumber": order["tableNumber"], "sessionId": order["sessionId"]},
+            "UpdateExpression": (
+                "ADD totalAmount :amount, orderCount :orders, openOrderCount :open"
+            ),
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": {
+                ":amount": amount,
+                ":orders": orders,
+                ":open": open_orders,
+                **(values or {}),
+            },
+        }
+    }
+
+
+def _update_with_totals(
+    order: Dict[str, Any],
+    update_expression: str,
+    condition: str,
+    values: Dict[str, Any],
+    delta: Tuple[Decimal, int, int],
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Update an order and its session totals in one transaction
+
+    Returns (None, None) on success, or "order" / "session" for the item
+    whose condition failed. When the order's condition failed, the order as
+    it is now comes with it (None when it no longer exists).
+    """
+    try:
+        dynamodb().meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": orders_table().name,
+                        "Key": {"orderId": order["orderId"]},
+                        "UpdateExpression": update_expression,
+                        "ConditionExpression": f"attribute_exists(orderId) AND ({condition})",
+                        "ExpressionAttributeNames": {"#status": "status"},
+                        "ExpressionAttributeValues": values,
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                    }
+                },
+                _session_totals_item(order, delta),
+            ]
+        )
+    except ClientError as e:
+        failed = failed_conditions(e)
+        if not any(failed):
+            raise
+        if failed[0]:
+            return "order", cancelled_items(e)[0]
+        return "session", None
+    return None, None
+
+
 def update_order_status(order_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
-    """Update the status of an order"""
+    """
+    Update the status of an order
+
+    A change that leaves the session totals alone is a single conditional
+    UpdateItem. One that changes them (e.g. preparing to ready, which closes
+    the order for openOrderCount) is that rejected UpdateItem and then a
+    TransactWriteItems on the order and its session: two round trips, the
+    cost of keeping the bill and openOrderCount correct.
+    """
     try:
         body = json.loads(event["body"])
 
@@ -150,64 +476,147 @@ def update_order_status(order_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
                 400, {"error": f"Invalid status. Valid values are: {valid_statuses}"}
             )
 
-        # Check if order exists
-        response = orders_table.get_item(Key={"orderId": order_id})
-        if "Item" not in response:
-            return make_response(404, {"error": "Order not found"})
-
         # Update order status
         timestamp = int(time.time())
 
-        orders_table.update_item(
-            Key={"orderId": order_id},
-            UpdateExpression="SET #status = :status, updatedAt = :timestamp",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={":status": new_status, ":timestamp": timestamp},
-            ReturnValues="ALL_NEW",
-        )
-
-        # Get updated order
-        updated_response = orders_table.get_item(Key={"orderId": order_id})
-
-        return make_response(200, {"order": updated_response["Item"]})
+        update_expression = "SET #status = :status, kitchenStatus = :status, updatedAt = :timestamp"
+
+        # Most kitchen steps (pending to preparing, ready to delivered) leave
+        # the session totals alone: those are one conditional update, valid
+        # from every status with the same totals. The others update the
+        # order and its session in one transaction, from the order the
+        # rejected write returned, on condition its status is still the same
+        unchanged = [s for s in ORDER_STATUS.values() if not any(_count_delta(s, new_status))]
+        unchanged_values = {f":unchanged{i}": status for i, status in enumerate(unchanged)}
+        current: Optional[Dict[str, Any]] = None
+        for _ in range(STATUS_UPDATE_ATTEMPTS):
+            if current is None or current["status"] in unchanged:
+                try:
+                    order = conditional_update(
+                        orders_table(),
+                        {"orderId": order_id},
+                        update_expression,
+                        condition=f"#status IN ({', '.join(unchanged_values)})",
+                        names={"#status": "status"},
+                        values={":status": new_status, ":timestamp": timestamp, **unchanged_values},
+                    )
+                except ConditionFailed as e:
+                    if e.item is None:
+                        return make_response(404, {"error": "Order not found"})
+                    current = e.item
+                    continue
+                return make_response(200, {"order": order})
+
+            values = {":status": new_status, ":timestamp": timestamp, ":old": current["status"]}
+            failed, latest = _update_with_totals(
+                current,
+                update_expression,
+                "#status = :old",
+                values,
+                _totals_delta(current, current["status"], new_status),
+            )
+            if failed == "order":
+                if latest is None:
+                    return make_response(404, {"error": "Order not found"})
+                current = latest
+                continue
+            if failed == "session":
+                return make_response(404, {"error": "Table session not found"})
+
+            order = {
+                **current,
+                "status": new_status,
+                "kitchenStatus": new_status,
+                "updatedAt": timestamp,
+            }
+            return make_response(200, {"order": order})
+
+        return make_response(409, {"error": "Order was updated concurrently, try again"})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
-def cancel_order(order_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
-    """Cancel an order"""
+def cancel_order(
+    order_id: str, event: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Cancel an order
+
+    Only pending or preparing orders can be cancelled, and the order leaves
+    its session's totals in the same transaction. That transaction needs the
+    order's amount and session, so cancelling reads the order first: a
+    GetItem and a TransactWriteItems, the cost of keeping the bill and
+    openOrderCount correct. Both open statuses change the totals the same
+    way, so a status change in between needs no retry.
+    """
     try:
-        # Check if order exists
-        response = orders_table.get_item(Key={"orderId": order_id})
-        if "Item" not in response:
-            return make_response(404, {"error": "Order not found"})
-
-        order = response["Item"]
-        current_status = order["status"]
-
-        # Only pending or preparing orders can be cancelled
-        if current_status not in [ORDER_STATUS["PENDING"], ORDER_STATUS["PREPARING"]]:
-            return make_response(
-                400, {"error": f"Cannot cancel order with status: {current_status}"}
-            )
-
-        # Update order status to cancelled
         timestamp = int(time.time())
+        cancelled = ORDER_STATUS["CANCELLED"]
+
+        current = orders_table().get_item(Key={"orderId": order_id}).get("Item")
+        if current is not None and current["status"] in OPEN_STATUSES:
+            failed, latest = _update_with_totals(
+                current,
+                "SET #status = :status, kitchenStatus = :status, updatedAt = :timestamp",
+                "#status IN (:pending, :preparing)",
+                {
+                    ":status": cancelled,
+                    ":timestamp": timestamp,
+                    ":pending": ORDER_STATUS["PENDING"],
+                    ":preparing": ORDER_STATUS["PREPARING"],
+                },
+                _totals_delta(current, ORDER_STATUS["PENDING"], cancelled),
+            )
+            if failed is None:
+                order = {
+                    **current,
+                    "status": cancelled,
+                    "kitchenStatus": cancelled,
+                    "updatedAt": timestamp,
+                }
+                return make_response(200, {"order": order})
+            if failed == "session":
+                return make_response(404, {"error": "Table session not found"})
+            current = latest
 
-        orders_table.update_item(
-            Key={"orderId": order_id},
-            UpdateExpression="SET #status = :status, updatedAt = :timestamp",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={
-                ":status": ORDER_STATUS["CANCELLED"],
-                ":timestamp": timestamp,
-            },
-            ReturnValues="ALL_NEW",
+        if current is None:
+            return make_response(404, {"error": "Order not found"})
+        return make_response(
+            400, {"error": f"Cannot cancel order with status: {current['status']}"}
         )
-
-        # Get updated order
-        updated_response = orders_table.get_item(Key={"orderId": order_id})
-
-        return make_response(200, {"order": updated_response["Item"]})
     except Exception as e:
         return make_response(500, {"error": str(e)})
+
+
+def prune_kitchen_queue(event: Dict[str, Any], context: Any) -> Dict[str, int]:
+    """
+    Scheduled: take delivered and cancelled orders out of the kitchen queue
+
+    Orders that reached a terminal status more than KITCHEN_RETENTION
+    seconds ago lose kitchenStatus, so KitchenStatusIndex only grows with
+    the orders of the retention window.
+    """
+    cutoff = int(time.time()) - KITCHEN_RETENTION
+    pruned = 0
+    for status in TERMINAL_STATUSES:
+        for page in query_pages(
+            orders_table(),
+            IndexName="KitchenStatusIndex",
+            KeyConditionExpression="kitchenStatus = :status AND updatedAt < :cutoff",
+            ExpressionAttributeValues={":status": status, ":cutoff": cutoff},
+            ProjectionExpression="orderId",
+        ):
+            for order in page.get("Items", []):
+                try:
+                    # A status change since the query keeps the order queued
+                    conditional_update(
+                        orders_table(),
+                        {"orderId": order["orderId"]},
+                        "REMOVE kitchenStatus",
+                        condition="kitchenStatus = :status AND updatedAt < :cutoff",
+                        values={":status": status, ":cutoff": cutoff},
+                    )
+                    pruned += 1
+                except ConditionFailed:
+                    pass
+    return {"pruned": pruned}
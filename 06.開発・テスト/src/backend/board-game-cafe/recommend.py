@@ -0,0 +1,222 @@
+"""Bitmap index answering "what can N of us play in T minutes" for the board game catalog"""
+
+import bisect
+from array import array
+from itertools import compress, count, groupby
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from cache import VersionedCache, VersionedIndex, catalog_cache
+from db import NativeTable, board_games_table, scan_items
+
+# Player counts with a bitmap of their own; for larger groups playerMax has
+# bitmaps and playerMin is checked per game
+MAX_PLAYERS = 12
+# Upper bounds (minutes) of the play time buckets; the last bucket is open-ended
+TIME_BOUNDS = [15, 30, 45, 60, 90, 120, 180, 240]
+
+Key = Tuple[str, Hashable]
+# recommendation, playerMin, playerMax and playTime of one game
+Facts = Tuple[Decimal, int, int, int]
+
+
+def _slots(bits: int) -> Iterator[int]:
+    """The positions of the set bits, lowest first"""
+    # Skip the zero 64-bit words in C (compress) and only walk the others
+    words = array("Q", bits.to_bytes((bits.bit_length() + 63) // 64 * 8, "little"))
+    for index in compress(count(), words):
+        word = words[index]
+        while word:
+            low = word & -word
+            yield index * 64 + low.bit_length() - 1
+            word ^= low
+
+
+def _bitmap(slots: Iterable[int]) -> int:
+    """An int with the given bits set, built in one pass"""
+    slots = list(slots)
+    if not slots:
+        return 0
+    data = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        data[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(data, "little")
+
+
+def _facts(item: Dict[str, Any]) -> Facts:
+    return (
+        Decimal(str(item.get("recommendation", 0))),
+        int(item.get("playerMin", 1)),
+        int(item.get("playerMax", 1)),
+        int(item.get("playTime", 0)),
+    )
+
+
+def _keys(item: Dict[str, Any], facts: Facts) -> Iterator[Key]:
+    """The bitmaps a game belongs to"""
+    recommendation, player_min, player_max, play_time = facts
+    yield ("all", None)
+    yield ("recommendation", recommendation)
+    for players in range(max(player_min, 1), min(player_max, MAX_PLAYERS) + 1):
+        yield ("players", players)
+    if player_max > MAX_PLAYERS:
+        yield ("playerMax", player_max)
+    # Twice the middle of the player range, to rank by distance from it
+    yield ("centre", player_min + player_max)
+    bucket = bisect.bisect_left(TIME_BOUNDS, play_time)
+    yield ("bucket", bucket)
+    for upper in range(bucket, len(TIME_BOUNDS) + 1):
+        # Cumulative: every game playable within bucket upper's bound
+        yield ("within", upper)
+    yield ("playTime", play_time)
+    yield ("difficulty", int(item.get("difficulty", 1)))
+    yield ("gameType", item.get("gameType", "その他"))
+
+
+class RecommendationIndex(VersionedIndex):
+    """
+    Board games by player count, play time bucket, difficulty and gameType
+
+    Every game gets a slot (a bit position; freed slots are reused) and each
+    value of each attribute a Python int used as a bitset, so a query is a
+    handful of ANDs over ints of (games / 8) bytes. Play time buckets are
+    both exact and cumulative ("within"), so a time limit on a bucket bound
+    is one bitmap and any other limit only checks the games of one bucket.
+    """
+
+    def __init__(self, cache: VersionedCache, load: Callable[[], Iterable[Dict[str, Any]]]):
+        super().__init__(cache, load)
+        self._bitmaps: Dict[Key, int] = {}
+        self._items: List[Optional[Dict[str, Any]]] = []
+        self._facts: List[Optional[Facts]] = []
+        self._slot_of: Dict[Any, int] = {}
+        self._free: List[int] = []
+
+    def _build(self, items: Iterable[Dict[str, Any]]) -> None:
+        self._items = list(items)
+        self._facts = [_facts(item) for item in self._items]
+        self._slot_of = {item["id"]: slot for slot, item in enumerate(self._items)}
+        self._free = []
+        members: Dict[Key, List[int]] = {}
+        for slot, item in enumerate(self._items):
+            for key in _keys(item, self._facts[slot]):
+                members.setdefault(key, []).append(slot)
+        self._bitmaps = {key: _bitmap(slots) for key, slots in members.items()}
+
+    def _add(self, item: Dict[str, Any]) -> None:
+        facts = _facts(item)
+        if self._free:
+            slot = self._free.pop()
+            self._items[slot] = item
+            self._facts[slot] = facts
+        else:
+            slot = len(self._items)
+            self._items.append(item)
+            self._facts.append(facts)
+        self._slot_of[item["id"]] = slot
+        for key in _keys(item, facts):
+            self._bitmaps[key] = self._bitmaps.get(key, 0) | (1 << slot)
+
+    def _discard(self, item_id: Any) -> None:
+        slot = self._slot_of.pop(item_id, None)
+        if slot is None:
+            return
+        for key in _keys(self._items[slot], self._facts[slot]):
+            bitmap = self._bitmaps[key] & ~(1 << slot)
+            if bitmap:
+                self._bitmaps[key] = bitmap
+            else:
+                del self._bitmaps[key]
+        self._items[slot] = None
+        self._facts[slot] = None
+        self._free.append(slot)
+
+    def _union(self, kind: str, values: Iterable[Hashable]) -> int:
+        bitmap = 0
+        for value in values:
+            bitmap |= self._bitmaps.get((kind, value), 0)
+        return bitmap
+
+    def _values(self, kind: str) -> List[Any]:
+        """The values of kind that have a bitmap"""
+        return [value for name, value in self._bitmaps if name == kind]
+
+    def recommend(
+        self,
+        players: Optional[int] = None,
+        max_time: Optional[int] = None,
+        difficulties: Optional[List[int]] = None,
+        game_types: Optional[List[str]] = None,
+        limit: int = 10,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        The best limit games for the query and the number of matching games
+
+        Games are ordered by their score: the staff recommendation, then
+        the play time bucket (with max_time the longest first, so games that
+        fill the time come first; otherwise the shortest first), then how
+        close players is to the middle of the game's player range, then play
+        time. Each step of the order is a bitmap too, so the page is filled
+        group by group and only the games of its groups are read.
+        """
+        self.ensure_current()
+        bitmaps = self._bitmaps
+
+        mask = bitmaps.get(("all", None), 0)
+        if players is not None:
+            if players <= MAX_PLAYERS:
+                mask &= bitmaps.get(("players", players), 0)
+            else:
+                larger = [v for v in self._values("playerMax") if v >= players]
+                mask &= self._union("playerMax", larger)
+                mask = _bitmap(s for s in _slots(mask) if self._facts[s][1] <= players)
+        if difficulties is not None:
+            mask &= self._union("difficulty", difficulties)
+        if game_types is not None:
+            mask &= self._union("gameType", game_types)
+
+        buckets = list(range(len(TIME_BOUNDS) + 1))
+        if max_time is not None:
+            bucket = bisect.bisect_left(TIME_BOUNDS, max_time)
+            time_mask = bitmaps.get(("within", bucket - 1), 0)
+            # The bucket holding max_time is only partly in: add its play times up to it
+            lower = TIME_BOUNDS[bucket - 1] if bucket else 0
+            times = [v for v in self._values("playTime") if lower < v <= max_time]
+            time_mask |= self._union("playTime", times)
+            mask &= time_mask
+            buckets = buckets[: bucket + 1][::-1]
+        total = mask.bit_count()
+
+        centres: List[List[int]] = [[]]
+        if players is not None:
+            # Group the range middles by their distance from players
+            distance = lambda centre: abs(2 * players - centre)
+            centres = [
+                list(group)
+                for _, group in groupby(sorted(self._values("centre"), key=distance), distance)
+            ]
+
+        found: List[int] = []
+        recommendations = sorted(self._values("recommendation"), reverse=True)
+        for recommendation in recommendations:
+            band = mask & bitmaps[("recommendation", recommendation)]
+            for bucket in buckets:
+                group = band & bitmaps.get(("bucket", bucket), 0) if band else 0
+                for centre in centres if group else ():
+                    slots = group & self._union("centre", centre) if centre else group
+                    if slots:
+                        found.extend(
+                            sorted(
+                                _slots(slots),
+                                key=lambda s: self._facts[s][3],
+                                reverse=max_time is not None,
+                            )
+                        )
+                        if len(found) >= limit:
+                            return [self._items[s] for s in found[:limit]], total
+        return [self._items[s] for s in found], total
+
+
+recommendation_index = RecommendationIndex(
+    catalog_cache, lambda: scan_items(NativeTable(board_games_table()))
+)
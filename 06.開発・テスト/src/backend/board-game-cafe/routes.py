@@ -1,72 +1,170 @@
 """Route definitions and routing mechanism for the board game cafe API"""
 
-import re
-from typing import Any, Callable, Dict, List, Pattern, Tuple, Optional
-
-from auth import login
-from boardgames import (
-    get_all_board_game,
-    get_board_game,
-    put_board_game,
-    post_board_game,
-    delete_board_game,
-    get_presigned_url,
-)
-from menu import (
-    get_all_menu_items,
-    get_menu_item,
-    post_menu_item,
-    put_menu_item,
-    delete_menu_item,
-)
-from orders import (
-    create_order,
-    get_table_orders,
-    update_order_status,
-    cancel_order,
-)
-from sessions import (
-    initialize_table_session,
-    get_table_sessions,
-    close_table_session,
-)
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 # Route definition type
-# (HTTP method, path pattern regex, handler function, requires admin, param names)
-RouteDefinition = Tuple[str, Pattern, Callable, bool, List[str]]
+# (HTTP method, path template, handler function, requires admin)
+# Path parameters are written as {name:int} or {name:str}. Handlers are given
+# as "module.function" and imported on the first request that needs them, so
+# a cold start only loads the modules of the route being served.
+Handler = Union[str, Callable]
+RouteDefinition = Tuple[str, str, Handler, bool]
 
-# Define routes with regex patterns for path matching
+# Define routes with path templates; this is the only source of the admin flag
 ROUTES: List[RouteDefinition] = [
     # Board games routes
-    ("GET", re.compile(r"^/boardgames$"), get_all_board_game, False, []),
-    ("GET", re.compile(r"^/boardgames/(\d+)$"), get_board_game, False, ["board_game_id"]),
-    ("POST", re.compile(r"^/boardgames$"), post_board_game, True, []),
-    ("POST", re.compile(r"^/boardgames/presigned-url$"), get_presigned_url, True, []),
-    ("PUT", re.compile(r"^/boardgames/(\d+)$"), put_board_game, True, ["board_game_id"]),
-    ("DELETE", re.compile(r"^/boardgames/(\d+)$"), delete_board_game, True, ["board_game_id"]),
+    ("GET", "/boardgames", "boardgames.get_all_board_game", False),
+    ("GET", "/boardgames/search", "boardgames.search_board_games", False),
+    ("GET", "/boardgames/recommend", "boardgames.recommend_board_games", False),
+    ("GET", "/boardgames/{board_game_id:int}", "boardgames.get_board_game", False),
+    ("POST", "/boardgames", "boardgames.post_board_game", True),
+    ("POST", "/boardgames/presigned-url", "boardgames.get_presigned_url", True),
+    ("POST", "/boardgames/bulk", "boardgames.import_board_games", True),
+    ("GET", "/boardgames/export", "boardgames.export_board_games", True),
+    ("PUT", "/boardgames/{board_game_id:int}", "boardgames.put_board_game", True),
+    ("DELETE", "/boardgames/{board_game_id:int}", "boardgames.delete_board_game", True),
 
     # Menu routes
-    ("GET", re.compile(r"^/menu$"), get_all_menu_items, False, []),
-    ("GET", re.compile(r"^/menu/(\d+)$"), get_menu_item, False, ["menu_item_id"]),
-    ("POST", re.compile(r"^/menu$"), post_menu_item, True, []),
-    ("PUT", re.compile(r"^/menu/(\d+)$"), put_menu_item, True, ["menu_item_id"]),
-    ("DELETE", re.compile(r"^/menu/(\d+)$"), delete_menu_item, True, ["menu_item_id"]),
+    ("GET", "/menu", "menu.get_all_menu_items", False),
+    ("GET", "/menu/{menu_item_id:int}", "menu.get_menu_item", False),
+    ("POST", "/menu", "menu.post_menu_item", True),
+    ("POST", "/menu/bulk", "menu.import_menu_items", True),
+    ("GET", "/menu/export", "menu.export_menu_items", True),
+    ("PUT", "/menu/{menu_item_id:int}", "menu.put_menu_item", True),
+    ("DELETE", "/menu/{menu_item_id:int}", "menu.delete_menu_item", True),
 
     # Table session routes
-    ("GET", re.compile(r"^/table-sessions$"), get_table_sessions, False, []),
-    ("POST", re.compile(r"^/table-sessions$"), initialize_table_session, False, []),
-    ("DELETE", re.compile(r"^/table-sessions/(\d+)$"), close_table_session, True, ["table_number"]),
+    ("GET", "/table-sessions", "sessions.get_table_sessions", False),
+    ("POST", "/table-sessions", "sessions.initialize_table_session", False),
+    ("DELETE", "/table-sessions/{table_number:int}", "sessions.close_table_session", True),
+    ("GET", "/table-sessions/{table_number:int}/bill", "sessions.get_session_bill", False),
 
     # Order routes
-    ("GET", re.compile(r"^/orders/table/(\d+)$"), get_table_orders, False, ["table_number"]),
-    ("POST", re.compile(r"^/orders$"), create_order, False, []),
-    ("PUT", re.compile(r"^/orders/([^/]+)/status$"), update_order_status, True, ["order_id"]),
-    ("DELETE", re.compile(r"^/orders/([^/]+)$"), cancel_order, False, ["order_id"]),
+    ("GET", "/orders", "orders.get_orders", True),
+    ("GET", "/orders/table/{table_number:int}", "orders.get_table_orders", False),
+    ("POST", "/orders", "orders.create_order", False),
+    ("PUT", "/orders/{order_id:str}/status", "orders.update_order_status", True),
+    ("DELETE", "/orders/{order_id:str}", "orders.cancel_order", False),
+
+    # Change feed routes
+    ("GET", "/changes", "changefeed.get_changes", False),
 
     # Authentication routes
-    ("POST", re.compile(r"^/login$"), login, False, []),
+    ("POST", "/login", "auth.login", False),
 ]
 
+# Parameter types, tried in this order when several slots share a position
+PARAM_TYPES: Dict[str, Callable[[str], Optional[Any]]] = {
+    "int": lambda s: int(s) if s.isascii() and s.isdigit() else None,
+    "str": lambda s: s,
+}
+
+
+def _import_handler(path: str) -> Callable:
+    """Import a "module.function" handler"""
+    module_name, _, function_name = path.rpartition(".")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class _Node:
+    """One path segment position in the routing trie"""
+
+    __slots__ = ("literals", "params", "routes")
+
+    def __init__(self) -> None:
+        self.literals: Dict[str, "_Node"] = {}
+        self.params: List[Tuple[str, str, "_Node"]] = []
+        self.routes: Dict[str, Tuple[Handler, bool]] = {}
+
+
+class Router:
+    """
+    Trie router keyed on literal path segments with typed parameter slots
+
+    The path is split into segments once. Literal segments are matched with
+    a dict lookup, so dispatch cost depends on the path depth and not on the
+    number of routes.
+    """
+
+    def __init__(self, routes: List[RouteDefinition]):
+        self._root = _Node()
+        for method, template, handler, requires_admin in routes:
+            self.add(method, template, handler, requires_admin)
+
+    def add(self, method: str, template: str, handler: Handler, requires_admin: bool) -> None:
+        """Register a route for the given method and path template"""
+        node = self._root
+        for segment in template[1:].split("/"):
+            if segment.startswith("{") and segment.endswith("}"):
+                name, _, param_type = segment[1:-1].partition(":")
+                param_type = param_type or "str"
+                if param_type not in PARAM_TYPES:
+                    raise ValueError(f"Unknown parameter type in {template}: {param_type}")
+                for slot_name, slot_type, child in node.params:
+                    if (slot_name, slot_type) == (name, param_type):
+                        node = child
+                        break
+                else:
+                    child = _Node()
+                    node.params.append((name, param_type, child))
+                    order = list(PARAM_TYPES)
+                    node.params.sort(key=lambda slot: order.index(slot[1]))
+                    node = child
+            else:
+                node = node.literals.setdefault(segment, _Node())
+        if method in node.routes:
+            raise ValueError(f"Duplicate route: {method} {template}")
+        node.routes[method] = (handler, requires_admin)
+
+    def find(self, method: str, path: str) -> Tuple[Optional[Callable], Dict[str, Any], bool]:
+        """Find the handler, path parameters and admin flag for a request"""
+        if not path.startswith("/"):
+            return None, {}, False
+        params: Dict[str, Any] = {}
+        node = self._match(self._root, path[1:].split("/"), 0, method, params)
+        if node is None:
+            return None, {}, False
+        handler, requires_admin = node.routes[method]
+        if isinstance(handler, str):
+            handler = _import_handler(handler)
+            node.routes[method] = (handler, requires_admin)
+        return handler, params, requires_admin
+
+    def _match(
+        self,
+        node: _Node,
+        segments: List[str],
+        index: int,
+        method: str,
+        params: Dict[str, Any],
+    ) -> Optional[_Node]:
+        if index == len(segments):
+            return node if method in node.routes else None
+
+        segment = segments[index]
+        child = node.literals.get(segment)
+        if child is not None:
+            found = self._match(child, segments, index + 1, method, params)
+            if found is not None:
+                return found
+
+        if not segment:
+            return None
+        for name, param_type, child in node.params:
+            value = PARAM_TYPES[param_type](segment)
+            if value is None:
+                continue
+            found = self._match(child, segments, index + 1, method, params)
+            if found is not None:
+                params[name] = value
+                return found
+        return None
+
+
+_router = Router(ROUTES)
+
+
 def find_route(method: str, path: str) -> Tuple[Optional[Callable], Dict[str, Any], bool]:
     """
     Find a matching route for the given method and path
@@ -75,16 +173,4 @@ def find_route(method: str, path: str) -> Tuple[Optional[Callable], Dict[str, An
         Tuple of (handler function, extracted parameters, requires admin)
         If no route is found, handler will be None
     """
-    for route_method, path_pattern, handler, requires_admin, param_names in ROUTES:
-        if method != route_method:
-            continue
-        if not (match := path_pattern.match(path)):
-            continue
-        params = {}
-        for i, name in enumerate(param_names):
-            try:
-                params[name] = int(match.group(i+1))
-            except ValueError:
-                params[name] = match.group(i+1)
-        return handler, params, requires_admin
-    return None, {}, False
+    return _router.find(method, path)
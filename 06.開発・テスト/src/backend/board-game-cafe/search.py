@@ -0,0 +1,239 @@
+"""In-memory search index for the board game catalog"""
+
+import bisect
+import heapq
+import unicodedata
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from cache import VersionedCache, VersionedIndex, catalog_cache
+from db import NativeTable, board_games_table, scan_items
+
+# Katakana ァ..ヶ map onto hiragana ぁ..ゖ by a fixed offset
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# Attributes searched as titles: the name and its kana reading, title_kana as
+# the admin form writes it
+TITLE_FIELDS = ("name", "title_kana")
+
+# Match quality of one query term, best first
+TITLE_PREFIX = 30
+WORD_PREFIX = 20
+TITLE_SUBSTRING = 10
+DESCRIPTION_SUBSTRING = 2
+
+
+def normalize(text: str) -> str:
+    """
+    Fold text for matching
+
+    NFKC turns full-width ASCII and half-width katakana into their usual
+    forms, katakana become hiragana and letters are case-folded, so "ｶﾀﾝ",
+    "カタン" and "かたん" all match each other.
+    """
+    folded = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(folded.translate(_KATAKANA_TO_HIRAGANA).split())
+
+
+def _bigrams(text: str) -> Set[str]:
+    return {word[i : i + 2] for word in text.split() for i in range(len(word) - 1)}
+
+
+def _title_grams(text: str) -> Set[str]:
+    """Characters and bigrams, so one-character queries can match titles"""
+    return set(text.replace(" ", "")) | _bigrams(text)
+
+
+def _term_grams(term: str) -> Set[str]:
+    """The grams every text containing term has"""
+    return {term} if len(term) == 1 else _bigrams(term)
+
+
+class _Document(NamedTuple):
+    item: Dict[str, Any]
+    titles: Tuple[str, ...]
+    description: str
+
+    @property
+    def words(self) -> Set[str]:
+        """Title words after the first, for word-prefix matches"""
+        return {word for title in self.titles for word in title.split()[1:]}
+
+
+def _document(item: Dict[str, Any]) -> _Document:
+    fields = [item[field] for field in TITLE_FIELDS if item.get(field)]
+    titles = tuple(dict.fromkeys(map(normalize, fields)))
+    return _Document(item, titles, normalize(item.get("description", "")))
+
+
+def _term_score(document: _Document, term: str) -> int:
+    best = 0
+    for title in document.titles:
+        if title.startswith(term):
+            return TITLE_PREFIX
+        if any(word.startswith(term) for word in title.split()):
+            best = max(best, WORD_PREFIX)
+        elif term in title:
+            best = max(best, TITLE_SUBSTRING)
+    if not best and len(term) > 1 and term in document.description:
+        best = DESCRIPTION_SUBSTRING
+    return best
+
+
+class SearchIndex(VersionedIndex):
+    """
+    Search over name, title_kana and description of the board games
+
+    Titles (name and title_kana) are kept in sorted lists for prefix lookups
+    and in character + bigram postings for substring lookups; descriptions
+    only get bigram postings.
+    """
+
+    def __init__(self, cache: VersionedCache, load: Callable[[], Iterable[Dict[str, Any]]]):
+        super().__init__(cache, load)
+        self._documents: Dict[Any, _Document] = {}
+        self._titles: List[Tuple[str, Any]] = []
+        self._words: List[Tuple[str, Any]] = []
+        self._title_postings: Dict[str, Set[Any]] = defaultdict(set)
+        self._description_postings: Dict[str, Set[Any]] = defaultdict(set)
+
+    def _build(self, items: Iterable[Dict[str, Any]]) -> None:
+        self._documents = {}
+        self._title_postings = defaultdict(set)
+        self._description_postings = defaultdict(set)
+        for item in items:
+            document = _document(item)
+            self._documents[item["id"]] = document
+            self._post(document, item["id"])
+        self._titles = sorted(
+            (title, item_id)
+            for item_id, document in self._documents.items()
+            for title in document.titles
+        )
+        self._words = sorted(
+            (word, item_id)
+            for item_id, document in self._documents.items()
+            for word in document.words
+        )
+
+    def _post(self, document: _Document, item_id: Any) -> None:
+        for gram in set().union(*map(_title_grams, document.titles)):
+            self._title_postings[gram].add(item_id)
+        for gram in _bigrams(document.description):
+            self._description_postings[gram].add(item_id)
+
+    def _add(self, item: Dict[str, Any]) -> None:
+        document = _document(item)
+        self._documents[item["id"]] = document
+        self._post(document, item["id"])
+        for title in document.titles:
+            bisect.insort(self._titles, (title, item["id"]))
+        for word in document.words:
+            bisect.insort(self._words, (word, item["id"]))
+
+    def _discard(self, item_id: Any) -> None:
+        document = self._documents.pop(item_id, None)
+        if document is None:
+            return
+        for entries, keys in ((self._titles, document.titles), (self._words, document.words)):
+            for key in keys:
+                index = bisect.bisect_left(entries, (key, item_id))
+                if index < len(entries) and entries[index] == (key, item_id):
+                    del entries[index]
+        for postings, grams in (
+            (self._title_postings, set().union(*map(_title_grams, document.titles))),
+            (self._description_postings, _bigrams(document.description)),
+        ):
+            for gram in grams:
+                postings[gram].discard(item_id)
+                if not postings[gram]:
+                    del postings[gram]
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """The best limit items matching every term of query"""
+        self.ensure_current()
+
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        if len(terms) == 1:
+            ids = self._search_term(terms[0], limit)
+        else:
+            ids = self._search_terms(terms, limit)
+        return [self._documents[item_id].item for item_id in ids]
+
+    def _search_term(self, term: str, limit: int) -> List[Any]:
+        """
+        One term (type-ahead): fill the page tier by tier, best tier first
+
+        Title and word prefixes come from bisecting the sorted lists, in
+        reading order; substring tiers are only searched while the page is
+        not full, so short prefixes matching thousands of games stay cheap.
+        A substring tier is only reached once every better match is on the
+        page, so its candidates minus the page are exactly that tier.
+        """
+        found: Dict[Any, None] = {}
+        for entries in (self._titles, self._words):
+            index = bisect.bisect_left(entries, (term,))
+            while len(found) < limit and index < len(entries):
+                text, item_id = entries[index]
+                if not text.startswith(term):
+                    break
+                found.setdefault(item_id)
+                index += 1
+
+        tiers = [(self._title_postings, TITLE_SUBSTRING)]
+        if len(term) > 1:
+            tiers.append((self._description_postings, DESCRIPTION_SUBSTRING))
+        for postings, tier in tiers:
+            if len(found) >= limit:
+                break
+            candidates = self._candidates(postings, _term_grams(term)) - found.keys()
+            if len(term) > 2:
+                # Bigrams can all occur without the term; one or two
+                # characters are a gram of their own and need no check
+                candidates = {
+                    i for i in candidates if _term_score(self._documents[i], term) == tier
+                }
+            matches = ((len(self._documents[i].item.get("name", "")), i) for i in candidates)
+            for _, item_id in heapq.nsmallest(limit - len(found), matches):
+                found.setdefault(item_id)
+        return list(found)
+
+    def _search_terms(self, terms: List[str], limit: int) -> List[Any]:
+        """Several terms: every term must match; rank by the summed match quality"""
+        candidates: Optional[Set[Any]] = None
+        for term in terms:
+            grams = _term_grams(term)
+            term_candidates = self._candidates(self._title_postings, grams)
+            if len(term) > 1:
+                term_candidates |= self._candidates(self._description_postings, grams)
+            candidates = term_candidates if candidates is None else candidates & term_candidates
+            if not candidates:
+                return []
+
+        scored = []
+        for item_id in candidates or ():
+            document = self._documents[item_id]
+            scores = [_term_score(document, term) for term in terms]
+            if all(scores):
+                scored.append((-sum(scores), len(document.item.get("name", "")), item_id))
+        return [item_id for *_, item_id in heapq.nsmallest(limit, scored)]
+
+    @staticmethod
+    def _candidates(postings: Dict[str, Set[Any]], grams: Set[str]) -> Set[Any]:
+        """Ids posted under every gram, smallest posting list first"""
+        lists = sorted((postings.get(gram, set()) for gram in grams), key=len)
+        if not lists:
+            return set()
+        result = lists[0].copy()
+        for posting in lists[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+
+board_game_index = SearchIndex(
+    catalog_cache, lambda: scan_items(NativeTable(board_games_table()))
+)
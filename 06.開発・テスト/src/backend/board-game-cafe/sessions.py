@@ -3,16 +3,32 @@
 import json
 import uuid
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-import boto3
+from botocore.exceptions import ClientError
 
+from clients import dynamodb
 from common import make_response
+from db import (
+    NativeTable,
+    decode_cursor,
+    encode_cursor,
+    failed_conditions,
+    orders_table,
+    parse_limit,
+    sessions_table,
+)
 
-# AWS resources configuration
-dynamodb = boto3.resource("dynamodb")
-sessions_table = dynamodb.Table("table-sessions-table")
-orders_table = dynamodb.Table("orders-table")
+# Each open table has a marker item (tableNumber, "ACTIVE") naming its active
+# session, so checking and closing it are single-item operations
+ACTIVE_SESSION_MARKER = "ACTIVE"
+# Sessions carry sessionStatus for StatusStartIndex; markers do not, so the
+# index only holds sessions
+SESSION_STATUSES = ["active", "closed"]
+
+
+def _marker_key(table_number: Any) -> Dict[str, Any]:
+    return {"tableNumber": table_number, "sessionId": ACTIVE_SESSION_MARKER}
 
 
 def initialize_table_session(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -26,22 +42,6 @@ def initialize_table_session(event: Dict[str, Any]) -> Dict[str, Any]:
         table_number = body["tableNumber"]
         customer_count = body.get("customerCount", 1)
 
-        # Check if table already has an active session
-        active_sessions = sessions_table.query(
-            IndexName="TableNumberIndex",
-            KeyConditionExpression="tableNumber = :tn",
-            FilterExpression="endTime = :null",
-            ExpressionAttributeValues={
-                ":tn": table_number,
-                ":null": 0,  # 0 indicates session is still active
-            },
-        ).get("Items", [])
-
-        if active_sessions:
-            return make_response(
-                400, {"error": f"Table {table_number} already has an active session"}
-            )
-
         # Create new session
         session_id = str(uuid.uuid4())
         timestamp = int(time.time())
@@ -52,93 +52,270 @@ def initialize_table_session(event: Dict[str, Any]) -> Dict[str, Any]:
             "customerCount": customer_count,
             "startTime": timestamp,
             "endTime": 0,  # 0 indicates session is still active
+            "sessionStatus": "active",
             "notes": body.get("notes", ""),
+            # Running totals, kept up to date by the order handlers
+            "totalAmount": 0,
+            "orderCount": 0,
+            "openOrderCount": 0,
         }
 
-        sessions_table.put_item(Item=session)
+        # The marker can only be created while the table has no active session
+        try:
+            dynamodb().meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": sessions_table().name,
+                            "Item": {
+                                **_marker_key(table_number),
+                                "activeSessionId": session_id,
+                            },
+                            "ConditionExpression": "attribute_not_exists(sessionId)",
+                        }
+                    },
+                    {"Put": {"TableName": sessions_table().name, "Item": session}},
+                ]
+            )
+        except ClientError as e:
+            if any(failed_conditions(e)):
+                return make_response(
+                    400, {"error": f"Table {table_number} already has an active session"}
+                )
+            raise
 
         return make_response(201, {"session": session})
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
-def get_table_sessions() -> Dict[str, Any]:
-    """Get all table sessions, including active and closed ones"""
+def get_table_sessions(
+    status: Optional[str] = None,
+    to: Optional[str] = None,
+    limit: Optional[str] = None,
+    cursor: Optional[str] = None,
+    **params: str,
+) -> Dict[str, Any]:
+    """
+    Get table sessions: active ones first, each group newest first
+
+    status (active or closed) limits the result to one group, and from / to
+    bound startTime (inclusive, unix seconds). The result is paginated (see
+    db.parse_limit).
+    """
     try:
-        response = sessions_table.scan()
-        sessions = response.get("Items", [])
+        try:
+            unknown = sorted(set(params) - {"from"})
+            if unknown:
+                raise ValueError(f"Unknown parameters: {', '.join(unknown)}")
+            if status is not None and status not in SESSION_STATUSES:
+                raise ValueError(f"status must be one of: {', '.join(SESSION_STATUSES)}")
+            statuses = [status] if status else SESSION_STATUSES
+            start_from = int(params["from"]) if params.get("from") is not None else None
+            start_to = int(to) if to is not None else None
+            page_limit = parse_limit(limit)
+            position = decode_cursor(cursor)
+            if position is not None and (
+                position.get("status") not in statuses
+                or not isinstance(position.get("key"), (dict, type(None)))
+            ):
+                raise ValueError("Invalid cursor")
+        except ValueError as e:
+            return make_response(400, {"error": f"Invalid query parameter: {e}"})
 
-        # Sort sessions: active first, then by start time (newest first)
-        sessions.sort(key=lambda s: (s["endTime"] != 0, -s["startTime"]))
+        # Fill the page from the cursor's group on, moving to the next group
+        # when one runs out
+        if position is not None:
+            statuses = statuses[statuses.index(position["status"]) :]
+        sessions = []
+        next_position = None
+        for index, s in enumerate(statuses):
+            query_kwargs = _status_query(s, start_from, start_to)
+            query_kwargs["Limit"] = page_limit - len(sessions)
+            if position is not None and position["status"] == s and position["key"]:
+                query_kwargs["ExclusiveStartKey"] = position["key"]
+            response = NativeTable(sessions_table()).query(**query_kwargs)
+            sessions.extend(response.get("Items", []))
+            if "LastEvaluatedKey" in response:
+                next_position = {"status": s, "key": response["LastEvaluatedKey"]}
+                break
+            if len(sessions) == page_limit:
+                if index + 1 < len(statuses):
+                    next_position = {"status": statuses[index + 1], "key": None}
+                break
 
-        return make_response(200, {"sessions": sessions})
+        return make_response(
+            200, {"sessions": sessions, "nextCursor": encode_cursor(next_position)}
+        )
     except Exception as e:
         return make_response(500, {"error": str(e)})
 
 
+def _status_query(
+    status: str, start_from: Optional[int], start_to: Optional[int]
+) -> Dict[str, Any]:
+    """StatusStartIndex query arguments for one status, newest first"""
+    condition = "sessionStatus = :status"
+    values: Dict[str, Any] = {":status": status}
+    if start_from is not None and start_to is not None:
+        condition += " AND startTime BETWEEN :from AND :to"
+        values.update({":from": start_from, ":to": start_to})
+    elif start_from is not None:
+        condition += " AND startTime >= :from"
+        values[":from"] = start_from
+    elif start_to is not None:
+        condition += " AND startTime <= :to"
+        values[":to"] = start_to
+    return {
+        "IndexName": "StatusStartIndex",
+        "KeyConditionExpression": condition,
+        "ExpressionAttributeValues": values,
+        "ScanIndexForward": False,
+    }
+
+
+def _pending_orders(table_number: int, session_id: str) -> List[Dict[str, Any]]:
+    """The pending or preparing orders of a session"""
+    return orders_table().query(
+        IndexName="TableSessionIndex",
+        KeyConditionExpression="tableNumber = :tn AND sessionId = :sid",
+        FilterExpression="#status IN (:s1, :s2)",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={
+            ":tn": table_number,
+            ":sid": session_id,
+            ":s1": "pending",
+            ":s2": "preparing",
+        },
+    ).get("Items", [])
+
+
+def _has_open_orders(session: Dict[str, Any]) -> bool:
+    # Sessions opened before the running totals existed have no counter
+    if "openOrderCount" not in session:
+        return bool(_pending_orders(session["tableNumber"], session["sessionId"]))
+    return session["openOrderCount"] > 0
+
+
+def _pending_orders_response(session: Dict[str, Any]) -> Dict[str, Any]:
+    return make_response(
+        400,
+        {
+            "error": "Cannot close session with pending orders",
+            "pendingOrders": _pending_orders(session["tableNumber"], session["sessionId"]),
+        },
+    )
+
+
+def _get_session(
+    table_number: int, session_id: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """A session by id, or the active session of the table without one"""
+    if session_id is None:
+        marker = sessions_table().get_item(
+            Key=_marker_key(table_number), ConsistentRead=True
+        ).get("Item")
+        if not marker:
+            return None
+        session_id = marker["activeSessionId"]
+    if session_id == ACTIVE_SESSION_MARKER:
+        return None
+    return sessions_table().get_item(
+        Key={"tableNumber": table_number, "sessionId": session_id}, ConsistentRead=True
+    ).get("Item")
+
+
 def close_table_session(table_number: int) -> Dict[str, Any]:
     """Close an active session for a table"""
     try:
         # Find active session for the table
-        active_sessions = sessions_table.query(
-            IndexName="TableNumberIndex",
-            KeyConditionExpression="tableNumber = :tn",
-            FilterExpression="endTime = :null",
-            ExpressionAttributeValues={":tn": table_number, ":null": 0},
-        ).get("Items", [])
-
-        if not active_sessions:
+        session = _get_session(table_number)
+        if not session:
             return make_response(
                 404, {"error": f"No active session found for table {table_number}"}
             )
 
-        if len(active_sessions) > 1:
-            return make_response(
-                500,
-                {"error": f"Multiple active sessions found for table {table_number}"},
-            )
+        # Check for any pending or preparing orders
+        if _has_open_orders(session):
+            return _pending_orders_response(session)
 
-        active_session = active_sessions[0]
-        session_id = active_session["sessionId"]
+        # Close the session and remove the marker together; the counter
+        # condition catches an order created since the session was read
+        timestamp = int(time.time())
+        session_id = session["sessionId"]
 
-        # Check for any pending or preparing orders
-        pending_orders = orders_table.query(
-            IndexName="TableSessionIndex",
-            KeyConditionExpression="tableNumber = :tn AND sessionId = :sid",
-            FilterExpression="#status IN (:s1, :s2)",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={
-                ":tn": table_number,
-                ":sid": session_id,
-                ":s1": "pending",
-                ":s2": "preparing",
-            },
-        ).get("Items", [])
-
-        if pending_orders:
+        try:
+            dynamodb().meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": sessions_table().name,
+                            "Key": _marker_key(table_number),
+                            "ConditionExpression": "activeSessionId = :sid",
+                            "ExpressionAttributeValues": {":sid": session_id},
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": sessions_table().name,
+                            "Key": {"tableNumber": table_number, "sessionId": session_id},
+                            "UpdateExpression": "SET endTime = :et, sessionStatus = :closed",
+                            "ConditionExpression": (
+                                "endTime = :active AND (attribute_not_exists(openOrderCount)"
+                                " OR openOrderCount <= :zero)"
+                            ),
+                            "ExpressionAttributeValues": {
+                                ":et": timestamp,
+                                ":active": 0,
+                                ":closed": "closed",
+                                ":zero": 0,
+                            },
+                        }
+                    },
+                ]
+            )
+        except ClientError as e:
+            if not any(failed_conditions(e)):
+                raise
+            current = _get_session(table_number, session_id)
+            if current and current["endTime"] == 0 and _has_open_orders(current):
+                return _pending_orders_response(current)
             return make_response(
-                400,
-                {
-                    "error": "Cannot close session with pending orders",
-                    "pendingOrders": pending_orders,
-                },
+                404, {"error": f"No active session found for table {table_number}"}
             )
 
-        # Close the session
-        timestamp = int(time.time())
+        session.update(endTime=timestamp, sessionStatus="closed")
+        return make_response(200, {"session": session})
+    except Exception as e:
+        return make_response(500, {"error": str(e)})
 
-        sessions_table.update_item(
-            Key={"tableNumber": table_number, "sessionId": session_id},
-            UpdateExpression="SET endTime = :et",
-            ExpressionAttributeValues={":et": timestamp},
-            ReturnValues="ALL_NEW",
-        )
 
-        # Get updated session
-        updated_response = sessions_table.get_item(
-            Key={"tableNumber": table_number, "sessionId": session_id}
-        )
+def get_session_bill(table_number: int, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the bill of the table's active session, or of session_id
+
+    The totals are the running totals on the session item, so this reads a
+    single item however many orders the session has. Cancelled orders are
+    not billed; openOrderCount counts the pending and preparing orders.
+    """
+    try:
+        session = _get_session(table_number, session_id)
+        if not session:
+            return make_response(
+                404, {"error": f"Table session not found for table {table_number}"}
+            )
 
-        return make_response(200, {"session": updated_response["Item"]})
+        bill = {
+            "tableNumber": session["tableNumber"],
+            "sessionId": session["sessionId"],
+            "customerCount": session.get("customerCount", 1),
+            "startTime": session["startTime"],
+            "endTime": session["endTime"],
+            "totalAmount": session.get("totalAmount", 0),
+            "orderCount": session.get("orderCount", 0),
+            "openOrderCount": session.get("openOrderCount", 0),
+            "settled": session["endTime"] != 0,
+        }
+        return make_response(200, {"bill": bill})
     except Exception as e:
         return make_response(500, {"error": str(e)})
@@ -0,0 +1,168 @@
+"""Catalog and menu snapshots published to S3 for the board game cafe API
+
+A DynamoDB Streams consumer (handler) on the board games and menu tables
+rebuilds the full list of the table that changed, as the list endpoint
+returns it, and uploads it gzip-compressed under content/immutable/, named
+by its content hash. A small manifest under content/ points at the current
+snapshot of each list. Both prefixes are CloudFront behaviours of the
+bucket, so clients read the manifest (short TTL) and then the snapshot
+(cached for good) from the CDN without invoking the API Lambda. The
+manifest of record is a row of the counters table, updated with conditional
+writes; the S3 object is a copy of it.
+"""
+
+import gzip
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from clients import s3
+from common import DecimalEncoder
+from config import bucket_name, menu_table_name, table_name
+from db import NativeTable, board_games_table, counters_table, menu_table, scan_items
+
+SNAPSHOT_PREFIX = "content/immutable/snapshots/"
+MANIFEST_KEY = "content/snapshots/manifest.json"
+MANIFEST_COUNTER = "snapshot:manifest"
+# Clients notice a new snapshot within this many seconds
+MANIFEST_MAX_AGE = 10
+MANIFEST_ATTEMPTS = 5
+
+# Snapshot name (also the list body key and manifest field) per table
+SNAPSHOTS = {table_name: "boardGames", menu_table_name: "menuItems"}
+_TABLES = {"boardGames": board_games_table, "menuItems": menu_table}
+
+
+def _next_version(name: str) -> int:
+    """Allocate the next version of a snapshot"""
+    response = counters_table().update_item(
+        Key={"counterName": f"snapshot:{name}"},
+        UpdateExpression="ADD version :one",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW",
+    )
+    return int(response["Attributes"]["version"])
+
+
+def build_snapshot(name: str) -> Tuple[bytes, int]:
+    """The gzip-compressed list body of a snapshot and its number of items"""
+    items = list(scan_items(NativeTable(_TABLES[name]()), ConsistentRead=True))
+    items.sort(key=lambda item: item["id"])
+    text = json.dumps({name: items}, cls=DecimalEncoder, ensure_ascii=False)
+    # mtime=0 keeps the bytes, and so the name, stable for the same content
+    return gzip.compress(text.encode(), compresslevel=9, mtime=0), len(items)
+
+
+def _record(name: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Point the manifest row at entry unless it holds a newer version
+
+    The row in the counters table is the manifest of record: one attribute
+    per snapshot and a revision bumped by every change. Returns the row after
+    the update, or None when a newer snapshot was already recorded.
+    """
+    try:
+        response = counters_table().update_item(
+            Key={"counterName": MANIFEST_COUNTER},
+            UpdateExpression="SET #name = :entry ADD revision :one",
+            ConditionExpression="attribute_not_exists(#name) OR #name.version < :version",
+            ExpressionAttributeNames={"#name": name},
+            ExpressionAttributeValues={":entry": entry, ":one": 1, ":version": entry["version"]},
+            ReturnValues="ALL_NEW",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return None
+        raise
+    return response["Attributes"]
+
+
+def _put_manifest(row: Dict[str, Any]) -> None:
+    manifest = {name: row[name] for name in SNAPSHOTS.values() if name in row}
+    s3().put_object(
+        Bucket=bucket_name,
+        Key=MANIFEST_KEY,
+        Body=json.dumps(manifest, cls=DecimalEncoder, ensure_ascii=False).encode(),
+        ContentType="application/json",
+        CacheControl=f"public, max-age={MANIFEST_MAX_AGE}",
+    )
+
+
+def _sync_manifest(row: Dict[str, Any]) -> None:
+    """
+    Copy the manifest row to S3 until the copy is the latest revision
+
+    Two publishers can upload in the opposite order to the one they updated
+    the row in. Each one reads the row back after its upload and uploads
+    again while the revision has moved on, so the last upload of all is
+    always the latest revision.
+    """
+    for _ in range(MANIFEST_ATTEMPTS):
+        _put_manifest(row)
+        latest = counters_table().get_item(
+            Key={"counterName": MANIFEST_COUNTER}, ConsistentRead=True
+        )["Item"]
+        if latest["revision"] == row["revision"]:
+            return
+        row = latest
+    raise RuntimeError("Could not bring the snapshot manifest up to date")
+
+
+def publish(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Publish a fresh snapshot and point the manifest at it
+
+    The version is allocated before the table is read, so a higher version
+    always holds every write a lower one does; the manifest only ever moves
+    to a higher version. Returns the manifest entry, or None when a newer
+    snapshot was already published.
+    """
+    version = _next_version(name)
+    body, count = build_snapshot(name)
+    digest = hashlib.sha256(body).hexdigest()
+    key = f"{SNAPSHOT_PREFIX}{name}/{digest[:32]}.json.gz"
+    s3().put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=body,
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        CacheControl="public, max-age=31536000, immutable",
+    )
+    entry = {
+        "path": "/" + key,
+        "version": version,
+        "count": count,
+        "bytes": len(body),
+        "publishedAt": int(time.time()),
+    }
+    row = _record(name, entry)
+    if row is None:
+        return None
+    _sync_manifest(row)
+    return entry
+
+
+def _table_of(record: Dict[str, Any]) -> str:
+    # arn:aws:dynamodb:<region>:<account>:table/<name>/stream/<label>
+    return record["eventSourceARN"].split(":table/", 1)[1].split("/", 1)[0]
+
+
+def handler(event: Dict[str, Any], context: Any) -> None:
+    """
+    DynamoDB Streams consumer for the board games and menu tables
+
+    One snapshot per changed table per batch, however many records the
+    batch holds (a bulk import arrives as a few batches). Invoked without
+    Records, e.g. by hand after a deploy, it publishes every snapshot.
+    """
+    records = event.get("Records")
+    if records is None:
+        names = set(SNAPSHOTS.values())
+    else:
+        names = {SNAPSHOTS[t] for t in map(_table_of, records) if t in SNAPSHOTS}
+    for name in sorted(names):
+        publish(name)
@@ -119,17 +119,26 @@ export const fetchBoardGames = async (
   dispatch({ type: 'FETCH_GAMES_START' });
   const apiEndpoint = import.meta.env.VITE_API_ENDPOINT;
   try {
-    const response = await fetch(apiEndpoint + '/boardgames', {
-      headers: {
-        'x-api-key': import.meta.env.VITE_API_KEY,
-      },
-      mode: 'cors',
-    });
-    if (!response.ok) {
-      throw new Error('Failed to fetch board games');
-    }
-    const data = await response.json();
-    dispatch({ type: 'FETCH_GAMES_SUCCESS', payload: data });
+    // The list is paginated: follow nextCursor until the last page
+    const boardGames: BoardGame[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({ limit: '200' });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${apiEndpoint}/boardgames?${params}`, {
+        headers: {
+          'x-api-key': import.meta.env.VITE_API_KEY,
+        },
+        mode: 'cors',
+      });
+      if (!response.ok) {
+        throw new Error('Failed to fetch board games');
+      }
+      const data = await response.json();
+      boardGames.push(...data.boardGames);
+      cursor = data.nextCursor;
+    } while (cursor);
+    dispatch({ type: 'FETCH_GAMES_SUCCESS', payload: boardGames });
   } catch (error) {
     dispatch({
       type: 'FETCH_GAMES_ERROR',
@@ -1,7 +1,9 @@
 resource "aws_dynamodb_table" "board_games" {
-  name         = var.dynamodb_table_name
-  billing_mode = "PAY_PER_REQUEST"
-  hash_key     = "id"
+  name             = var.dynamodb_table_name
+  billing_mode     = "PAY_PER_REQUEST"
+  hash_key         = "id"
+  stream_enabled   = true
+  stream_view_type = "KEYS_ONLY"
 
   attribute {
     name = "id"
@@ -32,9 +34,11 @@ resource "aws_dynamodb_table" "board_games" {
 }
 
 resource "aws_dynamodb_table" "menu" {
-  name         = var.dynamodb_menu_table_name
-  billing_mode = "PAY_PER_REQUEST"
-  hash_key     = "id"
+  name             = var.dynamodb_menu_table_name
+  billing_mode     = "PAY_PER_REQUEST"
+  hash_key         = "id"
+  stream_enabled   = true
+  stream_view_type = "KEYS_ONLY"
 
   attribute {
     name = "id"
@@ -52,3 +56,164 @@ resource "aws_dynamodb_table" "menu" {
     projection_type = "ALL"
   }
 }
+
+resource "aws_dynamodb_table" "orders" {
+  name             = var.dynamodb_orders_table_name
+  billing_mode     = "PAY_PER_REQUEST"
+  hash_key         = "orderId"
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
+  attribute {
+    name = "orderId"
+    type = "S"
+  }
+
+  attribute {
+    name = "tableNumber"
+    type = "N"
+  }
+
+  attribute {
+    name = "sessionId"
+    type = "S"
+  }
+
+  attribute {
+    name = "createdAt"
+    type = "N"
+  }
+
+  attribute {
+    name = "kitchenStatus"
+    type = "S"
+  }
+
+  attribute {
+    name = "updatedAt"
+    type = "N"
+  }
+
+  global_secondary_index {
+    name            = "TableNumberIndex"
+    hash_key        = "tableNumber"
+    range_key       = "createdAt"
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "TableSessionIndex"
+    hash_key        = "tableNumber"
+    range_key       = "sessionId"
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "SessionOrdersIndex"
+    hash_key        = "sessionId"
+    range_key       = "createdAt"
+    projection_type = "ALL"
+  }
+
+  # Sparse: delivered and cancelled orders lose kitchenStatus after a day
+  # (orders.prune_kitchen_queue)
+  global_secondary_index {
+    name            = "KitchenStatusIndex"
+    hash_key        = "kitchenStatus"
+    range_key       = "updatedAt"
+    projection_type = "ALL"
+  }
+}
+
+resource "aws_dynamodb_table" "table_sessions" {
+  name         = var.dynamodb_table_sessions_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "tableNumber"
+  range_key    = "sessionId"
+
+  attribute {
+    name = "tableNumber"
+    type = "N"
+  }
+
+  attribute {
+    name = "sessionId"
+    type = "S"
+  }
+
+  attribute {
+    name = "startTime"
+    type = "N"
+  }
+
+  attribute {
+    name = "sessionStatus"
+    type = "S"
+  }
+
+  global_secondary_index {
+    name            = "TableNumberIndex"
+    hash_key        = "tableNumber"
+    range_key       = "startTime"
+    projection_type = "ALL"
+  }
+
+  # Sessions by status (active / closed), newest first; the active-session
+  # markers have no sessionStatus and stay out of it
+  global_secondary_index {
+    name            = "StatusStartIndex"
+    hash_key        = "sessionStatus"
+    range_key       = "startTime"
+    projection_type = "ALL"
+  }
+}
+
+# Order change feed: seq 0 of each channel holds the channel's last seq
+# and channel event#<stream eventID> the seqs that stream record was given
+resource "aws_dynamodb_table" "changes" {
+  name         = var.dynamodb_changes_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "channel"
+  range_key    = "seq"
+
+  attribute {
+    name = "channel"
+    type = "S"
+  }
+
+  attribute {
+    name = "seq"
+    type = "N"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+}
+
+resource "aws_dynamodb_table" "counters" {
+  name         = var.dynamodb_counters_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "counterName"
+
+  attribute {
+    name = "counterName"
+    type = "S"
+  }
+}
+
+# Set as dynamodbOrdersStreamArn in the backend's config.yml
+output "orders_stream_arn" {
+  value = aws_dynamodb_table.orders.stream_arn
+}
+
+# Set as dynamodbBoardGamesStreamArn in the backend's config.yml
+output "board_games_stream_arn" {
+  value = aws_dynamodb_table.board_games.stream_arn
+}
+
+# Set as dynamodbMenuStreamArn in the backend's config.yml
+output "menu_stream_arn" {
+  value = aws_dynamodb_table.menu.stream_arn
+}
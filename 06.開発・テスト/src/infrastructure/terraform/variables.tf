@@ -67,6 +67,30 @@ variable "dynamodb_menu_table_name" {
   default     = "MenuTable"
 }
 
+variable "dynamodb_orders_table_name" {
+  type        = string
+  description = "The name of the DynamoDB table to store orders"
+  default     = "OrdersTable"
+}
+
+variable "dynamodb_table_sessions_table_name" {
+  type        = string
+  description = "The name of the DynamoDB table to store table sessions"
+  default     = "TableSessionsTable"
+}
+
+variable "dynamodb_changes_table_name" {
+  type        = string
+  description = "The name of the DynamoDB table to store the order change feed"
+  default     = "ChangesTable"
+}
+
+variable "dynamodb_counters_table_name" {
+  type        = string
+  description = "The name of the DynamoDB table to store ID counters"
+  default     = "CountersTable"
+}
+
 variable "cloudfront_logs_bucket_name" {
   type        = string
   description = "The name of the S3 bucket for CloudFront logs"